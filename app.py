@@ -1,21 +1,26 @@
 import os
+import json
 import time
-from flask import Flask, render_template, request, jsonify, send_file, session
+import uuid
+from flask import Flask, Response, render_template, request, jsonify, send_file, session, stream_with_context
 from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 # Import configuration and utilities
 from config import config
 from utils.validators import (
-    validate_file_upload, validate_analysis_method, sanitize_filename,
+    validate_file_upload, validate_analysis_method, validate_analysis_profile, sanitize_filename,
     SecurityValidator
 )
 from utils.logger import setup_app_logging, log_request_info, log_response_info
+from utils.cache_manager import cache_analysis_results, get_cache_manager, get_cached_analysis_results
+from utils.pipeline import PipelineRun, extract_document
 
 # Import analysis modules
 from pdf_parser import PDFParser
 from enhanced_compliance_checker import EnhancedComplianceChecker
 from semantic_compliance_checker import SemanticComplianceChecker
+from hybrid_compliance_checker import HybridComplianceChecker
 
 def create_app(config_name='default'):
     """Application factory pattern for Flask app creation."""
@@ -103,136 +108,189 @@ def create_app(config_name='default'):
         """Landing page with model explanation and call-to-action."""
         return render_template('index.html')
     
+    def receive_upload():
+        """
+        Validate an analysis upload and extract its text.
+
+        Returns (upload, None) on success, where upload holds the content,
+        filename, method, profile and the analysis pipeline run, or
+        (None, error_response) otherwise.
+        """
+        # Validate request structure
+        if 'file' not in request.files:
+            logger.warning("Upload rejected - no file in request", user_ip=request.remote_addr)
+            return None, (jsonify({'error': 'No file part'}), 400)
+        
+        file = request.files['file']
+        method = request.form.get('method', 'enhanced')
+        profile = request.form.get('profile') or app.config['DEFAULT_ANALYSIS_PROFILE']
+        
+        # Validate analysis method
+        is_valid_method, method_error = validate_analysis_method(method)
+        if not is_valid_method:
+            logger.warning("Upload rejected - invalid method", 
+                          method=method, user_ip=request.remote_addr)
+            return None, (jsonify({'error': method_error}), 400)
+        
+        # Validate analysis profile
+        is_valid_profile, profile_error = validate_analysis_profile(profile, app.config['ANALYSIS_PROFILES'])
+        if not is_valid_profile:
+            logger.warning("Upload rejected - invalid profile", 
+                          profile=profile, user_ip=request.remote_addr)
+            return None, (jsonify({'error': profile_error}), 400)
+        
+        # Validate file upload
+        is_valid_file, file_error = validate_file_upload(file, app.config['ALLOWED_EXTENSIONS'])
+        if not is_valid_file:
+            logger.warning("Upload rejected - file validation failed", 
+                          error=file_error, user_ip=request.remote_addr)
+            return None, (jsonify({'error': file_error}), 400)
+        
+        # Sanitize filename and save file
+        original_filename = file.filename
+        safe_filename = sanitize_filename(original_filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)
+        
+        # Log file upload
+        file.seek(0, os.SEEK_END)
+        file_size = file.tell()
+        file.seek(0)
+        
+        logger.log_file_upload(
+            filename=original_filename,
+            file_size=file_size,
+            method=method,
+            user_ip=request.remote_addr
+        )
+        
+        file.save(filepath)
+        
+        # Preliminary check if PDF is loadable
+        parser = PDFParser(filepath)
+        if not parser.is_pdf_loadable():
+            logger.warning("PDF is not loadable", filename=original_filename)
+            # Clean up the invalid file
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+            return None, (jsonify({'error': 'The uploaded PDF is corrupted or cannot be read.'}), 400)
+
+        # Process the PDF with error handling; identical uploads reuse the extracted text
+        pipeline_run = PipelineRun()
+        try:
+            content = extract_document(pipeline_run, filepath, parser.extract_text).text
+        except Exception as e:
+            logger.error("PDF parsing failed", exception=e, filename=original_filename)
+            return None, (jsonify({'error': 'Failed to extract text from PDF. Please ensure the file is not corrupted or password-protected.'}), 400)
+        finally:
+            # Clean up uploaded file for security
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+        
+        # Validate extracted content
+        is_safe, safety_error = SecurityValidator.check_file_content_safety(content)
+        if not is_safe:
+            logger.log_security_event(
+                event_type="unsafe_content_detected",
+                severity="HIGH",
+                details={'filename': original_filename, 'error': safety_error}
+            )
+            return None, (jsonify({'error': safety_error}), 400)
+        
+        return {'content': content, 'filename': original_filename, 'method': method, 'profile': profile,
+                'pipeline': pipeline_run}, None
+    
+    def iter_analysis(upload):
+        """Run the selected checker, yielding (event, data) pairs ending with 'complete'."""
+        if upload['method'] == 'semantic':
+            logger.info("Using Semantic Compliance Checker", profile=upload['profile'])
+            yield from get_semantic_checker().iter_compliance(upload['content'], profile=upload['profile'],
+                                                              run=upload['pipeline'])
+        elif upload['method'] == 'hybrid':
+            logger.info("Using Hybrid Compliance Checker", profile=upload['profile'])
+            hybrid_checker = HybridComplianceChecker(enhanced_checker, get_semantic_checker())
+            yield from hybrid_checker.iter_compliance(upload['content'], profile=upload['profile'],
+                                                      run=upload['pipeline'])
+        else:
+            logger.info("Using Enhanced Compliance Checker")
+            yield 'complete', enhanced_checker.check_compliance(upload['content'], run=upload['pipeline'])
+    
+    def finish_analysis(upload, compliance_results, analysis_time):
+        """
+        Validate and log finished results.
+
+        Returns the payload shown on the results page, or None if the
+        results are invalid.
+        """
+        method = upload['method']
+        content = upload['content']
+        
+        # Validate results
+        is_valid_results, results_error = SecurityValidator.validate_compliance_results(compliance_results)
+        if not is_valid_results:
+            logger.error("Invalid compliance results", error=results_error)
+            return None
+        
+        # Log analysis completion
+        logger.log_analysis_complete(
+            method=method,
+            compliance_score=compliance_results['compliance_score'],
+            processing_time=analysis_time,
+            filename=upload['filename']
+        )
+        
+        # Log performance metrics
+        logger.log_performance_metrics(
+            operation=f"{method}_analysis",
+            duration=analysis_time,
+            content_length=len(content),
+            compliance_score=compliance_results['compliance_score'],
+            matched_controls=compliance_results['summary']['total_controls']
+        )
+        logger.info("Analysis pipeline stages", method=method, stages=upload['pipeline'].report())
+        
+        return {
+            'compliance_score': compliance_results['compliance_score'],
+            'summary': {
+                **compliance_results['summary'],
+                'document_length': len(content),
+            },
+            'details': compliance_results['details'],
+            'filename': upload['filename'],
+            'method_used': method,
+            'profile_used': upload['profile'] if method in ('semantic', 'hybrid') else None,
+            'processing_time': round(analysis_time, 2)
+        }
+    
     @app.route('/analyze', methods=['GET', 'POST'])
     def analyze():
         """Analysis page with upload functionality."""
         if request.method == 'POST':
             try:
-                # Validate request structure
-                if 'file' not in request.files:
-                    logger.warning("Upload rejected - no file in request", user_ip=request.remote_addr)
-                    return jsonify({'error': 'No file part'}), 400
-                
-                file = request.files['file']
-                method = request.form.get('method', 'enhanced')
-                
-                # Validate analysis method
-                is_valid_method, method_error = validate_analysis_method(method)
-                if not is_valid_method:
-                    logger.warning("Upload rejected - invalid method", 
-                                  method=method, user_ip=request.remote_addr)
-                    return jsonify({'error': method_error}), 400
-                
-                # Validate file upload
-                is_valid_file, file_error = validate_file_upload(file, app.config['ALLOWED_EXTENSIONS'])
-                if not is_valid_file:
-                    logger.warning("Upload rejected - file validation failed", 
-                                  error=file_error, user_ip=request.remote_addr)
-                    return jsonify({'error': file_error}), 400
-                
-                # Sanitize filename and save file
-                original_filename = file.filename
-                safe_filename = sanitize_filename(original_filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], safe_filename)
-                
-                # Log file upload
-                file.seek(0, os.SEEK_END)
-                file_size = file.tell()
-                file.seek(0)
-                
-                logger.log_file_upload(
-                    filename=original_filename,
-                    file_size=file_size,
-                    method=method,
-                    user_ip=request.remote_addr
-                )
-                
-                file.save(filepath)
-                
-                # Preliminary check if PDF is loadable
-                parser = PDFParser(filepath)
-                if not parser.is_pdf_loadable():
-                    logger.warning("PDF is not loadable", filename=original_filename)
-                    # Clean up the invalid file
-                    try:
-                        os.remove(filepath)
-                    except OSError:
-                        pass
-                    return jsonify({'error': 'The uploaded PDF is corrupted or cannot be read.'}), 400
-
-                # Process the PDF with error handling
-                try:
-                    content = parser.extract_text()
-                except Exception as e:
-                    logger.error("PDF parsing failed", exception=e, filename=original_filename)
-                    return jsonify({'error': 'Failed to extract text from PDF. Please ensure the file is not corrupted or password-protected.'}), 400
-                finally:
-                    # Clean up uploaded file for security
-                    try:
-                        os.remove(filepath)
-                    except OSError:
-                        pass
-                
-                # Validate extracted content
-                is_safe, safety_error = SecurityValidator.check_file_content_safety(content)
-                if not is_safe:
-                    logger.log_security_event(
-                        event_type="unsafe_content_detected",
-                        severity="HIGH",
-                        details={'filename': original_filename, 'error': safety_error}
-                    )
-                    return jsonify({'error': safety_error}), 400
+                upload, error_response = receive_upload()
+                if error_response:
+                    return error_response
                 
                 # Log analysis start
-                logger.log_analysis_start(method, len(content), filename=original_filename)
+                logger.log_analysis_start(upload['method'], len(upload['content']), filename=upload['filename'])
                 analysis_start_time = time.time()
                 
                 # Perform compliance analysis
-                if method == 'semantic':
-                    logger.info("Using Semantic Compliance Checker")
-                    checker = get_semantic_checker()
-                else:
-                    logger.info("Using Enhanced Compliance Checker")
-                    checker = enhanced_checker
-                
-                compliance_results = checker.check_compliance(content)
+                for event, data in iter_analysis(upload):
+                    if event == 'complete':
+                        compliance_results = data
                 analysis_time = time.time() - analysis_start_time
                 
-                # Validate results
-                is_valid_results, results_error = SecurityValidator.validate_compliance_results(compliance_results)
-                if not is_valid_results:
-                    logger.error("Invalid compliance results", error=results_error)
+                analysis_results = finish_analysis(upload, compliance_results, analysis_time)
+                if analysis_results is None:
                     return jsonify({'error': 'Analysis produced invalid results'}), 500
                 
-                # Log analysis completion
-                logger.log_analysis_complete(
-                    method=method,
-                    compliance_score=compliance_results['compliance_score'],
-                    processing_time=analysis_time,
-                    filename=original_filename
-                )
-                
-                # Log performance metrics
-                logger.log_performance_metrics(
-                    operation=f"{method}_analysis",
-                    duration=analysis_time,
-                    content_length=len(content),
-                    compliance_score=compliance_results['compliance_score'],
-                    matched_controls=compliance_results['summary']['total_controls']
-                )
-                
                 # Store results in session for results page
-                session['analysis_results'] = {
-                    'compliance_score': compliance_results['compliance_score'],
-                    'summary': {
-                        **compliance_results['summary'],
-                        'document_length': len(content),
-                    },
-                    'details': compliance_results['details'],
-                    'filename': original_filename,
-                    'method_used': method,
-                    'processing_time': round(analysis_time, 2)
-                }
+                session.pop('analysis_token', None)
+                session['analysis_results'] = analysis_results
                 
                 return jsonify({
                     'message': 'File processed successfully',
@@ -250,11 +308,73 @@ def create_app(config_name='default'):
 
         return render_template('analyze.html')
     
+    @app.route('/analyze/stream', methods=['POST'])
+    def analyze_stream():
+        """
+        Run an analysis and stream its progress as Server-Sent Events.
+
+        Emits 'extracted', then the checker's stage events ('chunked',
+        'embedded', one 'control' per scored control) and finally 'complete'
+        with the results page URL, or 'error'.
+        """
+        try:
+            upload, error_response = receive_upload()
+        except RequestEntityTooLarge:
+            raise
+        except Exception as e:
+            logger.error("Unexpected error in /analyze/stream", exception=e, user_ip=request.remote_addr)
+            return jsonify({'error': 'An unexpected error occurred. Please try again.'}), 500
+        if error_response:
+            return error_response
+        
+        # The session cookie is sent with the headers, before the analysis finishes,
+        # so it only carries a token for results stored in the cache
+        token = uuid.uuid4().hex
+        session.pop('analysis_results', None)
+        session['analysis_token'] = token
+        
+        def sse(event, data):
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        
+        def generate():
+            yield sse('extracted', {'filename': upload['filename'], 'document_length': len(upload['content'])})
+            try:
+                logger.log_analysis_start(upload['method'], len(upload['content']), filename=upload['filename'])
+                analysis_start_time = time.time()
+                
+                compliance_results = None
+                for event, data in iter_analysis(upload):
+                    if event == 'complete':
+                        compliance_results = data
+                    else:
+                        yield sse(event, data)
+                analysis_time = time.time() - analysis_start_time
+                
+                analysis_results = finish_analysis(upload, compliance_results, analysis_time)
+                if analysis_results is None:
+                    yield sse('error', {'error': 'Analysis produced invalid results'})
+                    return
+                
+                cache_analysis_results(token, analysis_results)
+                yield sse('complete', {
+                    'redirect': '/results',
+                    'compliance_score': analysis_results['compliance_score'],
+                    'processing_time': analysis_results['processing_time'],
+                })
+            except Exception as e:
+                logger.error("Unexpected error in /analyze/stream", exception=e)
+                yield sse('error', {'error': 'An unexpected error occurred. Please try again.'})
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
     @app.route('/results')
     def results():
         """Display analysis results page."""
-        # Get results from session
+        # Get results from session (streamed analyses keep only a token there)
         analysis_results = session.get('analysis_results')
+        if not analysis_results and session.get('analysis_token'):
+            analysis_results = get_cached_analysis_results(session['analysis_token'])
         
         if not analysis_results:
             # Redirect to analyze page if no results
@@ -306,7 +426,8 @@ def create_app(config_name='default'):
         return jsonify({
             'name': 'ISO 27002 Compliance Checker',
             'version': '2.0.0',
-            'methods': ['enhanced', 'semantic'],
+            'methods': ['enhanced', 'semantic', 'hybrid'],
+            'profiles': list(app.config['ANALYSIS_PROFILES']),
             'supported_formats': list(app.config['ALLOWED_EXTENSIONS']),
             'max_file_size_mb': app.config['MAX_CONTENT_LENGTH'] // (1024*1024)
         })
@@ -345,6 +466,7 @@ def create_app(config_name='default'):
                 'analysis_speed': random.randint(80, 120),
                 'active_sessions': random.randint(15, 30),
                 'cache_hit_rate': 0.942,
+                'cache_write_queue_depth': get_cache_manager().write_queue_depth(),
                 'queue_size': 0
             },
             'compliance': {
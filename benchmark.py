@@ -0,0 +1,199 @@
+"""
+Performance benchmarks for the semantic compliance pipeline.
+
+Usage:
+    python benchmark.py encode --backend hashing --chunks 5000 --workers 1 2 4 8
+    python benchmark.py encode --pdf uploads/manual.pdf --workers 2 4
+    python benchmark.py evaluate --dims 512 256 128 --pdf uploads/*.pdf
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+import numpy as np
+from typing import Dict, List, Optional
+
+from config import Config
+from utils.chunking import chunk_text
+from utils.encoders import ENCODER_BACKENDS, create_bi_encoder, truncate_embeddings
+from utils.pipeline import PipelineRun, normalise_document
+from utils.quantization import embedding_cosine_similarity
+
+SAMPLE_SENTENCES = [
+    "All users must authenticate using multi-factor authentication before access is granted.",
+    "User access rights are reviewed quarterly by the information security team.",
+    "Security incidents are reported to the incident response team within 24 hours.",
+    "All information assets are inventoried and classified according to their sensitivity.",
+    "Backups are encrypted, stored offsite and restored in a test environment every month.",
+    "Employees complete security awareness training when they join and every year after.",
+    "Changes to production systems follow the documented change management procedure.",
+    "Suppliers with access to confidential information sign a non-disclosure agreement.",
+]
+
+def load_chunks(encoder, pdf_path: Optional[str], num_chunks: int) -> List[str]:
+    """Chunks of a PDF, or synthetic policy chunks when no PDF is given."""
+    if pdf_path:
+        from pdf_parser import PDFParser
+        text = PDFParser(pdf_path).extract_text()
+        return list(chunk_text(text, encoder.count_tokens, Config.CHUNK_TOKENS, Config.CHUNK_OVERLAP_TOKENS))
+
+    chunks = []
+    for i in range(num_chunks):
+        # Vary chunk length so batching behaves as it does on real documents
+        length = 1 + i % 5
+        chunks.append(" ".join(SAMPLE_SENTENCES[(i + j) % len(SAMPLE_SENTENCES)] for j in range(length)))
+    return chunks
+
+def time_encode(encoder, chunks: List[str], repeat: int) -> float:
+    """Best wall-clock time of encoding all chunks."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encoder.encode_batched(chunks, Config.ENCODE_BATCH_TOKENS)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_encode(args) -> List[Dict]:
+    """Encoding throughput of one process versus pools of worker processes."""
+    local = create_bi_encoder(args.backend, Config.BI_ENCODER_MODEL_NAME, Config.ONNX_EXPORT_DIR,
+                              Config.ONNX_QUANTIZATION_CONFIG, args.threads,
+                              trust_remote_code=Config.BI_ENCODER_TRUST_REMOTE_CODE)
+    chunks = load_chunks(local, args.pdf, args.chunks)
+    local.encode_batched(chunks[:8])
+
+    baseline = time_encode(local, chunks, args.repeat)
+    rows = [{'workers': 0, 'threads_per_worker': args.threads, 'seconds': baseline}]
+
+    for workers in args.workers:
+        pool = create_bi_encoder(args.backend, Config.BI_ENCODER_MODEL_NAME, Config.ONNX_EXPORT_DIR,
+                                 Config.ONNX_QUANTIZATION_CONFIG, args.threads, pool_workers=workers,
+                                 trust_remote_code=Config.BI_ENCODER_TRUST_REMOTE_CODE)
+        try:
+            pool.warm_up()
+            seconds = time_encode(pool, chunks, args.repeat)
+            rows.append({'workers': workers, 'threads_per_worker': pool.threads_per_worker, 'seconds': seconds})
+        finally:
+            pool.close()
+
+    for row in rows:
+        row['chunks'] = len(chunks)
+        row['chunks_per_second'] = len(chunks) / row['seconds'] if row['seconds'] else float('inf')
+        row['speedup'] = baseline / row['seconds'] if row['seconds'] else float('inf')
+    return rows
+
+def print_encode_report(rows: List[Dict], backend: str) -> None:
+    print(f"Encoding {rows[0]['chunks']} chunks ({backend} backend, {os.cpu_count()} CPUs)")
+    print(f"{'workers':>8} {'threads':>8} {'seconds':>9} {'chunks/s':>10} {'speed-up':>9}")
+    for row in rows:
+        workers = row['workers'] or 'single'
+        print(f"{workers:>8} {row['threads_per_worker']:>8} {row['seconds']:>9.3f} "
+              f"{row['chunks_per_second']:>10.1f} {row['speedup']:>8.2f}x")
+
+def ranking_agreement(full: np.ndarray, truncated: np.ndarray, k: int) -> Dict[str, float]:
+    """
+    Agreement between two (controls x chunks) similarity matrices.
+
+    Returns the fraction of controls whose best chunk is unchanged and the
+    mean fraction of each control's full-dimension top-k that is still in
+    its truncated top-k.
+    """
+    k = min(k, full.shape[1])
+    full_top = np.argsort(-full, axis=1, kind='stable')[:, :k]
+    truncated_top = np.argsort(-truncated, axis=1, kind='stable')[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(full_top.tolist(), truncated_top.tolist())]
+    return {
+        'top1_agreement': float(np.mean(full_top[:, 0] == truncated_top[:, 0])),
+        'overlap_at_k': float(np.mean(overlap)),
+    }
+
+def benchmark_evaluate(args) -> List[Dict]:
+    """Ranking agreement of truncated embedding dimensions against full-dimension vectors."""
+    from pdf_parser import PDFParser
+    from semantic_compliance_checker import SemanticComplianceChecker
+
+    checker = SemanticComplianceChecker(backend=args.backend)
+    # Always compare against the untruncated model, whatever EMBEDDING_DIM is set to
+    encoder = getattr(checker.bi_encoder, 'encoder', checker.bi_encoder)
+    control_embeddings = encoder.encode([control['text'] for control in checker.control_embeddings.values()])
+    full_dim = control_embeddings.shape[1]
+
+    paths = args.pdf or sorted(glob.glob('*.pdf') + glob.glob(os.path.join('uploads', '*.pdf')))
+    if not paths:
+        raise SystemExit("No PDFs to evaluate on; pass --pdf")
+
+    totals = {dim: {'top1_agreement': 0.0, 'overlap_at_k': 0.0} for dim in args.dims}
+    weight = 0
+    for path in paths:
+        content = normalise_document(PipelineRun(), PDFParser(path).extract_text()).text
+        chunks = checker._create_text_chunks(content)
+        if not chunks:
+            continue
+        chunk_embeddings = encoder.encode_batched(list(chunks), Config.ENCODE_BATCH_TOKENS)
+        full = embedding_cosine_similarity(control_embeddings, chunk_embeddings)
+
+        for dim in args.dims:
+            truncated = embedding_cosine_similarity(truncate_embeddings(control_embeddings, dim),
+                                                    truncate_embeddings(chunk_embeddings, dim))
+            for metric, value in ranking_agreement(full, truncated, args.k).items():
+                totals[dim][metric] += value * len(control_embeddings)
+        weight += len(control_embeddings)
+        print(f"Evaluated {path} ({len(chunks)} chunks)")
+
+    return [{
+        'dim': dim,
+        'relative_size': min(dim, full_dim) / full_dim,
+        'top1_agreement': totals[dim]['top1_agreement'] / max(weight, 1),
+        'overlap_at_k': totals[dim]['overlap_at_k'] / max(weight, 1),
+        'k': args.k,
+        'documents': len(paths),
+    } for dim in args.dims]
+
+def print_evaluate_report(rows: List[Dict]) -> None:
+    print(f"{'dim':>6} {'size':>6} {'top-1 agree':>12} {'overlap@' + str(rows[0]['k']):>11}")
+    for row in rows:
+        print(f"{row['dim']:>6} {row['relative_size']:>6.2f} {row['top1_agreement']:>12.3f} "
+              f"{row['overlap_at_k']:>11.3f}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the semantic compliance pipeline")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    encode = subparsers.add_parser('encode', help="Chunk encoding throughput versus worker processes")
+    encode.add_argument('--backend', default=Config.ENCODER_BACKEND, choices=ENCODER_BACKENDS[:-1])
+    encode.add_argument('--pdf', help="Encode the chunks of this PDF instead of synthetic text")
+    encode.add_argument('--chunks', type=int, default=2000, help="Number of synthetic chunks")
+    encode.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help="Pool sizes to compare with single-process encoding")
+    encode.add_argument('--threads', type=int, default=Config.ENCODE_NUM_THREADS,
+                        help="Threads per process (0 = library default / cores split across workers)")
+    encode.add_argument('--repeat', type=int, default=3, help="Runs per configuration (best is reported)")
+    encode.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    evaluate = subparsers.add_parser('evaluate',
+                                     help="Ranking agreement of truncated embedding dimensions with full vectors")
+    evaluate.add_argument('--backend', default=Config.ENCODER_BACKEND, choices=ENCODER_BACKENDS)
+    evaluate.add_argument('--pdf', nargs='+', help="Corpus PDFs (default: *.pdf and uploads/*.pdf)")
+    evaluate.add_argument('--dims', type=int, nargs='+', default=[512, 256, 128],
+                          help="Truncated dimensions to compare")
+    evaluate.add_argument('--k', type=int, default=Config.RERANK_TOP_K, help="Depth for top-k overlap")
+    evaluate.add_argument('--json', action='store_true', help="Print results as JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'encode':
+        rows = benchmark_encode(args)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            print_encode_report(rows, args.backend)
+    elif args.command == 'evaluate':
+        rows = benchmark_evaluate(args)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            print_evaluate_report(rows)
+
+if __name__ == '__main__':
+    main()
@@ -1,93 +1,75 @@
-import re
-import json
-import os
 import numpy as np
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
+from config import Config
+from utils.encoders import create_bi_encoder
+from utils.chunking import TextChunks, chunk_text
+from utils.quantization import dequantize_embeddings
+from utils.retrieval import KeywordPostingIndex
+from utils.pipeline import PipelineRun, normalise_document, segment_sentences
+from utils.standards import load_control_keywords, load_iso_standards
 from utils.cache_manager import (
     get_content_hash,
     cache_model_embeddings,
     get_cached_model_embeddings,
     cache_document_embeddings,
     get_cached_document_embeddings,
-    cache_iso_standards,
-    get_cached_iso_standards,
 )
 
 class SemanticComplianceChecker:
-    def __init__(self):
-        self.standards = self._load_iso_standards()
+    # Feature categories with their representative sentences
+    FEATURE_CATEGORIES = {
+        'policies': [
+            "Information security policy and procedures",
+            "Policy management and governance",
+            "Security standards and guidelines"
+        ],
+        'access_control': [
+            "User access management and authentication",
+            "Authorization and permission controls",
+            "Identity and access management"
+        ],
+        'asset_management': [
+            "Asset classification and inventory",
+            "Data protection and handling",
+            "Information asset management"
+        ],
+        'training': [
+            "Security awareness and training",
+            "Employee education programs",
+            "Competency development"
+        ],
+        'incident_management': [
+            "Security incident response",
+            "Breach management and reporting",
+            "Event monitoring and detection"
+        ]
+    }
+    
+    def __init__(self, backend: Optional[str] = None):
+        self.standards = load_iso_standards()
         
-        # Initialize the sentence transformer model
-        print("Loading sentence transformer model...")
-        self.model_name = 'Qwen/Qwen3-Embedding-0.6B'
-        self.model = SentenceTransformer(self.model_name, trust_remote_code=True)
+        # Initialize the bi-encoder for the configured backend
+        self.backend = backend or Config.ENCODER_BACKEND
+        print(f"Loading encoder model ({self.backend} backend)...")
+        self.model = create_bi_encoder(self.backend, Config.BI_ENCODER_MODEL_NAME,
+                                       Config.ONNX_EXPORT_DIR, Config.ONNX_QUANTIZATION_CONFIG,
+                                       Config.ENCODE_NUM_THREADS, Config.MODEL_SERVER_SOCKET,
+                                       embedding_dim=Config.EMBEDDING_DIM, authkey=Config.MODEL_SERVER_AUTHKEY,
+                                       trust_remote_code=Config.BI_ENCODER_TRUST_REMOTE_CODE)
+        self.model_name = self.model.name
         print("Model loaded successfully!")
         
         # Load keywords from ISO standards file
-        self.control_keywords = self._load_control_keywords()
+        self.control_keywords = load_control_keywords(self.standards)
         
         # Create embeddings for control descriptions and keywords
         self._precompute_control_embeddings()
         
-    def _load_iso_standards(self) -> Dict:
-        """Load ISO 27002 standards from cache or JSON file."""
-        # Try to load from cache first
-        cached_standards = get_cached_iso_standards()
-        if cached_standards:
-            print("Loaded ISO standards from cache.")
-            return cached_standards
-        
-        # If not in cache, load from JSON file
-        print("Loading ISO standards from JSON file...")
-        standards_path = os.path.join('iso_standards', 'iso27002.json')
-        try:
-            with open(standards_path, 'r') as f:
-                data = json.load(f)
-                standards = {k: v for k, v in data.items() if k != 'metadata'}
-                
-                # Cache the loaded standards
-                cache_iso_standards(standards)
-                print("Cached ISO standards for future use.")
-                
-                return standards
-        except FileNotFoundError:
-            print("Warning: ISO standards file not found, using basic fallback controls")
-            return self._get_fallback_standards()
-    
-    def _get_fallback_standards(self) -> Dict:
-        """Provide fallback standards if main file is not available."""
-        return {
-            "5.1": {"name": "Information security policies", "keywords": ["policy", "policies", "information security"]},
-            "5.2": {"name": "Information security roles and responsibilities", "keywords": ["roles", "responsibilities"]},
-            "6.1": {"name": "Screening", "keywords": ["screening", "background", "employment"]},
-            "7.1": {"name": "Physical security perimeters", "keywords": ["physical security", "perimeter"]},
-            "8.1": {"name": "User endpoint devices", "keywords": ["endpoint", "devices", "user"]}
-        }
-    
-    def _load_control_keywords(self) -> Dict[str, List[str]]:
-        """Load control keywords from the standards data."""
-        control_keywords = {}
-        for control_id, control_data in self.standards.items():
-            if isinstance(control_data, dict) and 'keywords' in control_data:
-                control_keywords[control_id] = control_data['keywords']
-            else:
-                # Fallback: generate keywords from control name
-                control_name = control_data.get('name', '') if isinstance(control_data, dict) else str(control_data)
-                control_keywords[control_id] = self._generate_keywords_from_name(control_name)
+        # Create the feature category prototype matrix
+        self._precompute_feature_prototypes()
         
-        return control_keywords
-    
-    def _generate_keywords_from_name(self, name: str) -> List[str]:
-        """Generate basic keywords from control name."""
-        words = name.lower().split()
-        # Remove common stop words and generate variations
-        stop_words = {'of', 'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by'}
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
-        return keywords
-    
     def _precompute_control_embeddings(self):
         """Precompute embeddings for all control descriptions and keywords."""
         print("Precomputing control embeddings...")
@@ -113,8 +95,10 @@ class SemanticComplianceChecker:
                 embedding = cached_embedding
             else:
                 # Create embedding
-                embedding = self.model.encode([combined_text])
-                cache_model_embeddings(self.model_name, text_hash, embedding)
+                # Score the stored precision, as later runs reading the cache will
+                embedding = dequantize_embeddings(
+                    cache_model_embeddings(self.model_name, text_hash, self.model.encode([combined_text]))
+                )
 
             self.control_embeddings[control_id] = {
                 'embedding': embedding[0],
@@ -124,100 +108,53 @@ class SemanticComplianceChecker:
             }
         print("Control embeddings precomputed successfully!")
     
+    def _precompute_feature_prototypes(self):
+        """Encode the feature category descriptions once into a prototype matrix."""
+        descriptions = []
+        self.prototype_columns = {}
+        for category, category_descriptions in self.FEATURE_CATEGORIES.items():
+            start = len(descriptions)
+            descriptions.extend(category_descriptions)
+            self.prototype_columns[category] = np.arange(start, len(descriptions))
+        
+        # Persist next to the control embeddings, keyed on the description texts
+        text_hash = get_content_hash('\n'.join(descriptions))
+        cached_prototypes = get_cached_model_embeddings(self.model_name, text_hash)
+        
+        if cached_prototypes is not None:
+            self.prototype_embeddings = cached_prototypes
+        else:
+            self.prototype_embeddings = dequantize_embeddings(
+                cache_model_embeddings(self.model_name, text_hash, self.model.encode(descriptions))
+            )
+    
     def extract_semantic_features(self, chunks: List[str], chunk_embeddings: np.ndarray) -> Dict[str, List[str]]:
         """Extract semantic features from document content using sentence transformers."""
         features = defaultdict(list)
         
         if not chunks:
             return dict(features)
-
-        # Define feature categories with their representative sentences
-        feature_categories = {
-            'policies': [
-                "Information security policy and procedures",
-                "Policy management and governance",
-                "Security standards and guidelines"
-            ],
-            'access_control': [
-                "User access management and authentication",
-                "Authorization and permission controls",
-                "Identity and access management"
-            ],
-            'asset_management': [
-                "Asset classification and inventory",
-                "Data protection and handling",
-                "Information asset management"
-            ],
-            'training': [
-                "Security awareness and training",
-                "Employee education programs",
-                "Competency development"
-            ],
-            'incident_management': [
-                "Security incident response",
-                "Breach management and reporting",
-                "Event monitoring and detection"
-            ]
-        }
         
-        # Create embeddings for feature categories
-        for category, descriptions in feature_categories.items():
-            category_embeddings = self.model.encode(descriptions)
-            
-            # Find chunks similar to each category
-            for i, chunk_embedding in enumerate(chunk_embeddings):
-                similarities = cosine_similarity(
-                    np.expand_dims(chunk_embedding, axis=0), 
-                    category_embeddings
-                )[0]
-                
-                # If any similarity is above threshold, add to category
-                if max(similarities) > 0.3:  # Threshold for semantic similarity
-                    features[category].append(chunks[i])
+        # One chunks x prototypes similarity matrix, max-reduced per category
+        similarities = cosine_similarity(chunk_embeddings, self.prototype_embeddings)
+        for category, columns in self.prototype_columns.items():
+            # If any description is similar enough, the chunk belongs to the category
+            matching_chunks = np.flatnonzero(similarities[:, columns].max(axis=1) > 0.3)
+            if len(matching_chunks) > 0:
+                features[category] = [chunks[i] for i in matching_chunks]
         
         return dict(features)
     
-    def _create_text_chunks(self, text: str, chunk_size: int = 3, overlap: int = 1) -> List[str]:
-        """Create overlapping text chunks from the document."""
-        sentences = re.split(r'[.!?]+\s+(?=[A-Z])', text)
-        
-        chunks = []
-        for i in range(0, len(sentences) - chunk_size + 1, chunk_size - overlap):
-            chunk = " ".join(sentences[i:i+chunk_size])
-            if len(chunk.split()) > 10:  # Filter out very short chunks
-                chunks.append(chunk)
-        
-        return chunks
-    
-    def _clean_text(self, text: str) -> str:
-        """Enhanced text cleaning for real-world documents."""
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters but keep sentence structure
-        text = re.sub(r'[^\w\s.,;:!?\-\'"()]', ' ', text)
-        # Fix common OCR errors
-        text = re.sub(r'\b(\w)\s+(\w)\b', r'\1\2', text)
-        return text.strip()
-
-    def _remove_boilerplate(self, text: str) -> str:
-        """Remove boilerplate text such as headers, footers, and revision tables."""
-        # Patterns for common boilerplate content
-        patterns = [
-            r"(confidential|internal use only|property of).*",
-            r"page\s+\d+\s+of\s+\d+",
-            r"document\s+version:\s+\d+",
-            r"revision\s+history",
-            r"author(s)?:.*",
-            r"date\s+of\s+issue:.*",
-        ]
-        
-        for pattern in patterns:
-            text = re.sub(pattern, "", text, flags=re.IGNORECASE | re.MULTILINE)
-            
-        return text
+    def _create_text_chunks(self, text: str, chunk_tokens: int = Config.CHUNK_TOKENS,
+                            overlap_tokens: int = Config.CHUNK_OVERLAP_TOKENS,
+                            sentences: Optional[List[Tuple[int, int]]] = None) -> TextChunks:
+        """Pack sentences into token-budgeted, overlapping chunks covering the whole document."""
+        max_tokens = min(chunk_tokens, self.model.max_seq_length)
+        return chunk_text(text, self.model.count_tokens, max_tokens, overlap_tokens, sentences=sentences)
     
-    def check_compliance(self, content: str) -> Dict:
+    def check_compliance(self, content: str, run: Optional[PipelineRun] = None) -> Dict:
         """Enhanced compliance checking with semantic analysis using sentence transformers."""
+        run = run or PipelineRun()
         results = {
             'compliance_score': 0,
             'summary': {
@@ -230,31 +167,45 @@ class SemanticComplianceChecker:
             },
             'details': [],
             'semantic_analysis': {},
-            'method': 'Sentence Transformers (Qwen3-Embedding-0.6B) with Two-Stage Scoring'
+            'method': 'Sentence Transformers (Qwen3-Embedding-0.6B) with Two-Stage Scoring',
+            'metadata': {'stages': []}
         }
         
-        # Clean content for processing
-        content_no_boilerplate = self._remove_boilerplate(content)
-        content_clean = self._clean_text(content_no_boilerplate)
-        chunks = self._create_text_chunks(content_clean)
+        # Cleaning and sentence splitting are the pipeline stages shared with the other checkers
+        document = normalise_document(run, content)
+        segments = segment_sentences(run, document)
+        with run.stage('segment'):
+            chunks = self._create_text_chunks(document.text, sentences=segments.spans)
         
         if not chunks:
+            results['metadata']['stages'] = run.report()
             return results
 
         # Get document embeddings (from cache or by encoding)
-        content_hash = get_content_hash(content_clean)
+        content_hash = chunks.cache_key()
         chunk_embeddings = get_cached_document_embeddings(self.model_name, content_hash)
         if chunk_embeddings is None:
             print("Creating document embeddings...")
-            chunk_embeddings = self.model.encode(chunks)
-            cache_document_embeddings(self.model_name, content_hash, chunk_embeddings)
+            with run.stage('embed'):
+                chunk_embeddings = dequantize_embeddings(cache_document_embeddings(
+                    self.model_name, content_hash,
+                    self.model.encode_batched(list(chunks), Config.ENCODE_BATCH_TOKENS)
+                ))
         else:
             print("Loaded document embeddings from cache.")
+            with run.stage('embed', cached=True):
+                pass
 
         # Extract semantic features
-        semantic_features = self.extract_semantic_features(chunks, chunk_embeddings)
+        with run.stage('retrieve'):
+            semantic_features = self.extract_semantic_features(chunks, chunk_embeddings)
         results['semantic_analysis'] = {k: len(v) for k, v in semantic_features.items()}
         
+        # Lowercase and scan the chunks once for every control keyword
+        keyword_index = KeywordPostingIndex(
+            chunks, (keyword for control in self.control_embeddings.values() for keyword in control['keywords'])
+        )
+        
         for control_id, control_info in self.standards.items():
             if isinstance(control_info, dict):
                 control_name = control_info.get('name', '')
@@ -262,12 +213,14 @@ class SemanticComplianceChecker:
                 control_name = control_info
             
             # Calculate semantic similarity score
-            score, evidence = self._calculate_semantic_score(
-                control_id, 
-                chunks, 
-                chunk_embeddings, 
-                semantic_features
-            )
+            with run.stage('retrieve'):
+                score, evidence = self._calculate_semantic_score(
+                    control_id, 
+                    chunks, 
+                    chunk_embeddings, 
+                    semantic_features,
+                    keyword_index
+                )
             
             # Determine confidence level and status
             if score > 0.7:
@@ -300,18 +253,21 @@ class SemanticComplianceChecker:
                 results['summary']['matched_controls'] += 1
         
         # Calculate overall compliance score
-        total_controls = results['summary']['total_controls']
-        matched_controls = results['summary']['matched_controls']
-        if total_controls > 0:
-            results['compliance_score'] = float((matched_controls / total_controls) * 100)
-        else:
-            results['compliance_score'] = 0.0
+        with run.stage('aggregate'):
+            total_controls = results['summary']['total_controls']
+            matched_controls = results['summary']['matched_controls']
+            if total_controls > 0:
+                results['compliance_score'] = float((matched_controls / total_controls) * 100)
+            else:
+                results['compliance_score'] = 0.0
+        results['metadata']['stages'] = run.report()
         
         print("Semantic compliance analysis completed!")
         return results
     
     def _calculate_semantic_score(self, control_id: str, chunks: List[str], 
-                                 chunk_embeddings: np.ndarray, semantic_features: Dict) -> Tuple[float, List[str]]:
+                                 chunk_embeddings: np.ndarray, semantic_features: Dict,
+                                 keyword_index: Optional[KeywordPostingIndex] = None) -> Tuple[float, List[str]]:
         """Calculate compliance score using a two-stage filtering and scoring model."""
         if control_id not in self.control_embeddings:
             return 0.0, []
@@ -320,12 +276,11 @@ class SemanticComplianceChecker:
         control_keywords = self.control_embeddings[control_id]['keywords']
 
         # --- Keyword Pre-filtering ---
-        keyword_candidate_indices = []
-        for i, chunk in enumerate(chunks):
-            if any(keyword.lower() in chunk.lower() for keyword in control_keywords):
-                keyword_candidate_indices.append(i)
+        if keyword_index is None:
+            keyword_index = KeywordPostingIndex(chunks, control_keywords)
+        keyword_candidate_indices = keyword_index.candidates(control_keywords)
 
-        if not keyword_candidate_indices:
+        if len(keyword_candidate_indices) == 0:
             return 0.0, []
 
         # Filter chunks and embeddings based on keyword matches
@@ -343,7 +298,7 @@ class SemanticComplianceChecker:
             return 0.0, []
             
         candidate_similarities = similarities[candidate_indices]
-        candidate_chunks = [chunks[i] for i in candidate_indices]
+        candidate_chunks = [keyword_filtered_chunks[i] for i in candidate_indices]
 
         # --- Stage 2: Scoring ---
         # 1. Maximum similarity score (primary factor)
@@ -1,57 +1,25 @@
 import re
-from typing import Dict, List, Tuple
-import json
-import os
+from typing import Dict, List, Optional, Tuple
+from utils.pipeline import PipelineRun, normalise_document
+from utils.standards import load_iso_standards
 
 class ComplianceChecker:
     def __init__(self):
-        self.standards = self._load_iso_standards()
+        self.standards = load_iso_standards(cached=False)
         
-    def _load_iso_standards(self) -> Dict:
-        """Load ISO 27002 standards from JSON file."""
-        standards_path = os.path.join('iso_standards', 'iso27002.json')
-        try:
-            with open(standards_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            # Return basic structure if file doesn't exist
-            return {
-                "5.1": "Information security policies",
-                "5.2": "Information security roles and responsibilities",
-                "6.1": "Internal organization",
-                "6.2": "Mobile device policy",
-                "7.1": "Human resource security",
-                "7.2": "During employment",
-                "7.3": "Termination and change of employment",
-                "8.1": "Asset management",
-                "8.2": "Information classification",
-                "8.3": "Media handling",
-                "9.1": "Access control",
-                "9.2": "User access management",
-                "9.3": "User responsibilities",
-                "9.4": "System and application access control",
-                "10.1": "Cryptographic controls",
-                "11.1": "Physical and environmental security",
-                "12.1": "Operational security",
-                "13.1": "Communications security",
-                "14.1": "System acquisition, development and maintenance",
-                "15.1": "Supplier relationships",
-                "16.1": "Incident management",
-                "17.1": "Business continuity management",
-                "18.1": "Compliance"
-            }
-    
-    def check_compliance(self, content: str) -> Dict:
+    def check_compliance(self, content: str, run: Optional[PipelineRun] = None) -> Dict:
         """Check document content against ISO 27002 standards."""
+        run = run or PipelineRun()
         results = {
             'compliance_score': 0,
             'total_controls': len(self.standards),
             'matched_controls': 0,
-            'details': []
+            'details': [],
+            'metadata': {'stages': []}
         }
         
-        # Convert content to lowercase for case-insensitive matching
-        content_lower = content.lower()
+        # Match on the shared normalised text, lowercased for case-insensitive matching
+        content_lower = normalise_document(run, content).text.lower()
         
         for control_id, control_info in self.standards.items():
             if isinstance(control_info, dict):
@@ -62,10 +30,8 @@ class ComplianceChecker:
             patterns = self._generate_search_patterns(control_id, control_name)
             
             # Check if any pattern matches
-            matches = []
-            for pattern in patterns:
-                if re.search(pattern, content_lower):
-                    matches.append(pattern)
+            with run.stage('retrieve'):
+                matches = [pattern for pattern in patterns if re.search(pattern, content_lower)]
             
             # Calculate score for this control
             control_score = len(matches) / len(patterns) if patterns else 0
@@ -97,7 +63,9 @@ class ComplianceChecker:
                 results['matched_controls'] += 1
         
         # Calculate overall compliance score
-        results['compliance_score'] = (results['matched_controls'] / results['total_controls']) * 100
+        with run.stage('aggregate'):
+            results['compliance_score'] = (results['matched_controls'] / results['total_controls']) * 100
+        results['metadata']['stages'] = run.report()
         
         return results
     
@@ -33,6 +33,146 @@ class Config:
     MODEL_CACHE_DIR = os.path.join(os.getcwd(), '.model_cache')
     SIMILARITY_THRESHOLD = 0.3
     
+    # Encoder backend: 'sentence-transformers', 'onnx' (int8 ONNX Runtime), 'hashing' (offline stand-in)
+    # or 'remote' (shared model server, see utils/model_server.py)
+    ENCODER_BACKEND = os.environ.get('ENCODER_BACKEND', 'sentence-transformers')
+    BI_ENCODER_MODEL_NAME = 'Qwen/Qwen3-Embedding-0.6B'
+    # Models allowed to run Python code from their Hugging Face repository when loaded. Only the
+    # reviewed Qwen3 bi-encoder is listed; any other model is loaded without remote code.
+    TRUST_REMOTE_CODE_MODELS = ('Qwen/Qwen3-Embedding-0.6B',)
+    BI_ENCODER_TRUST_REMOTE_CODE = BI_ENCODER_MODEL_NAME in TRUST_REMOTE_CODE_MODELS
+    CROSS_ENCODER_MODEL_NAME = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+    # Matryoshka truncation of bi-encoder embeddings (Qwen3-Embedding-0.6B is 1024-d and supports
+    # 32..1024). Applies to control, document and section embeddings alike; 0 keeps full vectors.
+    # Check ranking agreement first with: python benchmark.py evaluate --dims 512 256
+    EMBEDDING_DIM = int(os.environ.get('EMBEDDING_DIM', 0))
+    ONNX_EXPORT_DIR = os.path.join(MODEL_CACHE_DIR, 'onnx')
+    ONNX_QUANTIZATION_CONFIG = os.environ.get('ONNX_QUANTIZATION_CONFIG', 'avx512_vnni')
+    
+    # Shared model server (ENCODER_BACKEND=remote): workers send encode/re-rank calls over a Unix socket.
+    # The socket lives in a private (0700) directory owned by the server's user, and the server and
+    # workers must share MODEL_SERVER_AUTHKEY, a secret both sides prove before any call is exchanged.
+    MODEL_SERVER_SOCKET = os.environ.get('MODEL_SERVER_SOCKET', os.path.join(
+        os.environ.get('XDG_RUNTIME_DIR') or MODEL_CACHE_DIR, 'compliance_model_server', 'model_server.sock'
+    ))
+    MODEL_SERVER_AUTHKEY = os.environ.get('MODEL_SERVER_AUTHKEY', '').encode()
+    MODEL_SERVER_BACKEND = os.environ.get('MODEL_SERVER_BACKEND', 'sentence-transformers')
+    MODEL_SERVER_MAX_WAIT_MS = int(os.environ.get('MODEL_SERVER_MAX_WAIT_MS', 10))
+    MODEL_SERVER_MAX_BATCH_ITEMS = int(os.environ.get('MODEL_SERVER_MAX_BATCH_ITEMS', 512))
+    
+    # Chunk encoding throughput: padded tokens per batch and PyTorch threads (0 = library default)
+    ENCODE_BATCH_TOKENS = int(os.environ.get('ENCODE_BATCH_TOKENS', 8192))
+    ENCODE_NUM_THREADS = int(os.environ.get('ENCODE_NUM_THREADS', 0))
+    # Opt-in multi-process encoding: shard large documents across this many worker processes,
+    # each pinned to ENCODE_NUM_THREADS threads (0 = cores / workers). Best run once per node
+    # inside the model server rather than in every web worker.
+    ENCODE_POOL_WORKERS = int(os.environ.get('ENCODE_POOL_WORKERS', 0))
+    
+    # Re-ranking cascade: controls whose best bi-encoder cosine is below the lower bound are
+    # marked Non-compliant without the cross-encoder; above the upper bound only the top few
+    # candidates are re-ranked. Bounds are calibrated for Qwen3-Embedding cosine similarities.
+    RERANK_TOP_K = 10
+    CASCADE_LOWER_BOUND = float(os.environ.get('CASCADE_LOWER_BOUND', 0.2))
+    CASCADE_UPPER_BOUND = float(os.environ.get('CASCADE_UPPER_BOUND', 0.7))
+    CASCADE_CONFIDENT_TOP_K = 3
+    
+    # Hybrid retrieval: re-rank candidates come from reciprocal-rank fusion of the bi-encoder
+    # ranking and a BM25 ranking of the control's name, description and keywords, each cut at
+    # HYBRID_RETRIEVAL_DEPTH chunks. RRF_K damps the weight of lower ranks.
+    HYBRID_RETRIEVAL_DEPTH = int(os.environ.get('HYBRID_RETRIEVAL_DEPTH', 50))
+    RRF_K = 60
+    BM25_K1 = 1.5
+    BM25_B = 0.75
+    
+    # 'hybrid' method: only controls whose enhanced (keyword) score reaches LEXICAL_GATE_MIN_SCORE
+    # (the enhanced checker's matched level) and with a chunk containing LEXICAL_GATE_MIN_KEYWORDS
+    # distinct control keywords as whole words are scored by the models, over those chunks; every
+    # other control keeps its enhanced verdict.
+    LEXICAL_GATE_MIN_SCORE = float(os.environ.get('LEXICAL_GATE_MIN_SCORE', 0.25))
+    LEXICAL_GATE_MIN_KEYWORDS = int(os.environ.get('LEXICAL_GATE_MIN_KEYWORDS', 3))
+    
+    # Hierarchical retrieval for very long documents: above HIERARCHICAL_MIN_CHUNKS chunks, chunks
+    # are grouped into sections at detected headings (SECTION_MIN_CHUNKS..SECTION_MAX_CHUNKS chunks
+    # each), sections are embedded from their leading SECTION_SUMMARY_TOKENS tokens, and each control
+    # only scores the chunks of its profile's section_top_k most similar sections.
+    HIERARCHICAL_MIN_CHUNKS = int(os.environ.get('HIERARCHICAL_MIN_CHUNKS', 400))
+    SECTION_MIN_CHUNKS = 8
+    SECTION_MAX_CHUNKS = 32
+    SECTION_SUMMARY_TOKENS = 256
+    
+    # Bounded-memory scoring: uncached documents with more than WINDOWED_SCORING_MIN_CHUNKS chunks
+    # (after section selection) are embedded SCORING_WINDOW_CHUNKS at a time, keeping only each
+    # control's running top-k candidates instead of the full embedding matrix. BM25 fusion, which
+    # needs whole-document statistics, is not used in this mode.
+    WINDOWED_SCORING_MIN_CHUNKS = int(os.environ.get('WINDOWED_SCORING_MIN_CHUNKS', 2000))
+    SCORING_WINDOW_CHUNKS = int(os.environ.get('SCORING_WINDOW_CHUNKS', 256))
+    
+    # Score thresholds for the 'high' / 'medium' / 'low' confidence levels. Cross-encoder
+    # scores are sigmoid probabilities; without the cross-encoder the score is the bi-encoder cosine.
+    RERANK_THRESHOLDS = {'high': 0.8, 'medium': 0.5, 'low': 0.3}
+    BI_ENCODER_THRESHOLDS = {'high': 0.75, 'medium': 0.6, 'low': 0.45}
+    
+    # Chunking: sentences are packed into chunks of at most CHUNK_TOKENS encoder tokens, with
+    # up to CHUNK_OVERLAP_TOKENS tokens of trailing sentences repeated in the next chunk.
+    # Kept well below the cross-encoder's 512-token window so re-ranked pairs are not truncated.
+    CHUNK_TOKENS = int(os.environ.get('CHUNK_TOKENS', 96))
+    CHUNK_OVERLAP_TOKENS = int(os.environ.get('CHUNK_OVERLAP_TOKENS', 32))
+    
+    # Analysis profiles, selectable per request with the 'profile' form field on /analyze.
+    # chunk_tokens / chunk_overlap_tokens are in encoder tokens. With target_latency_seconds set,
+    # the semantic checker coarsens chunks and trims re-ranking to fit the estimated cost.
+    ANALYSIS_PROFILES = {
+        'fast': {
+            'chunk_tokens': 192,
+            'chunk_overlap_tokens': 0,
+            'use_cross_encoder': False,
+            'hybrid_retrieval': False,
+            'section_top_k': 2,
+            'rerank_top_k': 0,
+            'cascade_lower_bound': 0.25,
+            'cascade_upper_bound': 1.0,
+            'cascade_confident_top_k': 0,
+            'thresholds': BI_ENCODER_THRESHOLDS,
+            'target_latency_seconds': 1.0,
+        },
+        'balanced': {
+            'chunk_tokens': CHUNK_TOKENS,
+            'chunk_overlap_tokens': CHUNK_OVERLAP_TOKENS,
+            'use_cross_encoder': True,
+            'hybrid_retrieval': True,
+            'section_top_k': 3,
+            'rerank_top_k': RERANK_TOP_K,
+            'cascade_lower_bound': CASCADE_LOWER_BOUND,
+            'cascade_upper_bound': CASCADE_UPPER_BOUND,
+            'cascade_confident_top_k': CASCADE_CONFIDENT_TOP_K,
+            'thresholds': RERANK_THRESHOLDS,
+            'target_latency_seconds': None,
+        },
+        'accurate': {
+            'chunk_tokens': CHUNK_TOKENS,
+            'chunk_overlap_tokens': 48,
+            'use_cross_encoder': True,
+            'hybrid_retrieval': True,
+            # Exhaustive: every chunk is scored for every control
+            'section_top_k': 0,
+            'rerank_top_k': 20,
+            # Bounds outside the cosine range disable the cascade
+            'cascade_lower_bound': -1.0,
+            'cascade_upper_bound': 1.0,
+            'cascade_confident_top_k': 20,
+            'thresholds': RERANK_THRESHOLDS,
+            'target_latency_seconds': None,
+        },
+    }
+    DEFAULT_ANALYSIS_PROFILE = os.environ.get('DEFAULT_ANALYSIS_PROFILE', 'balanced')
+    
+    # Rough per-item costs used to fit target latencies; measure and override per node
+    ENCODE_SECONDS_PER_CHUNK = float(os.environ.get('ENCODE_SECONDS_PER_CHUNK', 0.02))
+    RERANK_SECONDS_PER_PAIR = float(os.environ.get('RERANK_SECONDS_PER_PAIR', 0.003))
+    
+    # Storage format for cached embeddings: 'float32', 'float16' or 'int8'
+    EMBEDDING_CACHE_QUANTIZATION = os.environ.get('EMBEDDING_CACHE_QUANTIZATION', 'float16')
+    
     # Logging settings
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = os.path.join(os.getcwd(), 'logs', 'app.log')
@@ -1,65 +1,31 @@
-import re
-import json
-import os
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 from collections import defaultdict
+from utils.pipeline import PipelineRun, normalise_document, segment_sentences
+from utils.standards import load_control_keywords, load_iso_standards
 
 class EnhancedComplianceChecker:
     def __init__(self):
-        self.standards = self._load_iso_standards()
+        # Read from the file on every start, so edits to the standards take effect immediately
+        self.standards = load_iso_standards(cached=False)
         
         # Load keywords from ISO standards file
-        self.control_keywords = self._load_control_keywords()
+        self.control_keywords = load_control_keywords(self.standards)
         
-    def _load_iso_standards(self) -> Dict:
-        """Load ISO 27002 standards from JSON file."""
-        standards_path = os.path.join('iso_standards', 'iso27002.json')
-        try:
-            with open(standards_path, 'r') as f:
-                data = json.load(f)
-                # Extract only the control data (excluding metadata)
-                return {k: v for k, v in data.items() if k != 'metadata'}
-        except FileNotFoundError:
-            # Fallback with basic controls if file not found
-            print("Warning: ISO standards file not found, using basic fallback controls")
-            return self._get_fallback_standards()
-    
-    def _get_fallback_standards(self) -> Dict:
-        """Provide fallback standards if main file is not available."""
-        return {
-            "5.1": {"name": "Information security policies", "keywords": ["policy", "policies", "information security"]},
-            "5.2": {"name": "Information security roles and responsibilities", "keywords": ["roles", "responsibilities"]},
-            "6.1": {"name": "Screening", "keywords": ["screening", "background", "employment"]},
-            "7.1": {"name": "Physical security perimeters", "keywords": ["physical security", "perimeter"]},
-            "8.1": {"name": "User endpoint devices", "keywords": ["endpoint", "devices", "user"]}
-        }
-    
-    def _load_control_keywords(self) -> Dict[str, List[str]]:
-        """Load control keywords from the standards data."""
-        control_keywords = {}
-        for control_id, control_data in self.standards.items():
-            if isinstance(control_data, dict) and 'keywords' in control_data:
-                control_keywords[control_id] = control_data['keywords']
-            else:
-                # Fallback: generate keywords from control name
-                control_name = control_data.get('name', '') if isinstance(control_data, dict) else str(control_data)
-                control_keywords[control_id] = self._generate_keywords_from_name(control_name)
-        
-        return control_keywords
-    
-    def _generate_keywords_from_name(self, name: str) -> List[str]:
-        """Generate basic keywords from control name."""
-        words = name.lower().split()
-        # Remove common stop words and generate variations
-        stop_words = {'of', 'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by'}
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
-        return keywords
-    
-    def extract_semantic_features(self, content: str) -> Dict[str, List[str]]:
-        """Extract semantic features from document content using simple string processing."""
-        # Clean and prepare content
-        content = self._clean_text(content)
-        sentences = self._simple_sentence_split(content)
+    def extract_semantic_features(self, content: str, run: Optional[PipelineRun] = None) -> Dict[str, List[str]]:
+        """
+        Extract semantic features from document content using simple string processing.
+
+        Sentences come from the normalise and segment stages shared with the
+        semantic checker, which replaced this checker's own cleaning and
+        split on every '.', '!' or '?'. Boilerplate lines (banners, page
+        footers) are dropped, abbreviations such as "e.g." no longer end a
+        sentence and apostrophes become spaces, so feature counts are lower
+        than in earlier releases; on the sample policy the control scores
+        are unchanged.
+        """
+        run = run or PipelineRun()
+        segments = segment_sentences(run, normalise_document(run, content))
+        sentences = [s.strip() for s in segments.sentences() if len(s.strip()) > 10]
         
         features = defaultdict(list)
         
@@ -88,25 +54,9 @@ class EnhancedComplianceChecker:
         
         return dict(features)
     
-    def _simple_sentence_split(self, text: str) -> List[str]:
-        """Simple sentence splitting without NLTK."""
-        # Split on sentence endings
-        sentences = re.split(r'[.!?]+', text)
-        # Clean and filter
-        return [s.strip() for s in sentences if len(s.strip()) > 10]
-    
-    def _clean_text(self, text: str) -> str:
-        """Enhanced text cleaning for real-world documents."""
-        # Remove extra whitespace and normalize
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters but keep sentence structure
-        text = re.sub(r'[^\w\s.,;:!?\-\'\"()]', ' ', text)
-        # Fix common OCR errors
-        text = re.sub(r'\b(\w)\s+(\w)\b', r'\1\2', text)
-        return text.strip()
-    
-    def check_compliance(self, content: str) -> Dict:
+    def check_compliance(self, content: str, run: Optional[PipelineRun] = None) -> Dict:
         """Enhanced compliance checking with semantic analysis."""
+        run = run or PipelineRun()
         results = {
             'compliance_score': 0,
             'summary': {
@@ -119,11 +69,12 @@ class EnhancedComplianceChecker:
             },
             'details': [],
             'semantic_analysis': {},
-            'method': 'Enhanced Analysis (String-based)'
+            'method': 'Enhanced Analysis (String-based)',
+            'metadata': {'stages': []}
         }
         
         # Extract semantic features
-        semantic_features = self.extract_semantic_features(content)
+        semantic_features = self.extract_semantic_features(content, run)
         results['semantic_analysis'] = {k: len(v) for k, v in semantic_features.items()}
         
         # Convert content to lowercase for matching
@@ -136,7 +87,9 @@ class EnhancedComplianceChecker:
                 control_name = control_info
             
             # Enhanced matching using multiple approaches
-            score = self._calculate_enhanced_score(control_id, control_name, content_lower, semantic_features)
+            with run.stage('retrieve'):
+                score = self._calculate_enhanced_score(control_id, control_name, content_lower, semantic_features)
+                evidence = self._find_evidence(control_id, content_lower)
             
             # Determine confidence level and status
             if score > 0.6:
@@ -162,19 +115,21 @@ class EnhancedComplianceChecker:
                 'score': float(score),
                 'status': status,
                 'confidence': confidence,
-                'rationale': '\n'.join(self._find_evidence(control_id, content_lower))
+                'rationale': '\n'.join(evidence)
             })
             
             if score > 0.25:
                 results['summary']['matched_controls'] += 1
         
         # Calculate overall compliance score
-        total_controls = results['summary']['total_controls']
-        matched_controls = results['summary']['matched_controls']
-        if total_controls > 0:
-            results['compliance_score'] = float((matched_controls / total_controls) * 100)
-        else:
-            results['compliance_score'] = 0.0
+        with run.stage('aggregate'):
+            total_controls = results['summary']['total_controls']
+            matched_controls = results['summary']['matched_controls']
+            if total_controls > 0:
+                results['compliance_score'] = float((matched_controls / total_controls) * 100)
+            else:
+                results['compliance_score'] = 0.0
+        results['metadata']['stages'] = run.report()
         
         return results
     
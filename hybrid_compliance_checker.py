@@ -0,0 +1,68 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import Config
+from utils.pipeline import NormalisedDocument, PipelineRun, normalise_document
+from utils.retrieval import keyword_pattern
+
+class HybridComplianceChecker:
+    """
+    Enhanced keyword pass gating the semantic models.
+
+    The cheap enhanced analysis runs first. Controls with lexical evidence
+    (an enhanced score of at least min_lexical_score and min_keywords of
+    their keywords present as whole words in the normalised text the
+    chunks are cut from) are scored by the semantic checker over only the
+    chunks containing min_keywords of those keywords; every other control,
+    and every gated control no single chunk gives that evidence for, keeps
+    its enhanced result and is reported as decided lexically.
+    """
+
+    def __init__(self, enhanced_checker, semantic_checker,
+                 min_lexical_score: float = Config.LEXICAL_GATE_MIN_SCORE,
+                 min_keywords: int = Config.LEXICAL_GATE_MIN_KEYWORDS):
+        self.enhanced_checker = enhanced_checker
+        self.semantic_checker = semantic_checker
+        self.min_lexical_score = min_lexical_score
+        self.min_keywords = min_keywords
+
+    def _lexical_gate(self, document: NormalisedDocument, lexical_results: Dict) -> Dict[str, List[str]]:
+        """Keywords found in the document per control with enough lexical evidence to reach the models."""
+        text = document.text.lower()
+        control_keywords = {}
+        for detail in lexical_results['details']:
+            keywords = {keyword.lower() for keyword in self.enhanced_checker.control_keywords.get(detail['id'], [])}
+            found = [keyword for keyword in sorted(keywords) if keyword_pattern(keyword).search(text)]
+            if (found and len(found) >= min(self.min_keywords, len(keywords))
+                    and detail['score'] >= self.min_lexical_score):
+                control_keywords[detail['id']] = found
+        return control_keywords
+
+    def check_compliance(self, content: str, profile: Optional[str] = None,
+                         run: Optional[PipelineRun] = None) -> Dict:
+        for event, data in self.iter_compliance(content, profile, run):
+            if event == 'complete':
+                return data
+
+    def iter_compliance(self, content: str, profile: Optional[str] = None,
+                        run: Optional[PipelineRun] = None) -> Iterator[Tuple[str, Dict]]:
+        """Yield the semantic checker's (event, data) pairs for the lexically gated analysis."""
+        run = run or PipelineRun()
+        lexical_results = self.enhanced_checker.check_compliance(content, run)
+        # The same run-cached normalised text the semantic checker chunks
+        control_keywords = self._lexical_gate(normalise_document(run, content), lexical_results)
+        lexical_details = {detail['id']: detail for detail in lexical_results['details']}
+
+        for event, data in self.semantic_checker.iter_compliance(content, profile, run, control_keywords,
+                                                                  lexical_details, self.min_keywords):
+            if event == 'complete':
+                decided_by = {detail['id']: detail['decided_by'] for detail in data['details']}
+                lexical_controls = [cid for cid, decider in decided_by.items() if decider == 'lexical']
+                data['method'] = f"Hybrid (Keyword Gate + {data['method']})"
+                data['semantic_analysis'] = lexical_results['semantic_analysis']
+                data['metadata']['hybrid'] = {
+                    'min_lexical_score': self.min_lexical_score,
+                    'min_keywords': self.min_keywords,
+                    'semantic_controls': [cid for cid, decider in decided_by.items() if decider == 'semantic'],
+                    'lexical_controls': lexical_controls,
+                    'lexical_fraction': len(lexical_controls) / max(len(decided_by), 1),
+                }
+            yield event, data
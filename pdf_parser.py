@@ -1,6 +1,7 @@
 import PyPDF2
 import re
 from typing import List, Dict
+from utils.chunking import find_section_headers
 
 class PDFParser:
     def __init__(self, filepath: str):
@@ -42,21 +43,8 @@ class PDFParser:
         text = self.extract_text()
         sections = {}
         
-        # Common section patterns in SOPs
-        section_patterns = [
-            r'(?i)section\s+\d+[.:]\s*([^\n]+)',
-            r'(?i)chapter\s+\d+[.:]\s*([^\n]+)',
-            r'(?i)\d+\.\s*([^\n]+)'
-        ]
-        
-        # Find all potential section headers
-        section_headers = []
-        for pattern in section_patterns:
-            matches = re.finditer(pattern, text)
-            section_headers.extend([(m.start(), m.group(1).strip()) for m in matches])
-        
-        # Sort sections by position in document
-        section_headers.sort(key=lambda x: x[0])
+        # Find all potential section headers, sorted by position in document
+        section_headers = find_section_headers(text)
         
         # Extract content between sections
         for i in range(len(section_headers)):
@@ -1,135 +1,333 @@
-import re
-import json
-import os
 import numpy as np
-from typing import Dict, List, Tuple
+from contextlib import nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer, CrossEncoder
-from sklearn.metrics.pairwise import cosine_similarity
+from config import Config
+from utils.encoders import create_bi_encoder, create_reranker
+from utils.chunking import TextChunks, chunk_text, find_section_headers, group_chunks_by_section
+from utils.quantization import dequantize_embeddings, embedding_cosine_similarity
+from utils.retrieval import BM25Index, KeywordPostingIndex, dense_ranking, reciprocal_rank_fusion
+from utils.pipeline import (
+    NormalisedDocument,
+    PipelineRun,
+    normalise_document,
+    segment_sentences,
+    stage_key,
+)
 from utils.cache_manager import (
     get_content_hash,
-    cache_model_embeddings,
-    get_cached_model_embeddings,
-    cache_document_embeddings,
+    cache_model_embeddings_many,
+    get_cached_model_embeddings_many,
     get_cached_document_embeddings,
-    cache_iso_standards,
-    get_cached_iso_standards,
+    get_or_compute_document_embeddings,
 )
+from utils.standards import load_control_keywords, load_iso_standards
 
 class SemanticComplianceChecker:
-    def __init__(self):
-        self.standards = self._load_iso_standards()
+    # Largest chunk (in tokens) a latency target may coarsen chunking to
+    MAX_ADAPTIVE_CHUNK_TOKENS = 384
+    # Summary counter for each confidence level
+    SUMMARY_KEYS = {'high': 'high_confidence', 'medium': 'medium_confidence', 'low': 'low_confidence',
+                    'none': 'non_compliant'}
+
+    def __init__(self, backend: Optional[str] = None):
+        self.standards = load_iso_standards()
         
-        print("Loading sentence transformer models...")
-        self.bi_encoder_name = 'Qwen/Qwen3-Embedding-0.6B'
-        self.cross_encoder_name = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
-        self.bi_encoder = SentenceTransformer(self.bi_encoder_name, trust_remote_code=True)
-        self.cross_encoder = CrossEncoder(self.cross_encoder_name)
+        self.backend = backend or Config.ENCODER_BACKEND
+        print(f"Loading encoder models ({self.backend} backend)...")
+        self.bi_encoder = create_bi_encoder(self.backend, Config.BI_ENCODER_MODEL_NAME,
+                                            Config.ONNX_EXPORT_DIR, Config.ONNX_QUANTIZATION_CONFIG,
+                                            Config.ENCODE_NUM_THREADS, Config.MODEL_SERVER_SOCKET,
+                                            Config.ENCODE_POOL_WORKERS, Config.EMBEDDING_DIM,
+                                            Config.MODEL_SERVER_AUTHKEY, Config.BI_ENCODER_TRUST_REMOTE_CODE)
+        self.cross_encoder = create_reranker(self.backend, Config.CROSS_ENCODER_MODEL_NAME,
+                                             Config.ONNX_EXPORT_DIR, Config.ONNX_QUANTIZATION_CONFIG,
+                                             Config.ENCODE_NUM_THREADS, Config.MODEL_SERVER_SOCKET,
+                                             Config.MODEL_SERVER_AUTHKEY)
+        # Backend-qualified names so embeddings from different backends never share cache entries
+        self.bi_encoder_name = self.bi_encoder.name
+        self.cross_encoder_name = self.cross_encoder.name
         print("Models loaded successfully!")
         
-        self.control_keywords = self._load_control_keywords()
-        self._precompute_control_embeddings()
+        self.embedding_quantization = Config.EMBEDDING_CACHE_QUANTIZATION
+        self.encode_batch_tokens = Config.ENCODE_BATCH_TOKENS
+        self.profiles = {name: dict(settings) for name, settings in Config.ANALYSIS_PROFILES.items()}
         
-    def _load_iso_standards(self) -> Dict:
-        cached_standards = get_cached_iso_standards()
-        if cached_standards:
-            print("Loaded ISO standards from cache.")
-            return cached_standards
+        self.control_keywords = load_control_keywords(self.standards)
+        self._precompute_control_embeddings()
         
-        print("Loading ISO standards from JSON file...")
-        standards_path = os.path.join('iso_standards', 'iso27002.json')
-        try:
-            with open(standards_path, 'r') as f:
-                data = json.load(f)
-                standards = {k: v for k, v in data.items() if k != 'metadata'}
-                cache_iso_standards(standards)
-                print("Cached ISO standards for future use.")
-                return standards
-        except FileNotFoundError:
-            print("Warning: ISO standards file not found, using basic fallback controls")
-            return self._get_fallback_standards()
-
-    def _get_fallback_standards(self) -> Dict:
-        return {
-            "5.1": {"name": "Information security policies", "keywords": ["policy", "policies", "information security"]},
-            "5.2": {"name": "Information security roles and responsibilities", "keywords": ["roles", "responsibilities"]},
-        }
-
-    def _load_control_keywords(self) -> Dict[str, List[str]]:
-        control_keywords = {}
-        for control_id, control_data in self.standards.items():
-            if isinstance(control_data, dict) and 'keywords' in control_data:
-                control_keywords[control_id] = control_data['keywords']
-            else:
-                control_name = control_data.get('name', '') if isinstance(control_data, dict) else str(control_data)
-                control_keywords[control_id] = self._generate_keywords_from_name(control_name)
-        return control_keywords
-
-    def _generate_keywords_from_name(self, name: str) -> List[str]:
-        words = name.lower().split()
-        stop_words = {'of', 'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by'}
-        return [word for word in words if word not in stop_words and len(word) > 2]
-
     def _precompute_control_embeddings(self):
         print("Precomputing control embeddings...")
         self.control_embeddings = {}
+        text_hashes = {}
         for control_id, control_info in self.standards.items():
             control_name = control_info.get('name', '')
             control_description = control_info.get('description', '')
             keywords = self.control_keywords.get(control_id, [])
             combined_text = f"{control_name} {control_description} {' '.join(keywords)}"
-            
-            text_hash = get_content_hash(combined_text)
-            cached_embedding = get_cached_model_embeddings(self.bi_encoder_name, text_hash)
-
-            if cached_embedding is not None:
-                embedding = cached_embedding
-            else:
-                embedding = self.bi_encoder.encode([combined_text])
-                cache_model_embeddings(self.bi_encoder_name, text_hash, embedding)
-
+            text_hashes[control_id] = get_content_hash(combined_text)
             self.control_embeddings[control_id] = {
-                'embedding': embedding[0],
+                'embedding': None,
                 'text': combined_text,
                 'name': control_name,
                 'keywords': keywords
             }
+
+        # One batched lookup (a single MGET on a shared tier) for every control
+        cached = get_cached_model_embeddings_many(self.bi_encoder_name, list(text_hashes.values()))
+        missing = {}
+        for control_id, text_hash in text_hashes.items():
+            if text_hash in cached:
+                self.control_embeddings[control_id]['embedding'] = cached[text_hash][0]
+            else:
+                missing[control_id] = text_hash
+
+        # Uncached controls are encoded together and written to the cache in one batch;
+        # they are scored at the stored precision so cold and warm runs agree
+        if missing:
+            embeddings = self.bi_encoder.encode([self.control_embeddings[cid]['text'] for cid in missing])
+            stored = cache_model_embeddings_many(self.bi_encoder_name, {
+                text_hash: embedding[None, :] for text_hash, embedding in zip(missing.values(), embeddings)
+            }, quantization=self.embedding_quantization)
+            for control_id, text_hash in missing.items():
+                self.control_embeddings[control_id]['embedding'] = dequantize_embeddings(stored[text_hash])[0]
         print("Control embeddings precomputed successfully!")
 
-    def _remove_boilerplate(self, text: str) -> str:
-        patterns = [
-            r"^(confidential|internal use only|property of).*",
-            r"^page\s+\d+\s+of\s+\d+",
-            r"^document\s+version:\s+\d+",
-            r"^revision\s+history",
-            r"^author(s)?:.*",
-            r"^date\s+of\s+issue:.*",
-        ]
-        
-        cleaned_text = text
-        for pattern in patterns:
-            cleaned_text = re.sub(pattern, "", cleaned_text, flags=re.IGNORECASE | re.MULTILINE)
-            
-        return cleaned_text.strip()
+    def _create_text_chunks(self, text: str, chunk_tokens: int = Config.CHUNK_TOKENS,
+                            overlap_tokens: int = Config.CHUNK_OVERLAP_TOKENS,
+                            sentences: Optional[List[Tuple[int, int]]] = None) -> TextChunks:
+        max_tokens = min(chunk_tokens, self.bi_encoder.max_seq_length)
+        return chunk_text(text, self.bi_encoder.count_tokens, max_tokens, overlap_tokens, sentences=sentences)
 
-    def _create_text_chunks(self, text: str, chunk_size: int = 3, overlap: int = 1) -> List[str]:
-        sentences = re.split(r'[.!?]+\s+(?=[A-Z])', text)
-        
-        chunks = []
-        for i in range(0, len(sentences) - chunk_size + 1, chunk_size - overlap):
-            chunk = " ".join(sentences[i:i+chunk_size])
-            if len(chunk.split()) > 10:
-                chunks.append(chunk)
-        
-        return chunks
+    def _segment_chunks(self, run: PipelineRun, document: NormalisedDocument, chunk_tokens: int,
+                        overlap_tokens: int) -> TextChunks:
+        """Token-packed chunks of a normalised document, built on its shared sentence segmentation."""
+        segments = segment_sentences(run, document)
+        max_tokens = min(chunk_tokens, self.bi_encoder.max_seq_length)
+        # Only the offsets are cached; the text is already held by the normalise stage
+        spans = run.cached(
+            'segment',
+            stage_key('chunks', document.content_hash, self.bi_encoder_name, max_tokens, overlap_tokens),
+            lambda: self._create_text_chunks(document.text, chunk_tokens, overlap_tokens, segments.spans).spans
+        )
+        return TextChunks(document.text, spans)
+
+    def _resolve_profile(self, profile: Optional[str]) -> Dict:
+        """Return a mutable copy of the named analysis profile's settings."""
+        name = profile or Config.DEFAULT_ANALYSIS_PROFILE
+        if name not in self.profiles:
+            raise ValueError(f"Unknown analysis profile '{name}'. Must be one of: {', '.join(self.profiles)}")
+        settings = dict(self.profiles[name])
+        settings.update(name=name, adapted=False)
+        return settings
 
-    def _clean_text(self, text: str) -> str:
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'[^\w\s.,;:!?\-(")]', ' ', text)
-        text = re.sub(r'\b(\w)\s+(\w)\b', r'\1\2', text)
-        return text.strip()
+    def _get_cached_chunk_embeddings(self, chunks: TextChunks):
+        # Keyed on the text and chunk offsets so every chunking configuration gets its own entry
+        return get_cached_document_embeddings(self.bi_encoder_name, chunks.cache_key(), dequantize=False)
 
-    def check_compliance(self, content: str) -> Dict:
+    def _encode_chunks(self, chunks: TextChunks):
+        # Concurrent requests for the same document wait for one encode instead of repeating it
+        return get_or_compute_document_embeddings(
+            self.bi_encoder_name, chunks.cache_key(),
+            lambda: self.bi_encoder.encode_batched(list(chunks), self.encode_batch_tokens),
+            quantization=self.embedding_quantization
+        )
+
+    def _fit_latency_budget(self, settings: Dict, content_clean: str, chunks: TextChunks,
+                            chunk_embeddings) -> Tuple[TextChunks, object]:
+        """
+        Adapt profile settings so the estimated analysis time fits its target latency.
+
+        Uncached documents are re-chunked more coarsely until encoding fits;
+        whatever budget remains bounds the number of re-ranked pairs.
+        """
+        target = settings['target_latency_seconds']
+
+        while (chunk_embeddings is None and settings['chunk_tokens'] < self.MAX_ADAPTIVE_CHUNK_TOKENS
+               and len(chunks) * Config.ENCODE_SECONDS_PER_CHUNK > target):
+            settings.update(chunk_tokens=min(settings['chunk_tokens'] * 2, self.MAX_ADAPTIVE_CHUNK_TOKENS),
+                            chunk_overlap_tokens=0, adapted=True)
+            coarser_chunks = self._create_text_chunks(content_clean, settings['chunk_tokens'], 0)
+            if not coarser_chunks:
+                break
+            chunks = coarser_chunks
+            chunk_embeddings = self._get_cached_chunk_embeddings(chunks)
+
+        if settings['use_cross_encoder']:
+            encode_seconds = 0.0 if chunk_embeddings is not None else len(chunks) * Config.ENCODE_SECONDS_PER_CHUNK
+            pair_budget = max(target - encode_seconds, 0.0) / Config.RERANK_SECONDS_PER_PAIR
+            top_k = int(pair_budget // max(len(self.standards), 1))
+            if top_k < settings['rerank_top_k']:
+                settings['adapted'] = True
+                if top_k < 1:
+                    settings.update(use_cross_encoder=False, thresholds=Config.BI_ENCODER_THRESHOLDS)
+                else:
+                    settings.update(rerank_top_k=top_k,
+                                    cascade_confident_top_k=min(settings['cascade_confident_top_k'], top_k))
+
+        return chunks, chunk_embeddings
+
+    def _select_sections(self, content_clean: str, chunks: TextChunks,
+                         settings: Dict) -> Tuple[TextChunks, Dict[str, np.ndarray], Dict]:
+        """
+        Coarse stage of hierarchical retrieval.
+
+        Sections are embedded from their leading text and each control picks
+        its section_top_k most similar sections. Returns the chunks inside any
+        selected section, a per-control mask over those chunks and a report.
+        """
+        header_offsets = [offset for offset, _ in find_section_headers(content_clean)]
+        sections = group_chunks_by_section(chunks, header_offsets, Config.SECTION_MIN_CHUNKS,
+                                           Config.SECTION_MAX_CHUNKS)
+
+        lead_chunks = max(1, Config.SECTION_SUMMARY_TOKENS // settings['chunk_tokens'])
+        summaries = TextChunks(chunks.text, [
+            (chunks.spans[section[0]][0], chunks.spans[section[:lead_chunks][-1]][1]) for section in sections
+        ])
+        summary_embeddings = self._encode_chunks(summaries)
+
+        control_ids = list(self.control_embeddings)
+        control_matrix = np.stack([self.control_embeddings[cid]['embedding'] for cid in control_ids])
+        similarities = embedding_cosine_similarity(control_matrix, summary_embeddings)
+        top = min(settings['section_top_k'], len(sections))
+        top_sections = np.argpartition(-similarities, top - 1, axis=1)[:, :top]
+        selected_sections = np.unique(top_sections)
+
+        section_of_chunk = np.empty(len(chunks), dtype=np.int64)
+        for section_id, section in enumerate(sections):
+            section_of_chunk[section] = section_id
+        selected = np.flatnonzero(np.isin(section_of_chunk, selected_sections))
+        selected_chunks = TextChunks(chunks.text, [chunks.spans[i] for i in selected])
+
+        masks = {
+            cid: np.isin(section_of_chunk[selected], top_sections[row]) for row, cid in enumerate(control_ids)
+        }
+        report = {
+            'enabled': True,
+            'sections': len(sections),
+            'selected_sections': len(selected_sections),
+            'total_chunks': len(chunks),
+            'encoded_chunks': len(selected_chunks),
+        }
+        return selected_chunks, masks, report
+
+    def _select_lexical_chunks(self, chunks: TextChunks, control_keywords: Dict[str, List[str]],
+                               control_masks: Dict[str, np.ndarray],
+                               min_keywords: int) -> Tuple[TextChunks, Dict[str, np.ndarray], Dict]:
+        """
+        Keep only the chunks with keyword evidence for some gated control.
+
+        A chunk is evidence for a control when it contains min_keywords of
+        the control's distinct keywords (all of them if it has fewer) as
+        whole words. Returns those chunks, a mask over them per gated
+        control with evidence (combined with any existing section masks)
+        and a report; gated controls left without evidence get no mask.
+        """
+        index = KeywordPostingIndex(chunks, [keyword for keywords in control_keywords.values() for keyword in keywords],
+                                    whole_words=True)
+        candidates = {}
+        for cid, keywords in control_keywords.items():
+            ids = index.candidates(keywords, min(min_keywords, len(set(keywords))))
+            if cid in control_masks:
+                ids = ids[control_masks[cid][ids]]
+            if len(ids):
+                candidates[cid] = ids
+        selected = (np.unique(np.concatenate(list(candidates.values()))) if candidates
+                    else np.zeros(0, dtype=np.int64))
+
+        masks = {cid: np.isin(selected, ids) for cid, ids in candidates.items()}
+        report = {
+            'enabled': True,
+            'min_keywords': min_keywords,
+            'gated_controls': len(candidates),
+            'controls_without_evidence': len(control_keywords) - len(candidates),
+            'total_chunks': len(chunks),
+            'encoded_chunks': len(selected),
+        }
+        return TextChunks(chunks.text, [chunks.spans[i] for i in selected]), masks, report
+
+    def _windowed_candidates(self, chunks: TextChunks, settings: Dict,
+                             control_masks: Dict[str, np.ndarray]) -> Dict[str, Tuple[TextChunks, np.ndarray]]:
+        """
+        Bi-encoder stage in bounded memory.
+
+        Chunks are embedded SCORING_WINDOW_CHUNKS at a time and every
+        control keeps a running top-k of (chunk, similarity); each window's
+        embeddings are dropped before the next is encoded, so memory is
+        O(window + controls x k) whatever the document length. Windows are
+        cached and single-flighted like whole-document embeddings, so
+        concurrent and repeated analyses encode each window once. Returns,
+        per control, its retained chunks and their similarities.
+        """
+        control_ids = [cid for cid in self.standards if cid in self.control_embeddings]
+        control_matrix = np.stack([self.control_embeddings[cid]['embedding'] for cid in control_ids])
+        keep = max(settings['rerank_top_k'], settings['cascade_confident_top_k'], 1)
+
+        top_ids = np.empty((len(control_ids), 0), dtype=np.int64)
+        top_similarities = np.empty((len(control_ids), 0), dtype=np.float32)
+        window = Config.SCORING_WINDOW_CHUNKS
+        # The document key covers the text and every chunk span, so a window is identified by its position
+        document_key = chunks.cache_key()
+        for start in range(0, len(chunks), window):
+            window_chunks = chunks[start:start + window]
+            # Stored quantized like whole-document embeddings, so windowed scores match the regular path
+            window_embeddings = get_or_compute_document_embeddings(
+                self.bi_encoder_name, f"{document_key}:{start}-{start + len(window_chunks)}",
+                lambda: self.bi_encoder.encode_batched(list(window_chunks), self.encode_batch_tokens),
+                quantization=self.embedding_quantization
+            )
+            similarities = embedding_cosine_similarity(control_matrix, window_embeddings).astype(np.float32)
+            for row, cid in enumerate(control_ids):
+                if cid in control_masks:
+                    similarities[row, ~control_masks[cid][start:start + len(window_chunks)]] = -np.inf
+
+            window_ids = np.broadcast_to(np.arange(start, start + len(window_chunks)), similarities.shape)
+            top_ids = np.concatenate([top_ids, window_ids], axis=1)
+            top_similarities = np.concatenate([top_similarities, similarities], axis=1)
+            if top_similarities.shape[1] > keep:
+                retained = np.argpartition(-top_similarities, keep - 1, axis=1)[:, :keep]
+                top_ids = np.take_along_axis(top_ids, retained, axis=1)
+                top_similarities = np.take_along_axis(top_similarities, retained, axis=1)
+
+        return {
+            cid: (TextChunks(chunks.text, [chunks.spans[i] for i in top_ids[row]]), top_similarities[row])
+            for row, cid in enumerate(control_ids)
+        }
+
+    def check_compliance(self, content: str, profile: Optional[str] = None,
+                         run: Optional[PipelineRun] = None) -> Dict:
+        for event, data in self.iter_compliance(content, profile, run):
+            if event == 'complete':
+                return data
+
+    def iter_compliance(self, content: str, profile: Optional[str] = None,
+                        run: Optional[PipelineRun] = None,
+                        control_keywords: Optional[Dict[str, List[str]]] = None,
+                        lexical_details: Optional[Dict[str, Dict]] = None,
+                        lexical_min_keywords: int = Config.LEXICAL_GATE_MIN_KEYWORDS) -> Iterator[Tuple[str, Dict]]:
+        """
+        Run the analysis step by step, yielding (event, data) pairs as it goes.
+
+        Events are 'chunked', 'embedded', one 'control' per scored control
+        and finally 'complete' with the same results check_compliance returns.
+        Stage costs are recorded on run (a fresh PipelineRun when None) and
+        reported under metadata['stages'].
+
+        Args:
+            content: Document text
+            profile: Analysis profile name (Config.DEFAULT_ANALYSIS_PROFILE when None)
+            run: Pipeline run recording stage costs
+            control_keywords: Lexical gate; only chunks containing
+                lexical_min_keywords of a control's keywords are embedded and
+                scored for it
+            lexical_details: Keyword-based details, reported as given for
+                every control that is not gated or that no chunk gives
+                evidence for; those controls never reach the models
+            lexical_min_keywords: Distinct keywords a chunk needs to pass the gate
+        """
+        run = run or PipelineRun()
+        lexical_details = lexical_details or {}
+        settings = self._resolve_profile(profile)
         results = {
             'compliance_score': 0,
             'summary': {
@@ -141,85 +339,245 @@ class SemanticComplianceChecker:
                 'non_compliant': 0,
             },
             'details': [],
-            'method': 'Hybrid Re-ranking (Bi-Encoder + Cross-Encoder)'
+            'method': 'Hybrid Re-ranking (Bi-Encoder + Cross-Encoder)',
+            'metadata': {
+                'profile': {},
+                'hierarchy': {'enabled': False},
+                'stages': [],
+                'windowed': {'enabled': False},
+                'lexical_gate': {'enabled': False},
+                'cascade': {
+                    'lower_bound': settings['cascade_lower_bound'],
+                    'upper_bound': settings['cascade_upper_bound'],
+                    'skipped_controls': 0,
+                    'reduced_controls': 0,
+                    'full_controls': 0,
+                    'bi_encoder_controls': 0,
+                    'lexical_controls': 0,
+                    'skipped_fraction': 0.0,
+                    'reranked_pairs': 0,
+                }
+            }
         }
+        cascade = results['metadata']['cascade']
         
-        content_no_boilerplate = self._remove_boilerplate(content)
-        content_clean = self._clean_text(content_no_boilerplate)
-        chunks = self._create_text_chunks(content_clean)
+        document = normalise_document(run, content)
+        content_clean = document.text
+        chunks = self._segment_chunks(run, document, settings['chunk_tokens'], settings['chunk_overlap_tokens'])
         
         if not chunks:
-            return results
+            results['metadata']['stages'] = run.report()
+            yield 'complete', results
+            return
+
+        # Document embeddings stay in their compact cached form; similarities
+        # are computed directly on it so cache hits and misses score alike
+        chunk_embeddings = self._get_cached_chunk_embeddings(chunks)
+        if settings['target_latency_seconds']:
+            with run.stage('segment'):
+                chunks, chunk_embeddings = self._fit_latency_budget(settings, content_clean, chunks,
+                                                                    chunk_embeddings)
+
+        # Very long documents: only chunks inside each control's best sections are scored
+        control_masks = {}
+        if settings['section_top_k'] and len(chunks) > Config.HIERARCHICAL_MIN_CHUNKS:
+            with run.stage('retrieve'):
+                chunks, control_masks, results['metadata']['hierarchy'] = self._select_sections(
+                    content_clean, chunks, settings
+                )
+            chunk_embeddings = self._get_cached_chunk_embeddings(chunks)
 
-        content_hash = get_content_hash(content_clean)
-        chunk_embeddings = get_cached_document_embeddings(self.bi_encoder_name, content_hash)
-        if chunk_embeddings is None:
+        # Hybrid method: the models only see chunks with lexical evidence for a gated control
+        if control_keywords is not None:
+            with run.stage('retrieve'):
+                chunks, control_masks, results['metadata']['lexical_gate'] = self._select_lexical_chunks(
+                    chunks, control_keywords, control_masks, lexical_min_keywords
+                )
+            chunk_embeddings = self._get_cached_chunk_embeddings(chunks) if chunks else None
+
+        yield 'chunked', {'chunks': len(chunks), 'profile': settings['name']}
+
+        cached = chunk_embeddings is not None
+        windowed_candidates = None
+        if not chunks:
+            # Nothing passed the lexical gate: every model-scored control is skipped
+            windowed_candidates = {}
+        elif chunk_embeddings is None and len(chunks) > Config.WINDOWED_SCORING_MIN_CHUNKS:
+            print("Scoring document embeddings window by window...")
+            # Windows are embedded and scored in one pass, so this stage includes first-stage retrieval
+            with run.stage('embed'):
+                windowed_candidates = self._windowed_candidates(chunks, settings, control_masks)
+            results['metadata']['windowed'] = {
+                'enabled': True,
+                'window_chunks': Config.SCORING_WINDOW_CHUNKS,
+                'windows': -(-len(chunks) // Config.SCORING_WINDOW_CHUNKS),
+            }
+        elif chunk_embeddings is None:
             print("Creating document embeddings...")
-            chunk_embeddings = self.bi_encoder.encode(chunks)
-            cache_document_embeddings(self.bi_encoder_name, content_hash, chunk_embeddings)
+            with run.stage('embed'):
+                chunk_embeddings = self._encode_chunks(chunks)
         else:
             print("Loaded document embeddings from cache.")
+            with run.stage('embed', cached=True):
+                pass
+        yield 'embedded', {'chunks': len(chunks), 'cached': cached}
+
+        results['metadata']['profile'] = {
+            key: settings[key] for key in (
+                'name', 'chunk_tokens', 'chunk_overlap_tokens', 'use_cross_encoder', 'hybrid_retrieval',
+                'rerank_top_k', 'target_latency_seconds', 'adapted'
+            )
+        }
+        if not settings['use_cross_encoder']:
+            results['method'] = 'Bi-Encoder Retrieval'
+
+        # Lexical index over the final chunks, built once and queried per control
+        bm25_index = None
+        if settings['use_cross_encoder'] and settings['hybrid_retrieval'] and windowed_candidates is None:
+            with run.stage('retrieve'):
+                bm25_index = BM25Index(chunks, Config.BM25_K1, Config.BM25_B)
 
         for control_id, control_info in self.standards.items():
             control_name = control_info.get('name', '')
             
-            score, evidence = self._calculate_semantic_score(
-                control_id, 
-                chunks, 
-                chunk_embeddings
-            )
-            
-            if score > 0.8:
-                status, confidence = 'High Confidence', 'high'
-                results['summary']['high_confidence'] += 1
-            elif score > 0.5:
-                status, confidence = 'Medium Confidence', 'medium'
-                results['summary']['medium_confidence'] += 1
-            elif score > 0.3:
-                status, confidence = 'Low Confidence', 'low'
-                results['summary']['low_confidence'] += 1
+            if control_id in lexical_details and (control_keywords is None or control_id not in control_masks):
+                detail = dict(lexical_details[control_id], decided_by='lexical')
+                cascade['lexical_controls'] += 1
             else:
-                status, confidence = 'Non-compliant', 'none'
-                results['summary']['non_compliant'] += 1
-            
-            results['details'].append({
-                'id': control_id,
-                'name': control_name,
-                'score': float(score),
-                'status': status,
-                'confidence': confidence,
-                'rationale': '\n'.join(evidence)
-            })
-            
-            if score > 0.3:
+                detail = self._score_control(control_id, control_name, chunks, chunk_embeddings, settings,
+                                             bm25_index, control_masks, windowed_candidates, cascade, run)
+                if control_keywords is not None:
+                    detail['decided_by'] = 'semantic'
+            results['details'].append(detail)
+            results['summary'][self.SUMMARY_KEYS[detail['confidence']]] += 1
+            if detail['confidence'] != 'none':
                 results['summary']['matched_controls'] += 1
+
+            yield 'control', {'control': detail, 'scored': len(results['details']),
+                              'total': results['summary']['total_controls']}
         
-        total_controls = results['summary']['total_controls']
-        matched_controls = results['summary']['matched_controls']
-        if total_controls > 0:
-            results['compliance_score'] = float((matched_controls / total_controls) * 100)
+        with run.stage('aggregate'):
+            total_controls = results['summary']['total_controls']
+            matched_controls = results['summary']['matched_controls']
+            if total_controls > 0:
+                results['compliance_score'] = float((matched_controls / total_controls) * 100)
+                cascade['skipped_fraction'] = cascade['skipped_controls'] / total_controls
+        results['metadata']['stages'] = run.report()
         
         print("Semantic compliance analysis completed!")
-        return results
+        yield 'complete', results
+
+    def _score_control(self, control_id: str, control_name: str, chunks: TextChunks, chunk_embeddings,
+                       settings: Dict, bm25_index: Optional[BM25Index], control_masks: Dict[str, np.ndarray],
+                       windowed_candidates: Optional[Dict], cascade: Dict, run: PipelineRun) -> Dict:
+        """Score one control with the models, count its cascade stage and return its result detail."""
+        with run.stage('retrieve'):
+            if windowed_candidates is None:
+                score, evidence, stage, reranked = self._calculate_semantic_score(
+                    control_id, 
+                    chunks, 
+                    chunk_embeddings,
+                    settings,
+                    bm25_index,
+                    control_masks.get(control_id),
+                    run
+                )
+            elif control_id in windowed_candidates:
+                score, evidence, stage, reranked = self._score_similarities(
+                    control_id, *windowed_candidates.pop(control_id), settings, run=run
+                )
+            else:
+                score, evidence, stage, reranked = 0.0, [], 'skipped', 0
+        cascade[f'{stage}_controls'] += 1
+        cascade['reranked_pairs'] += reranked
+        
+        thresholds = settings['thresholds']
+        if score > thresholds['high']:
+            status, confidence = 'High Confidence', 'high'
+        elif score > thresholds['medium']:
+            status, confidence = 'Medium Confidence', 'medium'
+        elif score > thresholds['low']:
+            status, confidence = 'Low Confidence', 'low'
+        else:
+            status, confidence = 'Non-compliant', 'none'
+        
+        return {
+            'id': control_id,
+            'name': control_name,
+            'score': float(score),
+            'status': status,
+            'confidence': confidence,
+            'rationale': '\n'.join(evidence)
+        }
 
-    def _calculate_semantic_score(self, control_id: str, chunks: List[str], 
-                                 chunk_embeddings: np.ndarray) -> Tuple[float, List[str]]:
+    def _calculate_semantic_score(self, control_id: str, chunks: TextChunks, 
+                                 chunk_embeddings, settings: Dict,
+                                 bm25_index: Optional[BM25Index] = None,
+                                 candidate_mask: Optional[np.ndarray] = None,
+                                 run: Optional[PipelineRun] = None) -> Tuple[float, List[str], str, int]:
+        """
+        Score one control with a bi-encoder / cross-encoder cascade.
+
+        With a BM25 index, re-rank candidates are the reciprocal-rank fusion
+        of the bi-encoder and BM25 rankings instead of the bi-encoder top-k.
+        A candidate mask restricts scoring to the control's own sections.
+        Returns the score, evidence, the stage that decided it ('skipped',
+        'reduced', 'full' or 'bi_encoder') and the number of re-ranked pairs.
+        Cross-encoder time is recorded as the rerank stage of run, if given.
+        """
         if control_id not in self.control_embeddings:
-            return 0.0, []
+            return 0.0, [], 'skipped', 0
         
         control_embedding = self.control_embeddings[control_id]['embedding']
-        control_text = self.control_embeddings[control_id]['text']
 
         # Stage 1: Fast Retrieval (Bi-Encoder)
-        similarities = cosine_similarity(np.array([control_embedding]), chunk_embeddings)[0]
-        top_k_indices = np.argsort(similarities)[-10:][::-1] # Get top 10 candidates
+        similarities = embedding_cosine_similarity(np.array([control_embedding]), chunk_embeddings)[0]
+        if candidate_mask is not None:
+            similarities = np.where(candidate_mask, similarities, -np.inf)
+        return self._score_similarities(control_id, chunks, similarities, settings, bm25_index, candidate_mask, run)
+
+    def _score_similarities(self, control_id: str, chunks: TextChunks, similarities: np.ndarray, settings: Dict,
+                            bm25_index: Optional[BM25Index] = None,
+                            candidate_mask: Optional[np.ndarray] = None,
+                            run: Optional[PipelineRun] = None) -> Tuple[float, List[str], str, int]:
+        """Cascade and re-ranking stages of _calculate_semantic_score, given bi-encoder similarities."""
+        control_text = self.control_embeddings[control_id]['text']
+        if len(similarities) == 0:
+            return 0.0, [], 'skipped', 0
+
+        # Cascade: decisive bi-encoder results skip or shrink the re-ranking stage
+        best_index = int(np.argmax(similarities))
+        best_similarity = float(similarities[best_index])
+        if best_similarity < settings['cascade_lower_bound']:
+            return 0.0, [], 'skipped', 0
 
-        if not top_k_indices.any():
-            return 0.0, []
+        if not settings['use_cross_encoder']:
+            score = min(max(best_similarity, 0.0), 1.0)
+            return score, [f"(Score: {score:.2f}) {chunks[best_index]}"], 'bi_encoder', 0
+
+        if best_similarity > settings['cascade_upper_bound']:
+            stage, top_k = 'reduced', settings['cascade_confident_top_k']
+        else:
+            stage, top_k = 'full', settings['rerank_top_k']
+
+        top_k = max(top_k, 1)
+        if bm25_index is not None:
+            depth = max(Config.HYBRID_RETRIEVAL_DEPTH, top_k)
+            lexical_ranking = bm25_index.rank(control_text)
+            if candidate_mask is not None:
+                lexical_ranking = lexical_ranking[candidate_mask[lexical_ranking]]
+            top_k_indices = reciprocal_rank_fusion(
+                [dense_ranking(similarities, depth), lexical_ranking[:depth]], Config.RRF_K, top_k
+            )
+        else:
+            top_k_indices = np.argsort(similarities)[-top_k:][::-1]
+        # Chunks outside the control's sections never reach the cross-encoder
+        top_k_indices = top_k_indices[np.isfinite(similarities[top_k_indices])]
 
         # Stage 2: Accurate Re-ranking (Cross-Encoder)
         cross_encoder_pairs = [(control_text, chunks[i]) for i in top_k_indices]
-        cross_encoder_scores = self.cross_encoder.predict(cross_encoder_pairs, convert_to_numpy=True)
+        with run.stage('rerank') if run else nullcontext():
+            cross_encoder_scores = self.cross_encoder.predict(cross_encoder_pairs)
         
         # Apply sigmoid scaling to normalize scores to a 0-1 range
         scaled_scores = 1 / (1 + np.exp(-cross_encoder_scores))
@@ -232,4 +590,4 @@ class SemanticComplianceChecker:
         if best_chunk_index != -1:
             evidence.append(f"(Score: {final_score:.2f}) {chunks[best_chunk_index]}")
 
-        return final_score, evidence
\ No newline at end of file
+        return final_score, evidence, stage, len(cross_encoder_pairs)
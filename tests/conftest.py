@@ -0,0 +1,30 @@
+import pytest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.cache_manager as cache_manager
+from utils.cache_manager import CacheManager
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    """Point the global cache manager at a temporary directory, running from the repository root."""
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setattr(cache_manager, '_global_cache', CacheManager(str(tmp_path / 'cache')))
+    return cache_manager._global_cache
+
+@pytest.fixture
+def policy_text():
+    """Sample policy document text."""
+    return (
+        "Information Security Policy. This document outlines the information security policy approved by "
+        "management and communicated to all employees and relevant parties. "
+        "Access Control. All users must authenticate using multi-factor authentication before access is granted. "
+        "User access rights are reviewed quarterly by the information security team and revoked on termination. "
+        "Incident Management. Security incidents are reported to the incident response team within 24 hours. "
+        "The incident response team investigates every information security event and records lessons learned. "
+        "Asset Management. All information assets are inventoried and classified according to their sensitivity. "
+        "Secure disposal procedures are followed for all storage media containing confidential information. "
+    )
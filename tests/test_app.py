@@ -8,6 +8,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import create_app
 from config import TestingConfig
+from utils.cache_manager import CacheManager
 
 @pytest.fixture
 def app():
@@ -73,6 +74,8 @@ class TestHealthEndpoints:
         assert 'methods' in data
         assert 'enhanced' in data['methods']
         assert 'semantic' in data['methods']
+        assert 'hybrid' in data['methods']
+        assert set(data['profiles']) == {'fast', 'balanced', 'accurate'}
 
 class TestSecurityHeaders:
     """Test security headers."""
@@ -121,6 +124,25 @@ class TestFileUploadValidation:
         assert 'error' in data
         assert 'Invalid analysis method' in data['error']
     
+    def test_invalid_profile(self, client):
+        """Test error when an unknown analysis profile is requested."""
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(b'%PDF-1.4 fake pdf content')
+            tmp.flush()
+            
+            with open(tmp.name, 'rb') as test_file:
+                response = client.post('/analyze', data={
+                    'file': (test_file, 'test.pdf'),
+                    'method': 'semantic',
+                    'profile': 'turbo'
+                })
+        
+        os.unlink(tmp.name)
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'Invalid analysis profile' in data['error']
+    
     def test_empty_file(self, client):
         """Test error when empty file is uploaded."""
         with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
@@ -159,6 +181,82 @@ class TestFileUploadValidation:
         assert 'error' in data
         assert 'not allowed' in data['error']
 
+class TestAnalysisStream:
+    """Test the Server-Sent Events analysis endpoint."""
+    
+    def _post(self, client, method='enhanced', profile='balanced'):
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            tmp.write(b'%PDF-1.4 fake pdf content')
+            tmp.flush()
+            
+            with open(tmp.name, 'rb') as test_file:
+                response = client.post('/analyze/stream', data={
+                    'file': (test_file, 'test.pdf'),
+                    'method': method,
+                    'profile': profile
+                })
+        
+        os.unlink(tmp.name)
+        return response
+    
+    @staticmethod
+    def _events(response):
+        events = []
+        for message in response.get_data(as_text=True).strip().split('\n\n'):
+            lines = dict(line.split(': ', 1) for line in message.split('\n'))
+            events.append((lines['event'], json.loads(lines['data'])))
+        return events
+    
+    def test_invalid_profile(self, client):
+        """Test that validation errors are returned before streaming starts."""
+        response = self._post(client, method='semantic', profile='turbo')
+        assert response.status_code == 400
+        assert 'Invalid analysis profile' in json.loads(response.data)['error']
+    
+    @patch('app.PDFParser')
+    def test_stream_events_and_results(self, mock_parser_class, app, client, sample_pdf_content, tmp_path):
+        """Test that progress events end with 'complete' and the results page shows the analysis."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        mock_parser = MagicMock()
+        mock_parser.is_pdf_loadable.return_value = True
+        mock_parser.extract_text.return_value = sample_pdf_content
+        mock_parser_class.return_value = mock_parser
+        
+        response = self._post(client)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        
+        events = self._events(response)
+        assert events[0][0] == 'extracted'
+        assert events[0][1]['document_length'] == len(sample_pdf_content)
+        assert events[-1][0] == 'complete'
+        assert events[-1][1]['redirect'] == '/results'
+        
+        with client.session_transaction() as session:
+            assert 'analysis_token' in session
+        assert client.get('/results').status_code == 200
+    
+    @patch('app.PDFParser')
+    def test_results_readable_from_another_worker(self, mock_parser_class, app, client, sample_pdf_content, tmp_path):
+        """Test that the analysis token is on disk when 'complete' is sent, even with write-behind."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        mock_parser = MagicMock()
+        mock_parser.is_pdf_loadable.return_value = True
+        mock_parser.extract_text.return_value = sample_pdf_content
+        mock_parser_class.return_value = mock_parser
+        
+        cache = CacheManager(str(tmp_path / 'cache'), write_behind=True)
+        # Queued writes never reach the disk, so only write-through keys are visible elsewhere
+        cache.write_queue.write_batch = lambda batch: None
+        with patch('utils.cache_manager._global_cache', cache):
+            events = self._events(self._post(client))
+        assert events[-1][0] == 'complete'
+        
+        with client.session_transaction() as session:
+            token = session['analysis_token']
+        other_worker = CacheManager(str(tmp_path / 'cache'))
+        assert other_worker.get(f"analysis:{token}")['compliance_score'] >= 0
+
 class TestFileUploadSuccess:
     """Test successful file upload and analysis."""
     
@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+import os
+import sys
+from collections import defaultdict
+from sklearn.metrics.pairwise import cosine_similarity
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from better.semantic_compliance_checker import SemanticComplianceChecker
+
+@pytest.fixture
+def checker(isolated_cache):
+    """Prototype semantic checker using the offline hashing backend."""
+    return SemanticComplianceChecker(backend='hashing')
+
+def per_chunk_features(checker, chunks, chunk_embeddings):
+    """The original feature extraction: each category encoded and compared chunk by chunk."""
+    features = defaultdict(list)
+    for category, descriptions in checker.FEATURE_CATEGORIES.items():
+        category_embeddings = checker.model.encode(descriptions)
+        for i, chunk_embedding in enumerate(chunk_embeddings):
+            similarities = cosine_similarity(np.expand_dims(chunk_embedding, axis=0), category_embeddings)[0]
+            if max(similarities) > 0.3:
+                features[category].append(chunks[i])
+    return dict(features)
+
+class TestBetterSemanticChecker:
+    """Test the prototype semantic checker with the hashing backend."""
+
+    def test_cold_and_warm_runs_agree(self, isolated_cache, policy_text):
+        """Test that a checker encoding everything scores exactly like one reading the cached embeddings."""
+        cold_checker = SemanticComplianceChecker(backend='hashing')
+        cold = cold_checker.check_compliance(policy_text)
+        warm_checker = SemanticComplianceChecker(backend='hashing')
+        warm = warm_checker.check_compliance(policy_text)
+        assert np.array_equal(cold_checker.prototype_embeddings, warm_checker.prototype_embeddings)
+        for control_id, control in cold_checker.control_embeddings.items():
+            assert np.array_equal(control['embedding'], warm_checker.control_embeddings[control_id]['embedding'])
+        assert cold['semantic_analysis'] == warm['semantic_analysis']
+        assert [d['score'] for d in cold['details']] == [d['score'] for d in warm['details']]
+
+    def test_prototype_matrix_matches_per_chunk_loop(self, checker, policy_text):
+        """Test that the vectorised feature extraction finds the same chunks as the per-chunk loop."""
+        chunks = checker._create_text_chunks(policy_text, chunk_tokens=24, overlap_tokens=0)
+        chunk_embeddings = checker.model.encode(list(chunks))
+        features = checker.extract_semantic_features(chunks, chunk_embeddings)
+        assert features
+        assert features == per_chunk_features(checker, chunks, chunk_embeddings)
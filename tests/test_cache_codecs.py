@@ -0,0 +1,112 @@
+import pytest
+import pickle
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache_codecs import (
+    CODEC_IDS,
+    DECODE_ERRORS,
+    CacheCodecs,
+    decode_value,
+    encode_value,
+    parse_codec_spec,
+)
+from utils.cache_manager import CacheManager
+
+@pytest.fixture
+def results():
+    """Repetitive compliance results like those cached under compliance:*."""
+    return {
+        'compliance_score': 42.0,
+        'details': [
+            {'id': f"5.{i}", 'status': 'Medium Confidence', 'score': 0.5,
+             'evidence': "All users must authenticate using multi-factor authentication before access is granted."}
+            for i in range(40)
+        ],
+    }
+
+class TestCodecs:
+    """Test the headered value format."""
+
+    @pytest.mark.parametrize('codec', ['none', 'zlib', 'lzma'])
+    def test_round_trip(self, codec, results):
+        """Test that every stdlib codec decodes to the original value."""
+        blob = encode_value(results, codec)
+        assert blob[:2] == b'CC'
+        assert blob[3] == CODEC_IDS[codec]
+        assert decode_value(blob) == results
+
+    def test_zstd_round_trip(self, results):
+        """Test the optional zstd codec when zstandard is installed."""
+        pytest.importorskip('zstandard')
+        assert decode_value(encode_value(results, 'zstd')) == results
+
+    def test_compresses_repetitive_results(self, results):
+        """Test that compressed results are much smaller than the plain pickle."""
+        assert len(encode_value(results, 'zlib')) * 3 < len(encode_value(results, 'none'))
+
+    def test_reads_entries_without_header(self, results):
+        """Test that plain pickles written before codecs existed still decode."""
+        assert decode_value(pickle.dumps(results)) == results
+
+    def test_unsupported_version(self, results):
+        """Test that entries from an unknown format version are rejected."""
+        blob = bytearray(encode_value(results, 'zlib'))
+        blob[2] = 99
+        with pytest.raises(DECODE_ERRORS):
+            decode_value(bytes(blob))
+
+    @pytest.mark.parametrize('codec', ['zlib', 'lzma', 'zstd'])
+    def test_corrupt_payload_is_a_decode_error(self, codec, results):
+        """Test that every codec's corruption error is reported as a decode error."""
+        if codec == 'zstd':
+            pytest.importorskip('zstandard')
+        blob = encode_value(results, codec)
+        with pytest.raises(ValueError):
+            decode_value(blob[:4] + b'garbage' + blob[4:])
+
+    def test_parse_codec_spec(self):
+        """Test parsing the CACHE_CODECS override."""
+        assert parse_codec_spec("compliance=lzma, stage=none") == {'compliance': 'lzma', 'stage': 'none'}
+        assert parse_codec_spec("") == {}
+        with pytest.raises(ValueError):
+            parse_codec_spec("compliance=brotli")
+
+class TestCacheCodecs:
+    """Test per-namespace codec choice and statistics."""
+
+    def test_codec_per_namespace(self):
+        """Test that the codec follows the key's namespace."""
+        codecs = CacheCodecs({'compliance': 'lzma'})
+        assert codecs.codec_for('compliance:semantic:abc') == 'lzma'
+        assert codecs.codec_for('unknown:key') == 'none'
+
+    def test_environment_override(self, monkeypatch):
+        """Test that CACHE_CODECS overrides the defaults."""
+        monkeypatch.setenv('CACHE_CODECS', 'compliance=lzma')
+        codecs = CacheCodecs()
+        assert codecs.codec_for('compliance:x') == 'lzma'
+        assert codecs.codec_for('analysis:x') == 'zlib'
+
+    def test_unknown_codec(self):
+        """Test that unknown codecs are rejected up front."""
+        with pytest.raises(ValueError):
+            CacheCodecs({'compliance': 'brotli'})
+
+    @pytest.mark.parametrize('disk_backend', ['sqlite', 'pickle'])
+    def test_manager_reports_ratio(self, tmp_path, results, disk_backend):
+        """Test that cache statistics show hits, misses and the compression ratio per namespace."""
+        cache = CacheManager(str(tmp_path), disk_backend=disk_backend)
+        cache.set('compliance:semantic:abc', results)
+        reader = CacheManager(str(tmp_path), disk_backend=disk_backend)
+        assert reader.get('compliance:semantic:abc') == results
+        assert reader.get('compliance:semantic:missing') is None
+
+        stats = reader.get_cache_stats()['codecs']['compliance']
+        assert stats['codec'] == 'zlib'
+        assert (stats['hits'], stats['misses']) == (1, 1)
+        assert stats['ratio'] > 3
+        assert cache.get_cache_stats()['codecs']['compliance']['writes'] == 1
+        # The disk tier stores the compressed size
+        assert cache.get_cache_stats()['total_size_bytes'] * 3 < len(pickle.dumps(results))
@@ -0,0 +1,607 @@
+import fnmatch
+import pytest
+import threading
+import time
+import uuid
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache_backends import DISK_BACKENDS, PickleFileBackend, RedisBackend, SQLiteBackend, create_disk_backend
+import utils.cache_manager as cache_manager
+from utils.cache_manager import CacheManager, cached, estimate_size
+from utils.embedding_store import EmbeddingStore
+from utils.quantization import QuantizedEmbeddings, embedding_cosine_similarity, quantize_embeddings
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache manager with a small memory budget."""
+    return CacheManager(str(tmp_path / 'cache'), max_memory_bytes=10_000)
+
+def array(kilobytes):
+    return np.zeros(kilobytes * 256, dtype=np.float32)
+
+class FakeRedis:
+    """In-process stand-in for the subset of redis.Redis used by RedisBackend."""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+        self.down = False
+
+    def _call(self):
+        if self.down:
+            raise ConnectionError("redis unavailable")
+        self.round_trips += 1
+
+    def _live(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def _mset(self, mapping):
+        for key, value in mapping.items():
+            self.data[key] = (value, None)
+
+    def _expire(self, key, seconds):
+        if self._live(key) is not None:
+            if seconds <= 0:
+                del self.data[key]
+            else:
+                self.data[key] = (self.data[key][0], time.time() + seconds)
+
+    def _incrby(self, key, amount):
+        self.data[key] = (int(self._live(key) or 0) + amount, None)
+
+    def _set(self, key, value):
+        self.data[key] = (value, None)
+
+    def _unlink(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def mget(self, keys):
+        self._call()
+        return [self._live(key) for key in keys]
+
+    def mset(self, mapping):
+        self._call()
+        self._mset(mapping)
+
+    def expire(self, key, seconds):
+        self._call()
+        self._expire(key, seconds)
+
+    def unlink(self, *keys):
+        self._call()
+        self._unlink(*keys)
+
+    def strlen(self, key):
+        return len(self._live(key) or b'')
+
+    def scan_iter(self, match='*', count=None):
+        self._call()
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match) and self._live(key) is not None]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    """Queues commands and runs them in a single round trip."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self):
+        self.client._call()
+        handlers = {'mset': self.client._mset, 'expire': self.client._expire, 'strlen': self.client.strlen,
+                    'incrby': self.client._incrby, 'set': self.client._set, 'unlink': self.client._unlink}
+        return [handlers[name](*args) for name, args in self.commands]
+
+def redis_backend():
+    """Redis backend on CACHE_TEST_REDIS_URL if set, otherwise on an in-process fake."""
+    url = os.environ.get('CACHE_TEST_REDIS_URL')
+    if url:
+        return RedisBackend(url, prefix=f"test:{uuid.uuid4().hex}:")
+    return RedisBackend(client=FakeRedis())
+
+class TestEstimateSize:
+    """Test byte-size estimates of cached values."""
+
+    def test_arrays_count_their_buffers(self):
+        """Test that arrays and quantized embeddings are sized by their data."""
+        assert estimate_size(array(4)) >= 4096
+        embeddings = quantize_embeddings(np.ones((100, 64), dtype=np.float32), 'int8')
+        assert embeddings.nbytes <= estimate_size(embeddings) < embeddings.nbytes + 1024
+
+    def test_memory_maps_are_not_counted(self, tmp_path):
+        """Test that memory-mapped arrays only count their header."""
+        path = str(tmp_path / 'array.npy')
+        np.save(path, array(16))
+        assert estimate_size(np.load(path, mmap_mode='r')) < 1024
+
+    def test_containers_are_walked(self):
+        """Test that nested results count their contents, shared objects once."""
+        values = array(4)
+        assert estimate_size({'details': [values, values]}) < 2 * 4096
+        assert estimate_size({'details': [values, array(4)]}) >= 2 * 4096
+
+class TestMemoryTier:
+    """Test the size-bounded LRU memory tier."""
+
+    def test_evicts_least_recently_used(self, cache):
+        """Test that the oldest unread entry is evicted first."""
+        cache.set_in_memory('a', array(4))
+        cache.set_in_memory('b', array(4))
+        cache.get_from_memory('a')
+        cache.set_in_memory('c', array(4))
+
+        assert cache.get_from_memory('b') is None
+        assert cache.get_from_memory('a') is not None
+        stats = cache.get_cache_stats()
+        assert stats['memory_evictions'] == 1
+        assert stats['memory_bytes'] <= stats['memory_budget_bytes']
+
+    def test_oversized_value_stays_on_disk(self, cache):
+        """Test that values larger than the budget are served from disk only."""
+        cache.set('big', array(16))
+        assert cache.get_cache_stats()['memory_rejections'] >= 1
+        assert cache.get_cache_stats()['memory_entries'] == 0
+        assert cache.get('big') is not None
+
+    def test_replacing_entry_updates_size(self, cache):
+        """Test that overwriting a key does not double count its size."""
+        cache.set_in_memory('a', array(4))
+        cache.set_in_memory('a', array(4))
+        assert cache.get_cache_stats()['memory_bytes'] < 2 * 4096
+
+    def test_sweeps_expired_entries(self, tmp_path):
+        """Test that expired entries are removed without being read."""
+        cache = CacheManager(str(tmp_path / 'cache'), sweep_interval=0)
+        cache.set_in_memory('old', 'value', ttl=1)
+        cache._memory_cache['old'] = ('value', time.time() - 10, 1, cache._memory_cache['old'][3])
+        cache.set_in_memory('new', 'value')
+
+        stats = cache.get_cache_stats()
+        assert stats['memory_entries'] == 1
+        assert stats['memory_expirations'] == 1
+
+    def test_hit_and_miss_counters(self, cache):
+        """Test that memory hits and misses are counted."""
+        cache.set_in_memory('a', 'value')
+        cache.get_from_memory('a')
+        cache.get_from_memory('missing')
+        stats = cache.get_cache_stats()
+        assert (stats['memory_hits'], stats['memory_misses']) == (1, 1)
+
+class TestDiskBackends:
+    """Test the persistent cache tiers."""
+
+    @pytest.fixture(params=DISK_BACKENDS)
+    def backend(self, request, tmp_path):
+        """Each disk backend over an empty directory."""
+        if request.param == 'redis':
+            backend = redis_backend()
+            yield backend
+            backend.clear()
+            return
+        yield create_disk_backend(request.param, str(tmp_path / 'disk'))
+
+    def test_round_trip(self, backend):
+        """Test that stored values are read back unchanged."""
+        backend.set('results', {'score': 0.5, 'embedding': np.arange(4.0)}, ttl=60)
+        value = backend.get('results')
+        assert value['score'] == 0.5
+        assert value['embedding'].tolist() == [0.0, 1.0, 2.0, 3.0]
+        assert backend.get('missing') is None
+
+    def test_set_many_and_stats(self, backend):
+        """Test batched writes and entry statistics."""
+        backend.set_many([(f"key{i}", array(1)) for i in range(5)], ttl=60)
+        stats = backend.stats()
+        assert stats['entries'] == 5
+        assert stats['size_bytes'] >= 5 * 1024
+
+    def test_expiry(self, backend):
+        """Test that expired entries are not returned and are swept."""
+        backend.set('old', 'value', ttl=-1)
+        backend.set('new', 'value', ttl=60)
+        # Redis expires keys itself, so there is nothing left to sweep
+        assert backend.cleanup_expired() == (0 if backend.shared else 1)
+        assert backend.get('old') is None
+        assert backend.stats()['entries'] == 1
+
+    def test_delete_and_clear(self, backend):
+        """Test removing single entries and everything."""
+        backend.set_many([('a', 1), ('b', 2)], ttl=60)
+        backend.delete('a')
+        assert backend.get('a') is None
+        backend.clear()
+        assert backend.stats()['entries'] == 0
+
+    def test_unknown_backend(self, tmp_path):
+        """Test that unknown backend names are rejected."""
+        with pytest.raises(ValueError):
+            create_disk_backend('memcached', str(tmp_path))
+
+    def test_get_many(self, backend):
+        """Test batched reads return only present entries."""
+        backend.set_many([('a', 1), ('b', 2)], ttl=60)
+        assert backend.get_many(['a', 'missing', 'b']) == {'a': 1, 'b': 2}
+
+class TestRedisBackend:
+    """Test the shared Redis tier against the in-process fake."""
+
+    @pytest.fixture
+    def client(self):
+        return FakeRedis()
+
+    def manager(self, tmp_path, client, name):
+        cache = CacheManager(str(tmp_path / name), disk_backend='sqlite')
+        cache.disk = RedisBackend(client=client)
+        return cache
+
+    def test_batched_round_trips(self, client):
+        """Test that batched reads and writes cost a constant number of round trips."""
+        backend = RedisBackend(client=client)
+        backend.set_many([(f"key{i}", i) for i in range(50)], ttl=60)
+        # Replaced sizes, then MSET/EXPIRE/counters in one transaction
+        assert client.round_trips == 2
+        assert len(backend.get_many([f"key{i}" for i in range(50)])) == 50
+        assert client.round_trips == 3
+
+    def test_stats_use_counters(self, client):
+        """Test that statistics come from counters, not a keyspace scan, and track overwrites and deletes."""
+        backend = RedisBackend(client=client)
+        backend.set_many([('a', 'x' * 100), ('b', 'y' * 100)], ttl=60)
+        backend.set('a', 'x' * 10, ttl=60)
+        backend.delete('b')
+        trips = client.round_trips
+        stats = backend.stats()
+        assert client.round_trips == trips + 1
+        assert stats['entries'] == 1
+        assert stats['size_bytes'] == client.strlen('compliance_cache:a')
+
+    def test_cleanup_recounts_expired_keys(self, client):
+        """Test that the background sweep drops keys Redis expired from the counters."""
+        backend = RedisBackend(client=client)
+        backend.set_many([('a', 1), ('b', 2)], ttl=60)
+        client.data.pop('compliance_cache:a')  # expired by the server
+        assert backend.stats()['entries'] == 2
+        backend.cleanup_expired()
+        assert backend.stats()['entries'] == 1
+
+    def test_clear_deletes_in_batches(self, client, monkeypatch):
+        """Test that clear unlinks the keyspace in bounded batches."""
+        monkeypatch.setattr(RedisBackend, 'BATCH_KEYS', 10)
+        backend = RedisBackend(client=client)
+        backend.set_many([(f"key{i}", i) for i in range(25)], ttl=60)
+        unlinked = []
+        unlink = client.unlink
+        monkeypatch.setattr(client, 'unlink', lambda *keys: unlinked.append(len(keys)) or unlink(*keys))
+        backend.clear()
+        assert unlinked == [10, 10, 5, 2]
+        assert client.data == {}
+        assert backend.stats() == {'entries': 0, 'size_bytes': 0}
+
+    def test_hosts_share_embeddings(self, tmp_path, client):
+        """Test that embeddings written on one host are read on another and mapped locally."""
+        embeddings = quantize_embeddings(np.random.default_rng(0).normal(size=(20, 16)).astype(np.float32), 'int8')
+        self.manager(tmp_path, client, 'host1').set_arrays_many({'a': embeddings, 'b': embeddings})
+
+        other = self.manager(tmp_path, client, 'host2')
+        found = other.get_arrays_many(['a', 'b', 'c'])
+        assert set(found) == {'a', 'b'}
+        assert np.array_equal(found['a'].codes, embeddings.codes)
+        # Fetched once; later reads come from the local memory-mapped copy
+        client.down = True
+        assert isinstance(other.arrays.get('a').codes, np.memmap)
+        assert set(other.get_arrays_many(['a', 'b'])) == {'a', 'b'}
+
+    def test_memory_tier_is_l1(self, tmp_path, client):
+        """Test that repeated reads are served from memory without touching Redis."""
+        cache = self.manager(tmp_path, client, 'host')
+        cache.set('key', {'score': 1})
+        trips = client.round_trips
+        assert cache.get_many(['key']) == {'key': {'score': 1}}
+        assert client.round_trips == trips
+
+    def test_outage_is_a_miss(self, tmp_path, client):
+        """Test that an unreachable server degrades to cache misses."""
+        cache = self.manager(tmp_path, client, 'host')
+        client.down = True
+        cache.set('key', 'value', disk=True)
+        assert cache.disk.get('key') is None
+        assert cache.get_arrays_many(['missing']) == {}
+        cache.invalidate('key')
+        cache.clear_all()
+        assert cache.disk.cleanup_expired() == 0
+        assert cache.get_cache_stats()['disk_entries'] == 0
+
+class TestSQLiteBackend:
+    """Test SQLite-specific behaviour."""
+
+    def test_wal_mode(self, tmp_path):
+        """Test that the database runs in write-ahead-log mode."""
+        backend = SQLiteBackend(str(tmp_path))
+        assert backend._connection().execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    def test_locked_database_is_a_miss(self, tmp_path, monkeypatch):
+        """Test that lock contention degrades to misses and no-ops instead of raising."""
+        import sqlite3
+        backend = SQLiteBackend(str(tmp_path), timeout=0.05)
+        backend.set('key', 'value', ttl=-1)
+
+        # Another worker holds the write lock past the busy timeout
+        holder = sqlite3.connect(backend.path)
+        holder.execute("BEGIN EXCLUSIVE")
+        try:
+            backend.delete('key')
+            backend.clear()
+            assert backend.cleanup_expired() == 0
+            backend.set('other', 'value', ttl=60)
+            assert backend.get('key') is None
+        finally:
+            holder.rollback()
+            holder.close()
+
+        class LockedConnection:
+            def execute(self, *args):
+                raise sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(backend, '_connection', lambda: LockedConnection())
+        assert backend.get('key') is None
+        assert backend.stats() == {'entries': 0, 'size_bytes': 0}
+
+    def test_shared_between_managers(self, tmp_path):
+        """Test that two cache managers on one directory share the disk tier."""
+        writer = CacheManager(str(tmp_path), disk_backend='sqlite')
+        reader = CacheManager(str(tmp_path), disk_backend='sqlite')
+        writer.set_many({'a': 1, 'b': 2})
+        assert reader.get('b') == 2
+        assert reader.get_cache_stats()['disk_entries'] == 2
+
+def run_threads(target, count=8):
+    errors = []
+    def guarded(index):
+        try:
+            target(index)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+    threads = [threading.Thread(target=guarded, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+class TestConcurrency:
+    """Test tiers shared between threads and worker processes."""
+
+    def test_memory_tier_consistent_under_threads(self, tmp_path):
+        """Test that concurrent sets, gets and sweeps keep the byte accounting exact."""
+        cache = CacheManager(str(tmp_path), max_memory_bytes=20 * 1024, sweep_interval=0)
+
+        def worker(index):
+            for i in range(200):
+                key = f"key{(index + i) % 30}"
+                cache.set(key, array(1), ttl=60 if i % 3 else -1, disk=False)
+                cache.get_from_memory(key)
+                if i % 50 == 0:
+                    cache.sweep_memory()
+
+        run_threads(worker)
+        sizes = sum(entry[3] for entry in cache._memory_cache.values())
+        assert cache._memory_bytes == sizes
+        assert cache._memory_bytes <= cache.max_memory_bytes
+
+    def test_pickle_readers_never_see_partial_writes(self, tmp_path):
+        """Test that readers racing a writer get either nothing or a complete value."""
+        backend = PickleFileBackend(str(tmp_path))
+        value = np.arange(200_000.0)
+
+        def worker(index):
+            for _ in range(20):
+                if index % 2:
+                    backend.set('shared', value, ttl=60)
+                else:
+                    loaded = backend.get('shared')
+                    assert loaded is None or np.array_equal(loaded, value)
+
+        run_threads(worker)
+        assert np.array_equal(backend.get('shared'), value)
+        assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+    def test_pickle_only_removes_stale_entries(self, tmp_path):
+        """Test that a failed read never deletes an entry that is valid by the time it is rechecked."""
+        backend = PickleFileBackend(str(tmp_path))
+        backend.set('key', 'value', ttl=60)
+        assert not backend._remove_if_stale('key', backend._path('key'))
+        assert backend.get('key') == 'value'
+
+        with open(backend._path('key'), 'wb') as f:
+            f.write(b'not a pickle')
+        assert backend.get('key') is None
+        assert not os.path.exists(backend._path('key'))
+
+    def test_embedding_store_concurrent_puts(self, tmp_path):
+        """Test that concurrent rewrites of one entry leave consistent parts."""
+        store = EmbeddingStore(str(tmp_path))
+        versions = [np.full((50, 8), float(i), dtype=np.float32) for i in range(4)]
+
+        def worker(index):
+            for _ in range(10):
+                store.put('key', quantize_embeddings(versions[index % 4], 'int8'), ttl=60)
+                loaded = store.get('key')
+                if loaded is not None:
+                    # Codes, scales and norms must come from the same write
+                    assert len(set(np.round(loaded.dequantize()[:, 0], 1))) == 1
+
+        run_threads(worker)
+        assert store.stats()['entries'] == 1
+
+def slow_compute(cache, key, calls, seconds=0.2):
+    def compute():
+        calls.append(key)
+        time.sleep(seconds)
+        cache.set(key, 'value')
+        return 'value'
+    return compute
+
+def compute_in_worker(cache_dir, calls_dir):
+    """Child process body for the cross-worker single-flight test."""
+    cache = CacheManager(cache_dir)
+
+    def compute():
+        open(os.path.join(calls_dir, str(os.getpid())), 'w').close()
+        time.sleep(0.5)
+        cache.set('shared', 'value')
+        return 'value'
+
+    assert cache.single_flight('shared', lambda: cache.get('shared'), compute) == 'value'
+
+class TestSingleFlight:
+    """Test de-duplication of concurrent identical computations."""
+
+    def test_threads_compute_once(self, cache):
+        """Test that concurrent callers for one key share the first caller's result."""
+        calls, results = [], []
+        compute = slow_compute(cache, 'key', calls)
+        run_threads(lambda _: results.append(cache.single_flight('key', lambda: cache.get('key'), compute)))
+        assert calls == ['key']
+        assert results == ['value'] * 8
+        stats = cache.get_cache_stats()
+        assert (stats['single_flight_computed'], stats['single_flight_shared']) == (1, 7)
+        assert cache._flights == {}
+
+    def test_different_keys_run_concurrently(self, cache):
+        """Test that unrelated keys do not wait on each other in-process."""
+        calls = []
+        started = time.time()
+        run_threads(lambda i: cache.single_flight(f"key{i}", lambda: None,
+                                                  slow_compute(cache, f"key{i}", calls)), count=4)
+        assert len(calls) == 4
+        assert time.time() - started < 0.8
+
+    def test_timeout_computes_independently(self, cache):
+        """Test that a caller stops waiting after the timeout and computes itself."""
+        calls = []
+        leader = threading.Thread(target=cache.single_flight,
+                                  args=('key', lambda: None, slow_compute(cache, 'key', calls, 0.5)))
+        leader.start()
+        time.sleep(0.05)
+        assert cache.single_flight('key', lambda: None, lambda: 'own', timeout=0.1) == 'own'
+        leader.join()
+        assert cache.get_cache_stats()['single_flight_timeouts'] == 1
+
+    def test_worker_processes_compute_once(self, tmp_path):
+        """Test that worker processes sharing a cache directory compute a key once."""
+        import multiprocessing
+        calls_dir = tmp_path / 'calls'
+        calls_dir.mkdir()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=compute_in_worker, args=(str(tmp_path / 'cache'), str(calls_dir)))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert [worker.exitcode for worker in workers] == [0, 0, 0]
+        assert len(os.listdir(calls_dir)) == 1
+
+    def test_cached_decorator_option(self, cache, monkeypatch):
+        """Test single-flight through the cached decorator."""
+        monkeypatch.setattr(cache_manager, '_global_cache', cache)
+        calls = []
+
+        @cached(key_prefix='test', single_flight=True)
+        def analyse(document):
+            calls.append(document)
+            time.sleep(0.2)
+            return document.upper()
+
+        results = []
+        run_threads(lambda _: results.append(analyse('policy')))
+        assert calls == ['policy']
+        assert results == ['POLICY'] * 8
+
+class TestEmbeddingStore:
+    """Test the memory-mapped embedding array store."""
+
+    @pytest.fixture
+    def embeddings(self):
+        """Random embedding matrix."""
+        return np.random.default_rng(0).normal(size=(50, 32)).astype(np.float32)
+
+    @pytest.mark.parametrize('mode', ['float32', 'float16', 'int8'])
+    def test_round_trip_is_memory_mapped(self, tmp_path, embeddings, mode):
+        """Test that stored embeddings come back identical and memory-mapped."""
+        store = EmbeddingStore(str(tmp_path))
+        stored = quantize_embeddings(embeddings, mode)
+        assert store.put('doc_embeddings:org/model:abc', stored, ttl=60)
+
+        loaded = store.get('doc_embeddings:org/model:abc')
+        codes = loaded.codes if isinstance(loaded, QuantizedEmbeddings) else loaded
+        assert isinstance(codes, np.memmap)
+        queries = embeddings[:3]
+        assert np.allclose(embedding_cosine_similarity(queries, loaded),
+                           embedding_cosine_similarity(queries, stored))
+
+    def test_expiry_and_stats(self, tmp_path, embeddings):
+        """Test that expired entries disappear and stats count stored bytes."""
+        store = EmbeddingStore(str(tmp_path))
+        store.put('old', embeddings, ttl=-1)
+        store.put('new', embeddings, ttl=60)
+        assert store.get('old') is None
+        assert store.cleanup_expired() == 0
+        assert store.stats() == {'entries': 1, 'size_bytes': embeddings.nbytes}
+
+    def test_overwrite_keeps_existing_maps_valid(self, tmp_path, embeddings):
+        """Test that rewriting an entry does not change arrays already mapped."""
+        store = EmbeddingStore(str(tmp_path))
+        store.put('key', embeddings, ttl=60)
+        mapped = store.get('key')
+        store.put('key', embeddings * 2, ttl=60)
+        assert np.array_equal(mapped, embeddings)
+        assert np.array_equal(store.get('key'), embeddings * 2)
+
+    def test_overwrite_removes_stale_parts(self, tmp_path, embeddings):
+        """Test that replacing int8 embeddings with float32 ones leaves no orphaned parts."""
+        store = EmbeddingStore(str(tmp_path))
+        store.put('key', quantize_embeddings(embeddings, 'int8'), ttl=60)
+        store.put('key', embeddings, ttl=60)
+        assert sorted(name.split('.')[1] for name in os.listdir(tmp_path) if name.endswith('.npy')) == ['codes']
+        assert np.array_equal(store.get('key'), embeddings)
+        assert store.stats() == {'entries': 1, 'size_bytes': embeddings.nbytes}
+
+    def test_sweeps_and_stats_use_the_index(self, tmp_path, embeddings, monkeypatch):
+        """Test that expiry sweeps and statistics never list the store directory."""
+        store = EmbeddingStore(str(tmp_path))
+        store.put('old', embeddings, ttl=-1)
+        store.put('new', embeddings, ttl=60)
+        def no_listdir(path):
+            raise AssertionError("directory scanned")
+        monkeypatch.setattr(os, 'listdir', no_listdir)
+
+        other_worker = EmbeddingStore(str(tmp_path))
+        assert other_worker.stats() == {'entries': 2, 'size_bytes': 2 * embeddings.nbytes}
+        assert other_worker.cleanup_expired() == 1
+        assert store.stats()['entries'] == 1
+        store.clear()
+        assert other_worker.stats() == {'entries': 0, 'size_bytes': 0}
+
+    def test_cache_manager_uses_mapped_views(self, tmp_path, embeddings):
+        """Test that a new cache manager reads embeddings back as memory maps."""
+        CacheManager(str(tmp_path)).set_array('key', quantize_embeddings(embeddings, 'int8'))
+        reader = CacheManager(str(tmp_path))
+        loaded = reader.get_array('key')
+        assert isinstance(loaded.codes, np.memmap)
+        assert reader.get_cache_stats()['array_entries'] == 1
+        assert reader.get_cache_stats()['memory_bytes'] < embeddings.nbytes
@@ -0,0 +1,113 @@
+import pytest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chunking import (
+    TextChunks, chunk_text, sentence_spans, find_section_headers, group_chunks_by_section
+)
+
+def word_counts(texts):
+    """Token counter treating every word as one token."""
+    return [len(text.split()) for text in texts]
+
+@pytest.fixture
+def document():
+    """Document of twelve five-word sentences."""
+    return " ".join(f"Sentence number {i} says something." for i in range(12))
+
+class TestSentenceSpans:
+    """Test sentence segmentation."""
+
+    def test_spans_cover_text(self, document):
+        """Test that sentence spans keep their punctuation and cover every sentence."""
+        spans = sentence_spans(document)
+        assert len(spans) == 12
+        assert document[spans[0][0]:spans[0][1]] == "Sentence number 0 says something."
+        assert spans[-1][1] == len(document)
+
+class TestChunkText:
+    """Test token-budgeted chunking."""
+
+    def test_chunks_respect_budget(self, document):
+        """Test that no chunk exceeds the token budget."""
+        chunks = chunk_text(document, word_counts, max_tokens=12, overlap_tokens=0)
+        assert all(len(chunk.split()) <= 12 for chunk in chunks)
+
+    def test_tail_is_never_dropped(self, document):
+        """Test that the last sentence is covered even when sentences do not align."""
+        chunks = chunk_text(document, word_counts, max_tokens=15, overlap_tokens=0)
+        assert chunks.spans[-1][1] == len(document)
+        assert "Sentence number 11" in chunks[len(chunks) - 1]
+
+    def test_overlap_in_tokens(self, document):
+        """Test that consecutive chunks share trailing sentences within the overlap budget."""
+        chunks = chunk_text(document, word_counts, max_tokens=15, overlap_tokens=5)
+        for previous, current in zip(chunks.spans, chunks.spans[1:]):
+            assert current[0] < previous[1]
+            assert len(document[current[0]:previous[1]].split()) <= 5
+
+    def test_long_sentence_is_split(self):
+        """Test that a sentence longer than the budget is split on word boundaries."""
+        text = " ".join(f"word{i}" for i in range(100)) + "."
+        chunks = chunk_text(text, word_counts, max_tokens=30, overlap_tokens=0)
+        assert len(chunks) > 1
+        assert all(len(chunk.split()) <= 30 for chunk in chunks)
+        assert chunks.spans[-1][1] == len(text)
+
+    def test_over_long_token_is_split_by_characters(self):
+        """Test that a single token longer than the budget is cut until every chunk fits."""
+        def char_counts(texts):
+            return [-(-len(text.replace(' ', '')) // 4) for text in texts]
+        blob = "x" * 200
+        text = "Short opening sentence with several words here. " + blob + " Closing sentence."
+        chunks = chunk_text(text, char_counts, max_tokens=16, overlap_tokens=0)
+        assert all(count <= 16 for count in char_counts(list(chunks)))
+        assert "".join(chunks).count("x") == len(blob)
+        assert chunks.spans[-1][1] == len(text)
+
+    def test_short_document_has_no_chunks(self):
+        """Test that documents under the minimum word count produce no chunks."""
+        assert len(chunk_text("Too short.", word_counts)) == 0
+
+    def test_chunks_are_offsets(self, document):
+        """Test that chunks are slices of the original text with distinct cache keys per layout."""
+        chunks = chunk_text(document, word_counts, max_tokens=12, overlap_tokens=0)
+        assert isinstance(chunks, TextChunks)
+        start, end = chunks.spans[0]
+        assert chunks[0] == document[start:end]
+        other = chunk_text(document, word_counts, max_tokens=20, overlap_tokens=0)
+        assert chunks.cache_key() != other.cache_key()
+
+class TestSections:
+    """Test section detection and chunk grouping."""
+
+    def test_find_section_headers(self):
+        """Test headings are found in document order."""
+        text = "Intro text. Section 2: Access Control rules. Chapter 3: Incidents"
+        headers = find_section_headers(text)
+        assert [offset for offset, _ in headers] == sorted(offset for offset, _ in headers)
+        assert headers[0][0] == text.index("Section 2")
+
+    def test_groups_cover_all_chunks(self):
+        """Test that sections cover every chunk in order within the size bounds."""
+        text = "x" * 100
+        chunks = TextChunks(text, [(i, i + 1) for i in range(100)])
+        sections = group_chunks_by_section(chunks, [10, 12, 50], min_chunks=4, max_chunks=16)
+        flattened = [int(i) for section in sections for i in section]
+        assert flattened == list(range(100))
+        assert all(len(section) >= 4 for section in sections)
+        assert max(len(section) for section in sections) <= 16 + 4
+
+    def test_splits_at_headings(self):
+        """Test that a heading starts a new section once the minimum size is reached."""
+        chunks = TextChunks("x" * 20, [(i, i + 1) for i in range(20)])
+        sections = group_chunks_by_section(chunks, [10], min_chunks=2, max_chunks=16)
+        assert [section.tolist() for section in sections] == [list(range(10)), list(range(10, 20))]
+
+    def test_no_headings(self):
+        """Test that documents without headings are split into even sections."""
+        chunks = TextChunks("x" * 64, [(i, i + 1) for i in range(64)])
+        sections = group_chunks_by_section(chunks, [], min_chunks=8, max_chunks=16)
+        assert [len(section) for section in sections] == [16, 16, 16, 16]
+        assert group_chunks_by_section(TextChunks("", []), []) == []
@@ -0,0 +1,184 @@
+import pytest
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.encoders import (
+    HashingBiEncoder, HashingReRanker, TruncatedBiEncoder, create_bi_encoder, create_reranker,
+    encode_length_bucketed, truncate_embeddings
+)
+
+class TestHashingEncoders:
+    """Test the offline hashing stand-in encoders."""
+
+    def test_encode_is_deterministic(self):
+        """Test that the same text always maps to the same vector."""
+        encoder = HashingBiEncoder(dim=64)
+        first = encoder.encode(["Access control policy for users"])
+        second = HashingBiEncoder(dim=64).encode(["Access control policy for users"])
+        assert first.shape == (1, 64)
+        assert np.array_equal(first, second)
+
+    def test_embeddings_are_normalised(self):
+        """Test that embeddings have unit length (and empty text stays zero)."""
+        embeddings = HashingBiEncoder().encode(["incident response", ""])
+        assert np.isclose(np.linalg.norm(embeddings[0]), 1.0)
+        assert np.linalg.norm(embeddings[1]) == 0.0
+
+    def test_shared_vocabulary_scores_higher(self):
+        """Test that overlapping texts are more similar than unrelated ones."""
+        embeddings = HashingBiEncoder().encode([
+            "security incident response procedures",
+            "incident response procedures for security breaches",
+            "annual budget for the marketing team",
+        ])
+        assert embeddings[0] @ embeddings[1] > embeddings[0] @ embeddings[2]
+
+    def test_reranker_orders_pairs(self):
+        """Test that the stand-in re-ranker prefers relevant passages."""
+        scores = HashingReRanker().predict([
+            ("access control", "access control is enforced for all users"),
+            ("access control", "the canteen opens at nine"),
+        ])
+        assert scores.dtype == np.float32
+        assert scores[0] > scores[1]
+
+    def test_reranker_empty_pairs(self):
+        """Test that an empty pair list returns an empty array."""
+        assert len(HashingReRanker().predict([])) == 0
+
+class TestBackendFactory:
+    """Test backend selection."""
+
+    def test_hashing_backend(self):
+        """Test the factory builds the hashing stand-ins without a model download."""
+        assert isinstance(create_bi_encoder('hashing', 'ignored'), HashingBiEncoder)
+        assert isinstance(create_reranker('hashing', 'ignored'), HashingReRanker)
+
+    def test_unknown_backend(self):
+        """Test unknown backends are rejected."""
+        with pytest.raises(ValueError):
+            create_bi_encoder('tensorrt', 'model')
+        with pytest.raises(ValueError):
+            create_reranker('tensorrt', 'model')
+
+    def test_remote_code_is_opt_in(self, monkeypatch):
+        """Test that model repository code only runs when trust_remote_code is requested."""
+        sentence_transformers = pytest.importorskip('sentence_transformers')
+        loads = []
+        monkeypatch.setattr(sentence_transformers, 'SentenceTransformer',
+                            lambda model_name, **kwargs: loads.append(kwargs))
+        create_bi_encoder('sentence-transformers', 'some/model')
+        create_bi_encoder('sentence-transformers', 'Qwen/Qwen3-Embedding-0.6B', trust_remote_code=True)
+        assert [load['trust_remote_code'] for load in loads] == [False, True]
+
+class RecordingEncoder(HashingBiEncoder):
+    """Hashing encoder that records the batches it is asked to encode."""
+
+    def __init__(self):
+        super().__init__(dim=32)
+        self.batches = []
+
+    def encode(self, texts, batch_size=32):
+        self.batches.append(list(texts))
+        return super().encode(texts, batch_size)
+
+class TestLengthBucketedEncoding:
+    """Test token-budgeted batching."""
+
+    def test_preserves_input_order(self):
+        """Test embeddings come back in the order the texts were given."""
+        texts = ["word " * n for n in (3, 40, 7, 1, 25, 12)]
+        encoder = RecordingEncoder()
+        embeddings = encode_length_bucketed(encoder, texts, max_batch_tokens=60)
+        assert np.allclose(embeddings, HashingBiEncoder(dim=32).encode(texts))
+
+    def test_batches_respect_token_budget(self):
+        """Test no batch pads past the token budget and lengths are grouped."""
+        texts = ["word " * n for n in (3, 40, 7, 1, 25, 12, 2, 30)]
+        encoder = RecordingEncoder()
+        encode_length_bucketed(encoder, texts, max_batch_tokens=64)
+        for batch in encoder.batches:
+            counts = encoder.count_tokens(batch)
+            assert len(batch) == 1 or max(counts) * len(batch) <= 64
+        assert len(encoder.batches) > 1
+
+    def test_empty_input(self):
+        """Test encoding nothing returns an empty array."""
+        assert len(encode_length_bucketed(RecordingEncoder(), [])) == 0
+
+class TestTruncatedEmbeddings:
+    """Test Matryoshka-style embedding truncation."""
+
+    def test_truncate_renormalises(self):
+        """Test that truncated vectors keep the leading components at unit length."""
+        embeddings = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+        truncated = truncate_embeddings(embeddings, 2)
+        assert np.allclose(truncated[0], [0.6, 0.8])
+        assert np.array_equal(truncated[1], [0.0, 0.0])
+
+    def test_wrapper_dimension_and_name(self):
+        """Test that the wrapper shortens vectors and keys caches by dimension."""
+        encoder = TruncatedBiEncoder(HashingBiEncoder(dim=64), 16)
+        embeddings = encoder.encode_batched(["access control policy", "incident response"])
+        assert embeddings.shape == (2, 16)
+        assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0)
+        assert encoder.name != HashingBiEncoder(dim=64).name
+        assert encoder.count_tokens(["two words"]) == HashingBiEncoder().count_tokens(["two words"])
+
+    def test_factory_truncates(self):
+        """Test that embedding_dim wraps the backend."""
+        encoder = create_bi_encoder('hashing', 'unused', embedding_dim=32)
+        assert encoder.encode(["text"]).shape == (1, 32)
+
+    def test_invalid_dimension(self):
+        """Test that non-positive dimensions are rejected."""
+        with pytest.raises(ValueError):
+            TruncatedBiEncoder(HashingBiEncoder(), 0)
+
+class TestEncodingPool:
+    """Test multi-process chunk encoding."""
+
+    @pytest.fixture
+    def pool(self):
+        """Two-worker pool running the hashing backend."""
+        from utils.encoding_pool import EncodingPool
+        pool = EncodingPool('hashing', 'unused', num_workers=2, threads_per_worker=1, min_texts_per_worker=2)
+        yield pool
+        pool.close()
+
+    def test_matches_single_process(self, pool):
+        """Test that sharded encoding returns the local embeddings in input order."""
+        texts = [f"policy clause {i} " * (1 + i % 4) for i in range(20)]
+        expected = HashingBiEncoder().encode_batched(texts)
+        assert np.allclose(pool.encode_batched(texts), expected)
+        assert pool.name == HashingBiEncoder().name
+
+    def test_small_calls_stay_local(self, pool):
+        """Test that calls below the sharding threshold are encoded in-process."""
+        assert pool.encode(["one text"]).shape == (1, 384)
+
+    def test_parent_threads_are_not_pinned(self, monkeypatch):
+        """Test that the per-worker thread split is not applied to the parent process."""
+        torch = pytest.importorskip('torch')
+        sentence_transformers = pytest.importorskip('sentence_transformers')
+        from utils.encoding_pool import EncodingPool
+        pinned = []
+        monkeypatch.setattr(torch, 'set_num_threads', pinned.append)
+        monkeypatch.setattr(sentence_transformers, 'SentenceTransformer', lambda model_name, **kwargs: None)
+        pool = EncodingPool('sentence-transformers', 'some/model', num_workers=2)
+        try:
+            assert pool.threads_per_worker >= 1
+            assert pinned == []
+        finally:
+            pool.close()
+
+    def test_factory_creates_pool(self):
+        """Test that pool_workers wraps the backend in a pool."""
+        encoder = create_bi_encoder('hashing', 'unused', pool_workers=1)
+        try:
+            encoder.warm_up()
+            assert encoder.num_workers == 1
+        finally:
+            encoder.close()
@@ -0,0 +1,100 @@
+import pytest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enhanced_compliance_checker import EnhancedComplianceChecker
+from semantic_compliance_checker import SemanticComplianceChecker
+from hybrid_compliance_checker import HybridComplianceChecker
+from pdf_parser import PDFParser
+from utils.pipeline import NormalisedDocument
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_POLICY = os.path.join(REPO_ROOT, 'InformationSecurityPolicy-godfreyphillips.pdf')
+
+@pytest.fixture
+def enhanced(isolated_cache):
+    """Keyword-based enhanced checker."""
+    return EnhancedComplianceChecker()
+
+@pytest.fixture
+def semantic(isolated_cache):
+    """Semantic checker using the offline hashing backend."""
+    return SemanticComplianceChecker(backend='hashing')
+
+class TestHybridComplianceChecker:
+    """Test the lexically gated semantic analysis."""
+
+    def test_every_control_decided_once(self, enhanced, semantic, policy_text):
+        """Test that each control is decided either lexically or by the models."""
+        results = HybridComplianceChecker(enhanced, semantic).check_compliance(policy_text, 'balanced')
+        hybrid = results['metadata']['hybrid']
+
+        assert len(results['details']) == len(semantic.standards)
+        assert hybrid['semantic_controls'] and hybrid['lexical_controls']
+        assert not set(hybrid['semantic_controls']) & set(hybrid['lexical_controls'])
+        assert {d['decided_by'] for d in results['details']} == {'lexical', 'semantic'}
+        assert results['metadata']['cascade']['lexical_controls'] == len(hybrid['lexical_controls'])
+        assert results['method'].startswith('Hybrid')
+
+    def test_lexical_controls_keep_enhanced_results(self, enhanced, semantic, policy_text):
+        """Test that controls without keyword evidence report the enhanced verdict."""
+        lexical = {d['id']: d for d in enhanced.check_compliance(policy_text)['details']}
+        results = HybridComplianceChecker(enhanced, semantic).check_compliance(policy_text, 'balanced')
+
+        for detail in results['details']:
+            if detail['decided_by'] == 'lexical':
+                assert detail['score'] == lexical[detail['id']]['score']
+                assert detail['status'] == lexical[detail['id']]['status']
+
+    def test_gate_restricts_encoded_chunks(self, enhanced, semantic, policy_text):
+        """Test that only chunks containing gated keywords reach the bi-encoder."""
+        results = HybridComplianceChecker(enhanced, semantic).check_compliance(policy_text, 'accurate')
+        gate = results['metadata']['lexical_gate']
+        assert gate['enabled']
+        assert 0 < gate['encoded_chunks'] <= gate['total_chunks']
+
+    def test_summary_is_consistent(self, enhanced, semantic, policy_text):
+        """Test that summary counts match the reported details."""
+        results = HybridComplianceChecker(enhanced, semantic).check_compliance(policy_text)
+        summary = results['summary']
+        matched = sum(1 for d in results['details'] if d['confidence'] != 'none')
+        assert summary['matched_controls'] == matched
+        assert (summary['high_confidence'] + summary['medium_confidence'] + summary['low_confidence']
+                + summary['non_compliant']) == summary['total_controls']
+
+    def test_no_lexical_evidence_skips_models(self, enhanced, semantic, policy_text):
+        """Test that nothing is embedded when no control passes the gate."""
+        checker = HybridComplianceChecker(enhanced, semantic, min_lexical_score=2.0)
+        results = checker.check_compliance(policy_text)
+        assert results['metadata']['hybrid']['semantic_controls'] == []
+        assert all(d['decided_by'] == 'lexical' for d in results['details'])
+        assert 'embed' not in {record['stage'] for record in results['metadata']['stages']}
+
+    def test_gate_matches_whole_words(self, enhanced, semantic):
+        """Test that keywords inside longer words are not lexical evidence."""
+        enhanced.control_keywords = {'x.1': ['use', 'read', 'test']}
+        lexical_results = {'details': [{'id': 'x.1', 'score': 1.0}]}
+        checker = HybridComplianceChecker(enhanced, semantic)
+        assert checker._lexical_gate(NormalisedDocument("The user already ran the latest build.", ''),
+                                     lexical_results) == {}
+        assert checker._lexical_gate(NormalisedDocument("Staff use, read and test the plan.", ''),
+                                     lexical_results) == {'x.1': ['read', 'test', 'use']}
+
+    def test_realistic_policy_skips_controls(self, enhanced, semantic):
+        """Test that a real policy only sends the controls and chunks with keyword evidence to the models."""
+        if not os.path.exists(SAMPLE_POLICY):
+            pytest.skip("sample policy not available")
+        content = PDFParser(SAMPLE_POLICY).extract_text()
+        lexical = {d['id']: d for d in enhanced.check_compliance(content)['details']}
+        results = HybridComplianceChecker(enhanced, semantic).check_compliance(content, 'balanced')
+        hybrid = results['metadata']['hybrid']
+        gate = results['metadata']['lexical_gate']
+
+        assert 0 < len(hybrid['semantic_controls']) < len(results['details'])
+        assert gate['encoded_chunks'] < gate['total_chunks']
+        # Controls passing on the whole text but without one chunk of evidence keep the enhanced verdict
+        assert gate['controls_without_evidence'] > 0
+        for detail in results['details']:
+            if detail['decided_by'] == 'lexical':
+                assert detail['status'] == lexical[detail['id']]['status']
@@ -0,0 +1,121 @@
+import pytest
+import stat
+import threading
+import time
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.encoders import HashingBiEncoder, HashingReRanker, create_bi_encoder, create_reranker
+from multiprocessing import AuthenticationError
+from utils.model_server import MicroBatcher, ModelServer, RemoteBiEncoder, check_socket_path
+
+AUTHKEY = b'test-secret'
+
+@pytest.fixture
+def server(tmp_path):
+    """Model server on a temporary socket using the hashing backend."""
+    socket_path = str(tmp_path / 'run' / 'models.sock')
+    server = ModelServer(socket_path, HashingBiEncoder(), HashingReRanker(), max_wait=0.05, authkey=AUTHKEY)
+    server.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.close()
+
+class TestMicroBatcher:
+    """Test coalescing of concurrent requests."""
+
+    def test_concurrent_requests_share_batches(self):
+        """Test that simultaneous callers are served by fewer model calls."""
+        calls = []
+
+        def run_batch(items):
+            calls.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(run_batch, max_wait=0.1, max_items=1000)
+        results = {}
+
+        def caller(n):
+            results[n] = batcher.submit([n, n + 100])
+
+        threads = [threading.Thread(target=caller, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(results[n] == [n * 2, (n + 100) * 2] for n in range(8))
+        assert len(calls) < 8
+        assert sum(calls) == 16
+
+    def test_errors_reach_every_caller(self):
+        """Test that a failing batch raises in the waiting callers."""
+        def run_batch(items):
+            raise RuntimeError("model failed")
+
+        batcher = MicroBatcher(run_batch, max_wait=0.01)
+        with pytest.raises(RuntimeError):
+            batcher.submit(['text'])
+
+class TestModelServer:
+    """Test remote encoders against a live server."""
+
+    def test_remote_encode_matches_local(self, server):
+        """Test that remote embeddings equal local ones and keep the model name."""
+        remote = create_bi_encoder('remote', 'ignored', socket_path=server.socket_path, authkey=AUTHKEY)
+        texts = ["access control policy", "incident response", "asset inventory"]
+        assert remote.name == HashingBiEncoder().name
+        assert np.allclose(remote.encode_batched(texts), HashingBiEncoder().encode(texts))
+        assert remote.count_tokens(texts) == HashingBiEncoder().count_tokens(texts)
+
+    def test_remote_rerank_matches_local(self, server):
+        """Test that remote re-ranking equals local scoring."""
+        remote = create_reranker('remote', 'ignored', socket_path=server.socket_path, authkey=AUTHKEY)
+        pairs = [("access control", "users authenticate with MFA"), ("backup", "daily backups are taken")]
+        assert np.allclose(remote.predict(pairs), HashingReRanker().predict(pairs))
+
+    def test_server_errors_are_reported(self, server):
+        """Test that server-side failures surface as RuntimeError."""
+        remote = create_bi_encoder('remote', 'ignored', socket_path=server.socket_path, authkey=AUTHKEY)
+        with pytest.raises(RuntimeError):
+            remote.client.call('unknown_op')
+
+class TestModelServerSecurity:
+    """Test that only the current user's authenticated workers reach the server."""
+
+    def test_authkey_is_required(self, tmp_path):
+        """Test that neither side runs without a shared secret."""
+        with pytest.raises(ValueError):
+            ModelServer(str(tmp_path / 'models.sock'), HashingBiEncoder(), HashingReRanker())
+        with pytest.raises(ValueError):
+            create_bi_encoder('remote', 'ignored', socket_path=str(tmp_path / 'models.sock'))
+
+    def test_wrong_authkey_is_rejected(self, server):
+        """Test that a client with another secret is refused and the server keeps serving."""
+        with pytest.raises(AuthenticationError):
+            RemoteBiEncoder(server.socket_path, b'wrong-secret')
+        assert RemoteBiEncoder(server.socket_path, AUTHKEY).name == HashingBiEncoder().name
+
+    def test_socket_is_private(self, server):
+        """Test that the socket and its directory are closed to other users."""
+        assert stat.S_IMODE(os.stat(os.path.dirname(server.socket_path)).st_mode) == 0o700
+        assert stat.S_IMODE(os.stat(server.socket_path).st_mode) & 0o077 == 0
+
+    def test_shared_directory_is_refused(self, tmp_path):
+        """Test that a socket in a directory other users can enter is refused."""
+        shared = tmp_path / 'shared'
+        shared.mkdir(mode=0o755)
+        os.chmod(shared, 0o755)
+        server = ModelServer(str(shared / 'models.sock'), HashingBiEncoder(), HashingReRanker(), authkey=AUTHKEY)
+        with pytest.raises(PermissionError):
+            server.start()
+
+    def test_other_users_socket_is_refused(self, server, monkeypatch):
+        """Test that a socket path owned by another user is neither served nor connected to."""
+        monkeypatch.setattr(os, 'getuid', lambda: os.stat(server.socket_path).st_uid + 1)
+        with pytest.raises(PermissionError):
+            check_socket_path(server.socket_path)
+        with pytest.raises(PermissionError):
+            RemoteBiEncoder(server.socket_path, AUTHKEY)
@@ -0,0 +1,149 @@
+import pytest
+import time
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.pipeline as pipeline
+from utils.cache_manager import CacheManager, get_content_hash
+from utils.pipeline import (
+    STAGES,
+    PipelineRun,
+    extract_document,
+    normalise_document,
+    segment_sentences,
+)
+
+@pytest.fixture
+def boilerplate_text():
+    """Sample policy text with boilerplate and messy whitespace."""
+    return (
+        "CONFIDENTIAL - internal distribution\n"
+        "Access Control.   All users must authenticate before access is granted.\n"
+        "Incident Management. Security incidents are reported within 24 hours. "
+        "Training. Employees complete security awareness training every year."
+    )
+
+def stage(run, name):
+    return next(record for record in run.report() if record['stage'] == name)
+
+def stage_names(results):
+    return {record['stage'] for record in results['metadata']['stages']}
+
+class TestPipelineRun:
+    """Test stage timing and caching."""
+
+    def test_nested_stages_record_own_time(self):
+        """Test that a nested stage's time is excluded from its parent."""
+        run = PipelineRun()
+        with run.stage('retrieve'):
+            with run.stage('rerank'):
+                time.sleep(0.05)
+        assert stage(run, 'rerank')['seconds'] >= 0.04
+        assert stage(run, 'retrieve')['seconds'] < 0.04
+
+    def test_repeated_stage_accumulates(self):
+        """Test that repeated calls of a stage are summed in one record."""
+        run = PipelineRun()
+        for _ in range(3):
+            with run.stage('retrieve'):
+                pass
+        assert stage(run, 'retrieve')['calls'] == 3
+
+    def test_report_in_pipeline_order(self):
+        """Test that the report follows the stage order, not the call order."""
+        run = PipelineRun()
+        for name in reversed(STAGES):
+            with run.stage(name):
+                pass
+        assert [record['stage'] for record in run.report()] == list(STAGES)
+
+    def test_unknown_stage(self):
+        """Test that stages outside the pipeline are rejected."""
+        with pytest.raises(ValueError):
+            with PipelineRun().stage('tokenize'):
+                pass
+
+    def test_cached_stage(self, isolated_cache):
+        """Test that a cached stage computes once per key across runs."""
+        calls = []
+        compute = lambda: calls.append(1) or 'output'
+        first, second = PipelineRun(), PipelineRun()
+        assert first.cached('normalise', 'key', compute) == 'output'
+        assert second.cached('normalise', 'key', compute) == 'output'
+        assert len(calls) == 1
+        assert stage(first, 'normalise')['cache_hits'] == 0
+        assert stage(second, 'normalise')['cache_hits'] == 1
+
+class TestSharedStages:
+    """Test the upstream stages shared by the checkers."""
+
+    def test_extract_cached_by_file_bytes(self, isolated_cache, tmp_path):
+        """Test that the same file is only extracted once."""
+        path = tmp_path / 'upload.pdf'
+        path.write_bytes(b'%PDF-1.4 sample')
+        assert extract_document(PipelineRun(), str(path), lambda: 'text').text == 'text'
+        assert extract_document(PipelineRun(), str(path), lambda: 'other').text == 'text'
+
+    def test_document_text_stays_in_memory(self, isolated_cache, tmp_path, boilerplate_text):
+        """Test that upload text is not written to the shared disk tier, but derived spans are."""
+        path = tmp_path / 'upload.pdf'
+        path.write_bytes(b'%PDF-1.4 sample')
+        run = PipelineRun()
+        extract_document(run, str(path), lambda: boilerplate_text)
+        segment_sentences(run, normalise_document(run, boilerplate_text))
+
+        other_worker = CacheManager(isolated_cache.cache_dir)
+        assert other_worker.get(f"stage:normalise:{get_content_hash(boilerplate_text)}") is None
+        # Only the sentence spans were written to disk
+        assert other_worker.get_cache_stats()['disk_entries'] == 1
+
+    def test_persisting_text_is_opt_in(self, isolated_cache, monkeypatch, boilerplate_text):
+        """Test that PERSIST_DOCUMENT_TEXT writes the normalised text through to disk."""
+        monkeypatch.setattr(pipeline, 'PERSIST_DOCUMENT_TEXT', True)
+        document = normalise_document(PipelineRun(), boilerplate_text)
+        isolated_cache._memory_cache.clear()
+        assert normalise_document(PipelineRun(), boilerplate_text).text == document.text
+        assert isolated_cache.get_cache_stats()['disk_entries'] == 1
+
+    def test_normalise_and_segment(self, isolated_cache, boilerplate_text):
+        """Test that normalisation drops boilerplate and segmentation splits sentences."""
+        run = PipelineRun()
+        document = normalise_document(run, boilerplate_text)
+        assert 'CONFIDENTIAL' not in document.text
+        assert '  ' not in document.text
+        segments = segment_sentences(run, document)
+        assert segments.sentences()[0] == "Access Control."
+        assert len(segments.spans) == 6
+
+    def test_enhanced_features_use_shared_sentences(self, isolated_cache):
+        """Test the enhanced checker's features on the shared normalised sentences."""
+        from enhanced_compliance_checker import EnhancedComplianceChecker
+
+        text = ("CONFIDENTIAL - this policy document is for internal use only\n"
+                "Page 1 of 3\n"
+                "The organisation's access policy, e.g. for remote access, is reviewed yearly. "
+                "Employees complete awareness training.")
+        features = EnhancedComplianceChecker().extract_semantic_features(text)
+        # The banner and footer no longer form part of a sentence, and "e.g." does not split one
+        assert features == {
+            'policies': ["The organisation s access policy, e.g. for remote access, is reviewed yearly."],
+            'access_control': ["The organisation s access policy, e.g. for remote access, is reviewed yearly."],
+            'training': ["Employees complete awareness training."],
+        }
+
+    def test_checkers_share_upstream_work(self, isolated_cache, boilerplate_text):
+        """Test that the semantic checker reuses the enhanced checker's cleaning and segmentation."""
+        from enhanced_compliance_checker import EnhancedComplianceChecker
+        from semantic_compliance_checker import SemanticComplianceChecker
+
+        enhanced = EnhancedComplianceChecker().check_compliance(boilerplate_text)
+        assert stage_names(enhanced) >= {'normalise', 'segment', 'retrieve', 'aggregate'}
+
+        semantic_run = PipelineRun()
+        SemanticComplianceChecker(backend='hashing').check_compliance(boilerplate_text, 'fast', semantic_run)
+        assert stage(semantic_run, 'normalise')['cache_hits'] == 1
+        # Sentence spans come from the cache; only the token packing is computed
+        assert stage(semantic_run, 'segment')['cache_hits'] == 1
+        assert stage(semantic_run, 'segment')['calls'] >= 2
+        assert {'embed', 'retrieve', 'aggregate'} <= {record['stage'] for record in semantic_run.report()}
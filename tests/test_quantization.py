@@ -0,0 +1,76 @@
+import pytest
+import pickle
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.quantization import (
+    QuantizedEmbeddings, quantize_embeddings, dequantize_embeddings, embedding_cosine_similarity
+)
+
+@pytest.fixture
+def embeddings():
+    """Random float32 embedding matrix."""
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(50, 64)).astype(np.float32)
+
+class TestQuantizeEmbeddings:
+    """Test compact embedding storage formats."""
+
+    @pytest.mark.parametrize('mode,ratio', [('float16', 2), ('int8', 3)])
+    def test_compact_size(self, embeddings, mode, ratio):
+        """Test that quantized storage is substantially smaller than float32."""
+        quantized = quantize_embeddings(embeddings, mode)
+        assert isinstance(quantized, QuantizedEmbeddings)
+        assert quantized.nbytes * ratio <= embeddings.nbytes * 1.1
+
+    @pytest.mark.parametrize('mode,tolerance', [('float16', 1e-3), ('int8', 2e-2)])
+    def test_roundtrip_accuracy(self, embeddings, mode, tolerance):
+        """Test that dequantized values stay close to the originals."""
+        restored = dequantize_embeddings(quantize_embeddings(embeddings, mode))
+        assert restored.dtype == np.float32
+        relative_error = np.abs(restored - embeddings).max() / np.abs(embeddings).max()
+        assert relative_error < tolerance
+
+    @pytest.mark.parametrize('mode', ['float16', 'int8'])
+    def test_similarity_on_compact_form(self, embeddings, mode):
+        """Test cosine similarity computed on codes matches the float32 result."""
+        queries = embeddings[:3]
+        expected = embedding_cosine_similarity(queries, embeddings)
+        actual = embedding_cosine_similarity(queries, quantize_embeddings(embeddings, mode))
+        assert actual.shape == (3, 50)
+        assert np.allclose(actual, expected, atol=2e-2)
+
+    @pytest.mark.parametrize('mode', ['float16', 'int8'])
+    def test_norms_of_dequantized_vectors(self, embeddings, mode):
+        """Test that recorded norms describe the dequantized vectors, not the float32 originals."""
+        quantized = quantize_embeddings(embeddings, mode)
+        restored = quantized.dequantize()
+        assert np.allclose(quantized.norms, np.linalg.norm(restored, axis=1), rtol=1e-6)
+        assert np.allclose(embedding_cosine_similarity(embeddings[:3], quantized),
+                           embedding_cosine_similarity(embeddings[:3], restored), atol=1e-6)
+
+    def test_row_indexing(self, embeddings):
+        """Test integer and fancy indexing on quantized matrices."""
+        quantized = quantize_embeddings(embeddings, 'int8')
+        assert quantized[0].shape == (64,)
+        subset = quantized[[1, 3, 5]]
+        assert isinstance(subset, QuantizedEmbeddings)
+        assert len(subset) == 3
+
+    def test_pickle_roundtrip(self, embeddings):
+        """Test quantized matrices survive the disk cache's pickling."""
+        quantized = quantize_embeddings(embeddings, 'int8')
+        restored = pickle.loads(pickle.dumps(quantized))
+        assert np.array_equal(restored.codes, quantized.codes)
+        assert np.array_equal(restored.scales, quantized.scales)
+
+    def test_float32_passthrough(self, embeddings):
+        """Test float32 mode returns a plain ndarray."""
+        assert isinstance(quantize_embeddings(embeddings, 'float32'), np.ndarray)
+
+    def test_unknown_mode(self, embeddings):
+        """Test unknown modes are rejected."""
+        with pytest.raises(ValueError):
+            quantize_embeddings(embeddings, 'int4')
@@ -0,0 +1,105 @@
+import pytest
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.retrieval import KeywordPostingIndex, BM25Index, dense_ranking, reciprocal_rank_fusion
+
+@pytest.fixture
+def chunks():
+    """Small set of document chunks."""
+    return [
+        "Access Control policies are reviewed by the security team.",
+        "All employees complete security awareness training.",
+        "Backups are encrypted and stored offsite.",
+        "Password rules apply to every user ACCESS request.",
+    ]
+
+class TestKeywordPostingIndex:
+    """Test the keyword posting-list prefilter."""
+
+    def test_matches_substring_scan(self, chunks):
+        """Test candidates equal the naive lowercase substring filter."""
+        keywords = ['access control', 'access', 'control', 'training', 'encrypt', 'pass', 'missing']
+        index = KeywordPostingIndex(chunks, keywords)
+        for keyword_set in (['access'], ['control', 'training'], ['encrypt', 'pass'], keywords, ['missing']):
+            expected = [i for i, chunk in enumerate(chunks)
+                        if any(keyword.lower() in chunk.lower() for keyword in keyword_set)]
+            assert index.candidates(keyword_set).tolist() == expected
+
+    def test_overlapping_keywords(self, chunks):
+        """Test keywords contained in a longer match are still posted."""
+        index = KeywordPostingIndex(chunks, ['access control', 'control', 'access'])
+        assert index.lookup('control').tolist() == [0]
+        assert index.lookup('access').tolist() == [0, 3]
+
+    def test_case_insensitive_lookup(self, chunks):
+        """Test lookups ignore keyword case."""
+        index = KeywordPostingIndex(chunks, ['Backups'])
+        assert index.lookup('BACKUPS').tolist() == [2]
+
+    def test_empty_inputs(self, chunks):
+        """Test empty chunk or keyword lists produce empty candidates."""
+        assert len(KeywordPostingIndex([], ['access']).candidates(['access'])) == 0
+        assert len(KeywordPostingIndex(chunks, []).candidates(['access'])) == 0
+        assert KeywordPostingIndex(chunks, ['access']).candidates([]).dtype == np.int64
+
+    def test_whole_words(self, chunks):
+        """Test whole-word matching skips keywords inside longer words."""
+        index = KeywordPostingIndex(chunks, ['pass', 'use', 'user', 'access'], whole_words=True)
+        assert index.lookup('pass').tolist() == []
+        assert index.lookup('use').tolist() == []
+        assert index.lookup('user').tolist() == [3]
+        assert index.lookup('access').tolist() == [0, 3]
+
+    def test_min_matches(self, chunks):
+        """Test candidates can require several distinct keywords per chunk."""
+        index = KeywordPostingIndex(chunks, ['access', 'control', 'security', 'user'])
+        assert index.candidates(['access', 'control', 'user'], min_matches=2).tolist() == [0, 3]
+        assert index.candidates(['access', 'control', 'security'], min_matches=3).tolist() == [0]
+        assert index.candidates(['access', 'ACCESS'], min_matches=2).tolist() == []
+
+class TestBM25Index:
+    """Test lexical scoring of document chunks."""
+
+    def test_ranks_matching_chunks(self, chunks):
+        """Test that only chunks sharing query terms are ranked, best first."""
+        index = BM25Index(chunks)
+        ranking = index.rank("security awareness training")
+        assert ranking[0] == 1
+        assert set(ranking.tolist()) == {0, 1}
+
+    def test_rare_terms_weigh_more(self, chunks):
+        """Test that terms in fewer chunks contribute more to the score."""
+        index = BM25Index(chunks)
+        scores = index.score("access backups")
+        assert scores[2] > scores[0]
+
+    def test_rank_limit(self, chunks):
+        """Test that rank honours the limit."""
+        assert len(BM25Index(chunks).rank("access security", limit=1)) == 1
+
+    def test_no_matches(self, chunks):
+        """Test that unknown terms and empty indexes score zero."""
+        assert not BM25Index(chunks).score("nonexistent").any()
+        assert len(BM25Index([]).rank("access")) == 0
+
+class TestRankFusion:
+    """Test reciprocal-rank fusion of candidate rankings."""
+
+    def test_agreement_wins(self):
+        """Test that items ranked by both lists beat items ranked by one."""
+        fused = reciprocal_rank_fusion([[0, 1, 2], [3, 1, 0]])
+        assert fused[:2].tolist() == [0, 1]
+        assert len(fused) == 4
+
+    def test_limit_and_ties(self):
+        """Test that ties keep first-ranking order and the limit applies."""
+        assert reciprocal_rank_fusion([[5, 6], [7, 8]], limit=2).tolist() == [5, 7]
+
+    def test_dense_ranking(self):
+        """Test dense ranking orders by similarity with and without a limit."""
+        similarities = np.array([0.1, 0.9, 0.5, 0.7])
+        assert dense_ranking(similarities).tolist() == [1, 3, 2, 0]
+        assert dense_ranking(similarities, 2).tolist() == [1, 3]
@@ -0,0 +1,265 @@
+import pytest
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from semantic_compliance_checker import SemanticComplianceChecker
+
+@pytest.fixture
+def checker(isolated_cache):
+    """Semantic checker using the offline hashing backend."""
+    return SemanticComplianceChecker(backend='hashing')
+
+class TestSemanticComplianceChecker:
+    """Test the semantic checker end to end with the hashing backend."""
+
+    def test_results_structure(self, checker, policy_text):
+        """Test that results have the structure the app expects."""
+        results = checker.check_compliance(policy_text)
+        assert 0 <= results['compliance_score'] <= 100
+        assert results['summary']['total_controls'] == len(checker.standards)
+        assert len(results['details']) == len(checker.standards)
+        for detail in results['details']:
+            assert 0.0 <= detail['score'] <= 1.0
+            assert detail['status'] in {'High Confidence', 'Medium Confidence', 'Low Confidence', 'Non-compliant'}
+
+    def test_cache_hit_matches_miss(self, checker, policy_text):
+        """Test that scoring from cached embeddings reproduces the first run."""
+        first = checker.check_compliance(policy_text)
+        second = checker.check_compliance(policy_text)
+        assert [d['score'] for d in first['details']] == [d['score'] for d in second['details']]
+
+    @pytest.mark.parametrize('mode', ['float16', 'int8'])
+    def test_cold_and_warm_runs_agree(self, isolated_cache, policy_text, monkeypatch, mode):
+        """Test that a checker encoding everything scores exactly like one reading the cached embeddings."""
+        monkeypatch.setattr(Config, 'EMBEDDING_CACHE_QUANTIZATION', mode)
+        cold_checker = SemanticComplianceChecker(backend='hashing')
+        cold = cold_checker.check_compliance(policy_text)
+        warm_checker = SemanticComplianceChecker(backend='hashing')
+        warm = warm_checker.check_compliance(policy_text)
+        for control_id, control in cold_checker.control_embeddings.items():
+            assert np.array_equal(control['embedding'], warm_checker.control_embeddings[control_id]['embedding'])
+        assert [d['score'] for d in cold['details']] == [d['score'] for d in warm['details']]
+
+    def test_iter_compliance_events(self, checker, policy_text):
+        """Test that progress events precede per-control results and the final results."""
+        events = list(checker.iter_compliance(policy_text))
+        names = [event for event, _ in events]
+        assert names[:2] == ['chunked', 'embedded']
+        assert names[-1] == 'complete'
+        controls = [data for event, data in events if event == 'control']
+        assert len(controls) == len(checker.standards)
+        assert controls[-1]['scored'] == controls[-1]['total']
+        assert [c['control'] for c in controls] == events[-1][1]['details']
+
+    def test_truncated_embedding_dim(self, isolated_cache, policy_text, monkeypatch):
+        """Test that a configured embedding dimension applies to controls and documents alike."""
+        monkeypatch.setattr(Config, 'EMBEDDING_DIM', 64)
+        truncated = SemanticComplianceChecker(backend='hashing')
+        control = next(iter(truncated.control_embeddings.values()))
+        assert control['embedding'].shape == (64,)
+        results = truncated.check_compliance(policy_text)
+        assert len(results['details']) == len(truncated.standards)
+
+    def test_concurrent_requests_encode_once(self, checker, policy_text, monkeypatch):
+        """Test that simultaneous analyses of one document share a single document encode."""
+        import threading
+        import time
+        encoded = []
+        encode_batched = checker.bi_encoder.encode_batched
+
+        def slow_encode(texts, *args):
+            encoded.append(len(texts))
+            time.sleep(0.2)
+            return encode_batched(texts, *args)
+
+        monkeypatch.setattr(checker.bi_encoder, 'encode_batched', slow_encode)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(checker.check_compliance(policy_text, 'fast')))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(encoded) == 1
+        assert len({tuple(d['score'] for d in r['details']) for r in results}) == 1
+
+    def test_empty_document(self, checker):
+        """Test that a document without usable chunks scores zero."""
+        results = checker.check_compliance("Too short.")
+        assert results['compliance_score'] == 0
+
+class TestRerankCascade:
+    """Test the bi-encoder confidence cascade."""
+
+    def test_cascade_metadata(self, checker, policy_text):
+        """Test that every control is accounted for in the cascade report."""
+        results = checker.check_compliance(policy_text)
+        cascade = results['metadata']['cascade']
+        total = cascade['skipped_controls'] + cascade['reduced_controls'] + cascade['full_controls']
+        assert total == len(checker.standards)
+        assert cascade['skipped_fraction'] == cascade['skipped_controls'] / len(checker.standards)
+
+    def test_skipped_controls_are_non_compliant(self, checker, policy_text):
+        """Test that a lower bound above every similarity skips the cross-encoder entirely."""
+        checker.profiles['balanced']['cascade_lower_bound'] = 1.1
+        results = checker.check_compliance(policy_text)
+        assert results['metadata']['cascade']['skipped_fraction'] == 1.0
+        assert results['metadata']['cascade']['reranked_pairs'] == 0
+        assert all(d['status'] == 'Non-compliant' for d in results['details'])
+
+    def test_confident_controls_use_reduced_top_k(self, checker, policy_text):
+        """Test that controls above the upper bound re-rank fewer candidates."""
+        checker.profiles['balanced'].update(cascade_lower_bound=-1.0, cascade_upper_bound=-1.0,
+                                            cascade_confident_top_k=1)
+        results = checker.check_compliance(policy_text)
+        cascade = results['metadata']['cascade']
+        assert cascade['reduced_controls'] == len(checker.standards)
+        assert cascade['reranked_pairs'] == len(checker.standards)
+
+    @pytest.mark.parametrize('hybrid', [True, False])
+    def test_hybrid_candidates_respect_top_k(self, checker, policy_text, hybrid):
+        """Test that fused BM25 + dense candidates are cut to the re-rank depth."""
+        checker.profiles['balanced'].update(hybrid_retrieval=hybrid, rerank_top_k=2,
+                                            cascade_lower_bound=-1.0, cascade_upper_bound=1.0)
+        results = checker.check_compliance(policy_text)
+        assert results['metadata']['profile']['hybrid_retrieval'] is hybrid
+        assert results['metadata']['cascade']['reranked_pairs'] == 2 * len(checker.standards)
+
+class TestAnalysisProfiles:
+    """Test per-request analysis profiles."""
+
+    def test_profile_reported_in_metadata(self, checker, policy_text):
+        """Test that the resolved profile settings are reported."""
+        results = checker.check_compliance(policy_text, profile='accurate')
+        profile = results['metadata']['profile']
+        assert profile['name'] == 'accurate'
+        assert profile['rerank_top_k'] == 20
+        assert results['metadata']['cascade']['skipped_controls'] == 0
+
+    def test_fast_profile_skips_cross_encoder(self, checker, policy_text):
+        """Test that the fast profile scores with the bi-encoder only."""
+        results = checker.check_compliance(policy_text, profile='fast')
+        assert results['metadata']['profile']['use_cross_encoder'] is False
+        assert results['metadata']['cascade']['reranked_pairs'] == 0
+
+    def test_latency_target_trims_reranking(self, checker, policy_text):
+        """Test that a tight latency target reduces the re-ranking depth."""
+        checker.profiles['accurate']['target_latency_seconds'] = 0.5
+        results = checker.check_compliance(policy_text, profile='accurate')
+        profile = results['metadata']['profile']
+        assert profile['adapted'] is True
+        assert not profile['use_cross_encoder'] or profile['rerank_top_k'] < 20
+
+    def test_unknown_profile(self, checker, policy_text):
+        """Test that unknown profile names are rejected."""
+        with pytest.raises(ValueError):
+            checker.check_compliance(policy_text, profile='turbo')
+
+class TestHierarchicalRetrieval:
+    """Test coarse-to-fine section retrieval on long documents."""
+
+    @pytest.fixture
+    def long_policy(self, policy_text):
+        """Long document where most numbered sections are unrelated to security."""
+        filler = (
+            "The cafeteria opens at eight and serves breakfast until ten. Lunch is served from noon "
+            "until two with a vegetarian option every day. The parking garage closes at midnight and "
+            "visitors park on the second floor. Holiday parties are organised by the social committee. "
+        ) * 2
+        sections = [policy_text] + [filler] * 8
+        return " ".join(f"Section {i}: {body}" for i, body in enumerate(sections, start=1))
+
+    @pytest.fixture
+    def hierarchical(self, monkeypatch):
+        """Engage the hierarchical mode on small documents."""
+        monkeypatch.setattr(Config, 'HIERARCHICAL_MIN_CHUNKS', 0)
+        monkeypatch.setattr(Config, 'SECTION_MIN_CHUNKS', 2)
+        monkeypatch.setattr(Config, 'SECTION_MAX_CHUNKS', 4)
+
+    def test_only_selected_sections_are_encoded(self, checker, long_policy, hierarchical):
+        """Test that fewer chunks are encoded than the document contains."""
+        checker.profiles['balanced']['section_top_k'] = 1
+        results = checker.check_compliance(long_policy)
+        hierarchy = results['metadata']['hierarchy']
+        assert hierarchy['enabled'] is True
+        assert hierarchy['selected_sections'] < hierarchy['sections']
+        assert hierarchy['encoded_chunks'] < hierarchy['total_chunks']
+        assert len(results['details']) == len(checker.standards)
+
+    def test_short_documents_are_exhaustive(self, checker, policy_text):
+        """Test that documents below the threshold are not sectioned."""
+        results = checker.check_compliance(policy_text)
+        assert results['metadata']['hierarchy'] == {'enabled': False}
+
+    def test_accurate_profile_is_exhaustive(self, checker, long_policy, hierarchical):
+        """Test that profiles without section_top_k score every chunk."""
+        results = checker.check_compliance(long_policy, profile='accurate')
+        assert results['metadata']['hierarchy']['enabled'] is False
+
+class TestWindowedScoring:
+    """Test bounded-memory windowed scoring."""
+
+    @pytest.fixture
+    def windowed(self, monkeypatch):
+        """Score every document in small windows."""
+        monkeypatch.setattr(Config, 'WINDOWED_SCORING_MIN_CHUNKS', 0)
+        monkeypatch.setattr(Config, 'SCORING_WINDOW_CHUNKS', 2)
+
+    @pytest.mark.parametrize('profile', ['balanced', 'fast'])
+    def test_matches_full_matrix_scores(self, checker, isolated_cache, policy_text, monkeypatch, profile):
+        """Test that windowed top-k candidates reproduce the full-matrix scores."""
+        checker.profiles[profile]['hybrid_retrieval'] = False
+        document = " ".join([policy_text] * 3)
+        expected = checker.check_compliance(document, profile=profile)
+
+        # Drop the cached document embeddings so the second run has to encode
+        isolated_cache.clear_all()
+        monkeypatch.setattr(Config, 'WINDOWED_SCORING_MIN_CHUNKS', 0)
+        monkeypatch.setattr(Config, 'SCORING_WINDOW_CHUNKS', 1)
+        windowed = checker.check_compliance(document, profile=profile)
+
+        assert windowed['metadata']['windowed']['windows'] > 1
+        assert [d['score'] for d in windowed['details']] == pytest.approx([d['score'] for d in expected['details']])
+        assert windowed['summary'] == expected['summary']
+
+    def test_windows_are_cached_and_shared(self, checker, policy_text, windowed, monkeypatch):
+        """Test that concurrent and repeated windowed analyses encode each window once."""
+        import threading
+        import time
+        encoded = []
+        encode_batched = checker.bi_encoder.encode_batched
+
+        def slow_encode(texts, *args):
+            encoded.append(tuple(texts))
+            time.sleep(0.05)
+            return encode_batched(texts, *args)
+
+        monkeypatch.setattr(checker.bi_encoder, 'encode_batched', slow_encode)
+        monkeypatch.setattr(Config, 'SCORING_WINDOW_CHUNKS', 1)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(checker.check_compliance(policy_text)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        windows = results[0]['metadata']['windowed']['windows']
+        assert windows > 1
+        assert len(encoded) == len(set(encoded)) == windows
+
+        repeated = checker.check_compliance(policy_text)
+        assert len(encoded) == windows
+        assert [d['score'] for d in repeated['details']] == [d['score'] for d in results[0]['details']]
+
+    def test_windowed_results_structure(self, checker, policy_text, windowed):
+        """Test that windowed analysis scores every control."""
+        results = checker.check_compliance(policy_text)
+        assert results['metadata']['windowed']['enabled'] is True
+        assert len(results['details']) == len(checker.standards)
+        cascade = results['metadata']['cascade']
+        assert cascade['reranked_pairs'] <= checker.profiles['balanced']['rerank_top_k'] * len(checker.standards)
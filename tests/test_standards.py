@@ -0,0 +1,42 @@
+import pytest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.standards import (
+    FALLBACK_STANDARDS,
+    generate_keywords_from_name,
+    load_control_keywords,
+    load_iso_standards,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestStandards:
+    """Test the control catalogue shared by the checkers."""
+
+    def test_loads_controls_without_metadata(self, isolated_cache):
+        """Test that every control is loaded and the metadata entry is not a control."""
+        standards = load_iso_standards(cached=False)
+        assert len(standards) == 93
+        assert 'metadata' not in standards
+
+    def test_cached_load(self, isolated_cache, monkeypatch):
+        """Test that a cached load is served from the cache manager afterwards."""
+        standards = load_iso_standards()
+        monkeypatch.chdir(os.path.dirname(REPO_ROOT))
+        assert load_iso_standards() == standards
+        assert load_iso_standards(cached=False) == FALLBACK_STANDARDS
+
+    def test_keywords_from_name(self):
+        """Test that stop words and short words are dropped from generated keywords."""
+        assert generate_keywords_from_name("Use of Cryptography in IT") == ['use', 'cryptography']
+
+    def test_control_keywords(self):
+        """Test that listed keywords are kept and missing ones generated from the name."""
+        keywords = load_control_keywords({
+            '5.1': {'name': "Policies", 'keywords': ['policy']},
+            '5.2': {'name': "Roles and responsibilities"},
+            '5.3': "Segregation of duties",
+        })
+        assert keywords == {'5.1': ['policy'], '5.2': ['roles', 'responsibilities'], '5.3': ['segregation', 'duties']}
@@ -0,0 +1,176 @@
+import pytest
+import threading
+import time
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cache_manager import CacheManager
+from utils.quantization import quantize_embeddings
+from utils.write_behind import WriteBehindQueue
+
+class SlowWriter:
+    """Records batches and blocks until released."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def __call__(self, batch):
+        self.release.wait(5)
+        self.batches.append(batch)
+
+@pytest.fixture
+def writer():
+    return SlowWriter()
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache manager writing to disk from a background thread."""
+    cache = CacheManager(str(tmp_path / 'cache'), write_behind=True)
+    yield cache
+    cache.write_queue.close()
+
+class TestWriteBehindQueue:
+    """Test the background write queue."""
+
+    def test_coalesces_repeated_writes(self, writer):
+        """Test that a key queued several times is written once with its last value."""
+        queue = WriteBehindQueue(writer)
+        queue.put('blocker', 0)
+        time.sleep(0.05)  # the worker is now holding 'blocker'
+        for value in range(5):
+            queue.put('hot', value)
+        assert queue.depth() == 2
+        assert queue.get('hot') == 4
+
+        writer.release.set()
+        assert queue.flush(timeout=5)
+        assert writer.batches == [[('blocker', 0)], [('hot', 4)]]
+        assert queue.stats()['coalesced'] == 4
+        assert queue.depth() == 0
+
+    def test_in_flight_values_stay_readable(self, writer):
+        """Test that a value being written can still be read from the queue."""
+        queue = WriteBehindQueue(writer)
+        queue.put('key', 'value')
+        time.sleep(0.05)
+        assert queue.get('key') == 'value'
+        writer.release.set()
+        queue.flush(timeout=5)
+        assert queue.get('key') is None
+
+    def test_close_flushes_and_writes_through(self, writer):
+        """Test that shutdown writes everything queued and later writes are synchronous."""
+        writer.release.set()
+        queue = WriteBehindQueue(writer)
+        queue.put('a', 1)
+        assert queue.close(timeout=5)
+        assert writer.batches == [[('a', 1)]]
+        queue.put('b', 2)
+        assert writer.batches[-1] == [('b', 2)]
+
+    def test_bounded_queue_blocks_producers(self, writer):
+        """Test that producers wait once max_pending keys are queued."""
+        queue = WriteBehindQueue(writer, max_pending=1)
+        queue.put('a', 1)
+        time.sleep(0.05)  # 'a' in flight, queue empty
+        queue.put('b', 2)
+        blocked = threading.Thread(target=queue.put, args=('c', 3))
+        blocked.start()
+        blocked.join(0.1)
+        assert blocked.is_alive()
+        writer.release.set()
+        blocked.join(5)
+        assert queue.flush(timeout=5)
+        assert [key for batch in writer.batches for key, _ in batch] == ['a', 'b', 'c']
+
+    def test_discard_waits_for_in_flight_write(self):
+        """Test that discarding a key being written hides it and returns only once the write is done."""
+        batches = []
+        def slow_write(batch):
+            time.sleep(0.3)
+            batches.append(batch)
+        queue = WriteBehindQueue(slow_write)
+        queue.put('key', 'value')
+        time.sleep(0.05)  # 'key' is in flight
+        queue.discard('key')
+        assert batches == [[('key', 'value')]]
+        assert queue.get('key') is None
+
+    def test_write_errors_are_counted(self):
+        """Test that a failing write does not stop the worker."""
+        def fail(batch):
+            raise OSError("disk full")
+        queue = WriteBehindQueue(fail)
+        queue.put('a', 1)
+        assert queue.flush(timeout=5)
+        assert queue.stats()['errors'] == 1
+
+class TestCacheManagerWriteBehind:
+    """Test the cache manager with disk writes off the request path."""
+
+    def test_reads_own_queued_writes(self, cache):
+        """Test that queued values are served before they reach the disk tier."""
+        cache.write_queue.write_batch = SlowWriter()
+        cache.set('key', {'score': 1})
+        cache._memory_cache.clear()
+        assert cache.get('key') == {'score': 1}
+        assert cache.get_cache_stats()['write_queue_depth'] == 1
+        cache.write_queue.write_batch.release.set()
+
+    def test_flush_reaches_disk(self, cache, tmp_path):
+        """Test that flushed writes are visible to another manager."""
+        cache.set_many({'a': 1, 'b': 2})
+        assert cache.flush(timeout=5)
+        reader = CacheManager(str(tmp_path / 'cache'))
+        assert reader.get('b') == 2
+        assert cache.write_queue_depth() == 0
+
+    def test_arrays_are_mapped_after_write(self, cache):
+        """Test that the memory tier swaps the heap copy for the memory-mapped view once written."""
+        embeddings = quantize_embeddings(np.random.default_rng(0).normal(size=(50, 16)).astype(np.float32), 'int8')
+        cache.set_array('embeddings:model:abc', embeddings)
+        assert cache.get_array('embeddings:model:abc') is embeddings
+        assert cache.flush(timeout=5)
+        assert isinstance(cache.get_array('embeddings:model:abc').codes, np.memmap)
+
+    def test_invalidate_drops_queued_write(self, cache):
+        """Test that invalidating a key cancels its pending write."""
+        cache.write_queue.write_batch = SlowWriter()
+        cache.set('blocker', 0)
+        time.sleep(0.05)
+        cache.set('key', 'value')
+        cache.invalidate('key')
+        cache.write_queue.write_batch.release.set()
+        assert cache.flush(timeout=5)
+        assert cache.get('key') is None
+
+    @pytest.mark.parametrize('clear', [False, True])
+    def test_invalidate_during_in_flight_write(self, cache, clear):
+        """Test that an entry invalidated while its disk write is in progress stays gone."""
+        write_batch = cache.write_queue.write_batch
+        def slow_write(batch):
+            time.sleep(0.3)
+            write_batch(batch)
+        cache.write_queue.write_batch = slow_write
+        cache.set('compliance_x', {'v': 1})
+        time.sleep(0.05)  # the write is in flight
+        if clear:
+            cache.clear_all()
+        else:
+            cache.invalidate('compliance_x')
+        assert cache.get('compliance_x') is None
+        assert cache.flush(timeout=5)
+        cache._memory_cache.clear()
+        assert cache.get('compliance_x') is None
+
+    def test_analysis_tokens_write_through(self, cache, tmp_path):
+        """Test that analysis results reach disk before set() returns, for the next request on another worker."""
+        cache.write_queue.write_batch = SlowWriter()
+        cache.set('analysis:token', {'compliance_score': 50.0})
+        reader = CacheManager(str(tmp_path / 'cache'))
+        assert reader.get('analysis:token') == {'compliance_score': 50.0}
+        assert cache.write_queue_depth() == 0
+        cache.write_queue.write_batch.release.set()
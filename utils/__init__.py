@@ -3,6 +3,7 @@
 from .validators import (
     validate_file_upload,
     validate_analysis_method,
+    validate_analysis_profile,
     sanitize_filename,
     validate_json_payload,
     SecurityValidator
@@ -11,6 +12,7 @@ from .validators import (
 __all__ = [
     'validate_file_upload',
     'validate_analysis_method', 
+    'validate_analysis_profile',
     'sanitize_filename',
     'validate_json_payload',
     'SecurityValidator'
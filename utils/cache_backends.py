@@ -0,0 +1,528 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .cache_codecs import DECODE_ERRORS, CacheCodecs, decode_value
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+# Names accepted by create_disk_backend
+DISK_BACKENDS = ('sqlite', 'pickle', 'redis')
+DEFAULT_DISK_BACKEND = os.environ.get('CACHE_DISK_BACKEND', 'sqlite')
+# Server for the shared 'redis' tier
+DEFAULT_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Keys hash onto a fixed set of lock files, so lock files never accumulate
+LOCK_STRIPES = 64
+
+@contextmanager
+def key_lock(lock_dir: str, key: str, shared: bool = False,
+             timeout: Optional[float] = None) -> Iterator[bool]:
+    """
+    Cross-process advisory lock for key.
+
+    Keys share LOCK_STRIPES lock files in lock_dir, so two keys may
+    occasionally wait on each other but the same key is never written by
+    two processes (or threads) at once.
+
+    Args:
+        lock_dir: Directory holding the lock files
+        key: Cache key to lock
+        shared: Take a shared (reader) lock instead of an exclusive one
+        timeout: Seconds to wait before giving up (None waits indefinitely)
+
+    Yields:
+        Whether the lock was acquired; False only once timeout has passed
+    """
+    if fcntl is None:
+        yield True
+        return
+    stripe = int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) % LOCK_STRIPES
+    mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, f"{stripe:02d}.lock"), 'a+b') as lock_file:
+        if timeout is None:
+            fcntl.flock(lock_file, mode)
+        else:
+            deadline = time.time() + timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, mode | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.time() >= deadline:
+                        yield False
+                        return
+                    time.sleep(0.05)
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_atomic(path: str, write: Callable) -> None:
+    """
+    Write a file through a temporary file in the same directory and rename it into place.
+
+    Readers see either the old file or the complete new one, never a
+    partial write, and processes that mapped the old file keep it intact.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class DiskBackend(ABC):
+    """Interface for the persistent tier of CacheManager."""
+
+    # Whether other hosts see the entries; shared tiers also hold embedding matrices
+    shared = False
+    # Serialises values with each key namespace's codec; set by the constructors
+    codecs: CacheCodecs
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Value stored under key, or None if missing or expired."""
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Values of the keys that are present, by key."""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    @abstractmethod
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: int) -> None:
+        """Store several (key, value) pairs that all expire after ttl seconds."""
+
+    def set(self, key: str, data: Any, ttl: int) -> None:
+        self.set_many([(key, data)], ttl)
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+    @abstractmethod
+    def cleanup_expired(self) -> int:
+        """Remove expired (and unreadable) entries. Returns the number removed."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Entry count and total stored bytes as {'entries', 'size_bytes'}."""
+
+class PickleFileBackend(DiskBackend):
+    """
+    One file per key holding the encoded (data, timestamp, ttl).
+
+    Files are replaced atomically and writers hold a per-key lock, so
+    concurrent workers never read half-written entries; an entry is only
+    deleted after re-checking it under the lock. Expiry and statistics
+    still have to open every file, so this is only suited to small caches.
+    """
+
+    def __init__(self, cache_dir: str, codecs: Optional[CacheCodecs] = None):
+        self.cache_dir = cache_dir
+        self.lock_dir = os.path.join(cache_dir, 'locks')
+        self.codecs = codecs or CacheCodecs()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.cache")
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _is_stale(self, path: str) -> bool:
+        """Whether the file is expired or unreadable (call with its key locked)."""
+        try:
+            blob = self._read(path)
+            if blob is None:
+                return False
+            _, timestamp, ttl = decode_value(blob)
+        except DECODE_ERRORS + (OSError,):
+            return True
+        return time.time() - timestamp > ttl
+
+    def _remove_if_stale(self, key: str, path: str) -> bool:
+        # Another worker may have replaced the entry since it was read
+        with key_lock(self.lock_dir, key):
+            return self._is_stale(path) and self._remove(path)
+
+    def get(self, key: str) -> Optional[Any]:
+        cache_file = self._path(key)
+        try:
+            blob = self._read(cache_file)
+            if blob is None:
+                return None
+            data, timestamp, ttl = self.codecs.decode(key, blob)
+        except DECODE_ERRORS + (OSError,):
+            # Handle corrupted cache files
+            self._remove_if_stale(key, cache_file)
+            return None
+        if time.time() - timestamp > ttl:
+            self._remove_if_stale(key, cache_file)
+            return None
+        return data
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: int) -> None:
+        now = time.time()
+        for key, data in items:
+            try:
+                payload = self.codecs.encode(key, (data, now, ttl))
+                with key_lock(self.lock_dir, key):
+                    write_atomic(self._path(key), lambda f: f.write(payload))
+            except (pickle.PickleError, TypeError, AttributeError, OSError):
+                # Silently fail if caching fails
+                pass
+
+    def delete(self, key: str) -> None:
+        with key_lock(self.lock_dir, key):
+            self._remove(self._path(key))
+
+    def _files(self):
+        try:
+            return [name for name in os.listdir(self.cache_dir) if name.endswith('.cache')]
+        except OSError:
+            return []
+
+    def clear(self) -> None:
+        for name in self._files():
+            self.delete(name[:-len('.cache')])
+
+    def cleanup_expired(self) -> int:
+        removed_count = 0
+        for name in self._files():
+            if self._remove_if_stale(name[:-len('.cache')], os.path.join(self.cache_dir, name)):
+                removed_count += 1
+        return removed_count
+
+    def stats(self) -> Dict[str, int]:
+        stats = {'entries': 0, 'size_bytes': 0}
+        for name in self._files():
+            try:
+                stats['size_bytes'] += os.path.getsize(os.path.join(self.cache_dir, name))
+                stats['entries'] += 1
+            except OSError:
+                pass
+        return stats
+
+class SQLiteBackend(DiskBackend):
+    """
+    All entries in one SQLite database in WAL mode.
+
+    Rows hold the encoded value with indexed expiry time and stored size, so
+    expiry sweeps and statistics are single indexed queries, and batched
+    writes share one transaction. WAL lets web workers read while another
+    process writes. Each thread gets its own connection. SQLite errors
+    (e.g. "database is locked" after the busy timeout) are treated as a
+    miss or a no-op so cache contention never fails a request.
+    """
+
+    FILENAME = 'cache.sqlite3'
+
+    def __init__(self, cache_dir: str, timeout: float = 30.0, codecs: Optional[CacheCodecs] = None):
+        self.cache_dir = cache_dir
+        self.codecs = codecs or CacheCodecs()
+        self.path = os.path.join(cache_dir, self.FILENAME)
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL with NORMAL sync stays consistent; at worst the last commits are lost on power failure
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        try:
+            return self.codecs.decode(key, value)
+        except DECODE_ERRORS:
+            # Unreadable entry (e.g. a class that no longer exists)
+            self.delete(key)
+            return None
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: int) -> None:
+        now = time.time()
+        rows = []
+        for key, data in items:
+            try:
+                value = self.codecs.encode(key, data)
+            except (pickle.PickleError, TypeError, AttributeError):
+                # Silently skip values that cannot be cached
+                continue
+            rows.append((key, value, now, now + ttl, len(value)))
+        if not rows:
+            return
+        try:
+            with self._connection() as conn:
+                conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error:
+            pass
+
+    def delete(self, key: str) -> None:
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self) -> None:
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM entries")
+        except sqlite3.Error:
+            pass
+
+    def cleanup_expired(self) -> int:
+        try:
+            with self._connection() as conn:
+                return conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),)).rowcount
+        except sqlite3.Error:
+            # Left for the next sweep
+            return 0
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            entries, size_bytes = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size_bytes = 0, 0
+        return {'entries': entries, 'size_bytes': size_bytes}
+
+class RedisBackend(DiskBackend):
+    """
+    Entries in a Redis server shared by every worker and host.
+
+    Values are encoded with their namespace's codec and expire through Redis
+    TTLs. Batched reads are a single MGET; batched writes read the sizes
+    they replace and then send MSET, the EXPIREs and the counter updates in
+    one MULTI. Entry count and stored bytes are kept in two counter keys so
+    statistics never scan the keyspace; keys expired by Redis are subtracted
+    when cleanup_expired() recounts them in the background. Any Redis error
+    behaves like a cache miss or a no-op rather than failing the request.
+    """
+
+    shared = True
+
+    # Keys per SCAN page and per UNLINK/STRLEN pipeline
+    BATCH_KEYS = 1000
+
+    def __init__(self, url: str = DEFAULT_REDIS_URL, client: Any = None, prefix: str = 'compliance_cache:',
+                 codecs: Optional[CacheCodecs] = None):
+        """
+        Args:
+            url: Redis server URL, used when no client is given
+            client: A redis.Redis compatible client (e.g. an in-process fake in tests)
+            prefix: Namespace for this cache's keys on the server
+            codecs: Value codecs per key namespace
+        """
+        try:
+            import redis
+            self.errors = (redis.RedisError, OSError)
+        except ImportError:
+            if client is None:
+                raise
+            self.errors = (OSError,)
+        if client is None:
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.codecs = codecs or CacheCodecs()
+        # Counter keys; cache keys never start with '__'
+        self.entries_key = f"{prefix}__entries__"
+        self.size_key = f"{prefix}__size_bytes__"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _scan_batches(self) -> Iterator[List[Any]]:
+        """This cache's keys (without the counters), BATCH_KEYS at a time."""
+        counters = {self.entries_key, self.size_key}
+        batch = []
+        for key in self.client.scan_iter(match=f"{self.prefix}*", count=self.BATCH_KEYS):
+            if (key.decode() if isinstance(key, bytes) else key) in counters:
+                continue
+            batch.append(key)
+            if len(batch) >= self.BATCH_KEYS:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _decode(self, key: str, value: Optional[bytes]) -> Optional[Any]:
+        if value is None:
+            return None
+        try:
+            return self.codecs.decode(key, value)
+        except DECODE_ERRORS:
+            self.delete(key)
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        try:
+            raw_values = self.client.mget([self._key(key) for key in keys])
+        except self.errors:
+            # Redis unavailable: every key is a miss
+            return {}
+        values = {}
+        for key, raw in zip(keys, raw_values):
+            value = self._decode(key, raw)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def _sizes(self, redis_keys: List[str]) -> List[int]:
+        pipe = self.client.pipeline(transaction=False)
+        for redis_key in redis_keys:
+            pipe.strlen(redis_key)
+        return [int(size) for size in pipe.execute()]
+
+    def set_many(self, items: Iterable[Tuple[str, Any]], ttl: int) -> None:
+        mapping = {}
+        for key, data in items:
+            try:
+                mapping[self._key(key)] = self.codecs.encode(key, data)
+            except (pickle.PickleError, TypeError, AttributeError):
+                # Silently skip values that cannot be cached
+                continue
+        if not mapping:
+            return
+        try:
+            old_sizes = self._sizes(list(mapping))
+            # A non-positive TTL deletes the key at once, matching the other backends' expiry
+            kept = ttl > 0
+            added_entries = sum(1 for size in old_sizes if not size) if kept else -sum(1 for size in old_sizes if size)
+            added_bytes = (sum(len(value) for value in mapping.values()) if kept else 0) - sum(old_sizes)
+            # MSET cannot carry a TTL; the EXPIREs ride in the same transaction and round trip
+            pipe = self.client.pipeline(transaction=True)
+            pipe.mset(mapping)
+            for redis_key in mapping:
+                pipe.expire(redis_key, int(ttl))
+            pipe.incrby(self.entries_key, added_entries)
+            pipe.incrby(self.size_key, added_bytes)
+            pipe.execute()
+        except self.errors:
+            pass
+
+    def delete(self, key: str) -> None:
+        try:
+            size, = self._sizes([self._key(key)])
+            if size:
+                pipe = self.client.pipeline(transaction=True)
+                pipe.unlink(self._key(key))
+                pipe.incrby(self.entries_key, -1)
+                pipe.incrby(self.size_key, -size)
+                pipe.execute()
+        except self.errors:
+            pass
+
+    def clear(self) -> None:
+        try:
+            for batch in self._scan_batches():
+                self.client.unlink(*batch)
+            self.client.unlink(self.entries_key, self.size_key)
+        except self.errors:
+            pass
+
+    def cleanup_expired(self) -> int:
+        """Recount entries and bytes to drop keys Redis has expired. Returns 0; Redis removes them itself."""
+        try:
+            entries = size_bytes = 0
+            for batch in self._scan_batches():
+                sizes = self._sizes(batch)
+                entries += sum(1 for size in sizes if size)
+                size_bytes += sum(sizes)
+            pipe = self.client.pipeline(transaction=True)
+            pipe.set(self.entries_key, entries)
+            pipe.set(self.size_key, size_bytes)
+            pipe.execute()
+        except self.errors:
+            pass
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            entries, size_bytes = self.client.mget([self.entries_key, self.size_key])
+        except self.errors:
+            entries = size_bytes = 0
+        return {'entries': max(int(entries or 0), 0), 'size_bytes': max(int(size_bytes or 0), 0)}
+
+def create_disk_backend(backend: str, cache_dir: str, codecs: Optional[CacheCodecs] = None) -> DiskBackend:
+    """
+    Create the disk tier for a cache directory.
+
+    Args:
+        backend: One of DISK_BACKENDS
+        cache_dir: Directory holding the backend's files (unused by the redis backend)
+        codecs: Value codecs per key namespace (defaults and CACHE_CODECS if None)
+    """
+    if backend == 'sqlite':
+        return SQLiteBackend(cache_dir, codecs=codecs)
+    if backend == 'pickle':
+        return PickleFileBackend(cache_dir, codecs)
+    if backend == 'redis':
+        return RedisBackend(DEFAULT_REDIS_URL, codecs=codecs)
+    raise ValueError(f"Unknown cache disk backend '{backend}'. Must be one of: {', '.join(DISK_BACKENDS)}")
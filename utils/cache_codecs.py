@@ -0,0 +1,170 @@
+import lzma
+import os
+import pickle
+import threading
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+# Stored values start with MAGIC, the format version and the codec id;
+# values without the header are plain pickles written before codecs existed
+MAGIC = b'CC'
+CODEC_VERSION = 1
+CODEC_IDS = {'none': 0, 'zlib': 1, 'lzma': 2, 'zstd': 3}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+# Codec per key namespace (the key up to its first ':'); others are stored uncompressed.
+# Embedding matrices in the local array store stay uncompressed so they can be memory-mapped.
+DEFAULT_NAMESPACE_CODECS = {
+    'compliance': 'zlib',
+    'analysis': 'zlib',
+    'stage': 'zlib',
+    'iso_standards': 'zlib',
+    'embeddings': 'zlib',
+    'doc_embeddings': 'zlib',
+}
+
+# Raised by decode_value for entries that can no longer be read
+# (e.g. a class that no longer exists, or a codec that is not installed)
+DECODE_ERRORS = (pickle.PickleError, EOFError, ValueError, AttributeError, ImportError)
+
+def parse_codec_spec(spec: str) -> Dict[str, str]:
+    """
+    Parse a "namespace=codec,..." override such as "compliance=lzma,stage=none".
+
+    Raises:
+        ValueError: If an entry is malformed or names an unknown codec
+    """
+    codecs = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        namespace, separator, codec = entry.partition('=')
+        if not separator or codec.strip() not in CODEC_IDS:
+            raise ValueError(f"Invalid cache codec '{entry}'. Codecs are: {', '.join(CODEC_IDS)}")
+        codecs[namespace.strip()] = codec.strip()
+    return codecs
+
+def _zstd():
+    import zstandard
+    return zstandard
+
+def compress(payload: bytes, codec: str) -> bytes:
+    if codec == 'zlib':
+        return zlib.compress(payload, 6)
+    if codec == 'lzma':
+        return lzma.compress(payload, preset=6)
+    if codec == 'zstd':
+        return _zstd().ZstdCompressor(level=3).compress(payload)
+    return payload
+
+def decompress(payload: bytes, codec: str) -> bytes:
+    """
+    Decompress a stored payload.
+
+    Raises:
+        ValueError: If the payload is corrupt (whatever error type the codec library uses)
+        ImportError: If the codec's library is not installed
+    """
+    try:
+        if codec == 'zlib':
+            return zlib.decompress(payload)
+        if codec == 'lzma':
+            return lzma.decompress(payload)
+        if codec == 'zstd':
+            return _zstd().ZstdDecompressor().decompress(payload)
+    except ImportError:
+        raise
+    except Exception as e:
+        # e.g. zstandard.ZstdError, which is not a ValueError subclass
+        raise ValueError(f"Corrupt {codec} cache entry: {e}") from e
+    return payload
+
+def _encode(data: Any, codec: str) -> Tuple[bytes, bytes]:
+    """(uncompressed pickle, stored value) of data."""
+    payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    return payload, MAGIC + bytes((CODEC_VERSION, CODEC_IDS[codec])) + compress(payload, codec)
+
+def encode_value(data: Any, codec: str = 'none') -> bytes:
+    """Serialise a cache value to a headered, optionally compressed binary pickle."""
+    return _encode(data, codec)[1]
+
+def decode_value(blob: bytes) -> Any:
+    return pickle.loads(_payload(blob))
+
+def _payload(blob: bytes) -> bytes:
+    """Uncompressed pickle inside a stored value."""
+    if blob[:2] != MAGIC:
+        return blob
+    version, codec_id = blob[2], blob[3]
+    if version != CODEC_VERSION or codec_id not in CODEC_NAMES:
+        raise ValueError(f"Unsupported cache entry format {version}/{codec_id}")
+    return decompress(blob[4:], CODEC_NAMES[codec_id])
+
+class CacheCodecs:
+    """
+    Chooses the codec for each key by namespace and records compression statistics.
+
+    Writes count the pickled and the stored (compressed) bytes, hits the
+    stored and decoded bytes, so the ratio achieved per namespace is visible
+    in the cache statistics.
+    """
+
+    def __init__(self, codecs: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            codecs: Codec per namespace; defaults to DEFAULT_NAMESPACE_CODECS
+                updated with the CACHE_CODECS environment variable
+
+        Raises:
+            ValueError: If a codec is unknown
+            ImportError: If zstd is configured but zstandard is not installed
+        """
+        if codecs is None:
+            codecs = dict(DEFAULT_NAMESPACE_CODECS)
+            codecs.update(parse_codec_spec(os.environ.get('CACHE_CODECS', '')))
+        for codec in codecs.values():
+            if codec not in CODEC_IDS:
+                raise ValueError(f"Unknown cache codec '{codec}'. Must be one of: {', '.join(CODEC_IDS)}")
+        if 'zstd' in codecs.values():
+            _zstd()
+        self.codecs = codecs
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def namespace(self, key: str) -> str:
+        return key.split(':', 1)[0]
+
+    def codec_for(self, key: str) -> str:
+        return self.codecs.get(self.namespace(key), 'none')
+
+    def _record(self, key: str, **counts: int) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(self.namespace(key), {
+                'writes': 0, 'raw_bytes': 0, 'stored_bytes': 0,
+                'hits': 0, 'hit_stored_bytes': 0, 'hit_raw_bytes': 0, 'misses': 0,
+            })
+            for name, count in counts.items():
+                stats[name] += count
+
+    def encode(self, key: str, data: Any) -> bytes:
+        payload, blob = _encode(data, self.codec_for(key))
+        self._record(key, writes=1, raw_bytes=len(payload), stored_bytes=len(blob))
+        return blob
+
+    def decode(self, key: str, blob: bytes) -> Any:
+        payload = _payload(blob)
+        data = pickle.loads(payload)
+        self._record(key, hits=1, hit_stored_bytes=len(blob), hit_raw_bytes=len(payload))
+        return data
+
+    def record_miss(self, key: str) -> None:
+        self._record(key, misses=1)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Counters per namespace, with the codec and the compression ratio (raw / stored bytes)."""
+        with self._lock:
+            snapshot = {namespace: dict(stats) for namespace, stats in self._stats.items()}
+        for namespace, stats in snapshot.items():
+            stats['codec'] = self.codecs.get(namespace, 'none')
+            raw = stats['raw_bytes'] + stats['hit_raw_bytes']
+            stored = stats['stored_bytes'] + stats['hit_stored_bytes']
+            stats['ratio'] = round(raw / stored, 3) if stored else None
+        return snapshot
@@ -1,32 +1,153 @@
 import hashlib
 import json
-import pickle
 import os
+import sys
+import threading
 import time
-from typing import Any, Optional, Dict
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Dict, Tuple
 from functools import wraps
 import tempfile
 
+import numpy as np
+
+from .cache_backends import DEFAULT_DISK_BACKEND, create_disk_backend, key_lock
+from .cache_codecs import CacheCodecs
+from .embedding_store import EmbeddingStore
+from .quantization import DEFAULT_QUANTIZATION, quantize_embeddings, dequantize_embeddings
+from .write_behind import WriteBehindQueue
+
+# Memory tier budget per process; least recently used entries are evicted beyond it
+DEFAULT_MEMORY_BUDGET_BYTES = int(os.environ.get('CACHE_MEMORY_BUDGET_MB', 256)) * 1024 * 1024
+# Seconds between proactive sweeps of expired memory entries
+DEFAULT_SWEEP_INTERVAL = 60
+# Seconds a caller waits for another's identical computation before computing itself
+DEFAULT_SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('CACHE_SINGLE_FLIGHT_TIMEOUT', 300))
+# Whether the global cache manager writes to disk from a background thread
+DEFAULT_WRITE_BEHIND = bool(int(os.environ.get('CACHE_WRITE_BEHIND', 1)))
+# Queued disk writes beyond which callers wait for the write-behind thread
+DEFAULT_WRITE_BEHIND_MAX_PENDING = int(os.environ.get('CACHE_WRITE_BEHIND_MAX_PENDING', 1024))
+# Key namespaces written to disk by the caller even with write-behind, because another
+# worker may read them straight away (an analysis token is read by the next request)
+DEFAULT_WRITE_THROUGH_NAMESPACES = ('analysis',)
+
+def estimate_size(data: Any) -> int:
+    """
+    Approximate memory footprint of a cached value in bytes.
+
+    Arrays count their buffer size, except memory-mapped arrays whose pages
+    belong to the OS page cache; containers and plain objects are walked
+    recursively, counting shared objects once.
+    """
+    seen = set()
+    stack = [data]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, np.memmap):
+            total += sys.getsizeof(obj)
+        elif isinstance(obj, np.ndarray):
+            # getsizeof includes the buffer only when the array owns it
+            total += sys.getsizeof(obj) + (0 if obj.flags.owndata else obj.nbytes)
+        elif isinstance(obj, np.generic):
+            total += obj.nbytes
+        elif isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            total += sys.getsizeof(obj)
+        elif isinstance(obj, dict):
+            total += sys.getsizeof(obj)
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(obj)
+            stack.extend(obj)
+        else:
+            total += sys.getsizeof(obj)
+            if hasattr(obj, '__dict__'):
+                stack.append(vars(obj))
+            for slot in getattr(type(obj), '__slots__', ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return total
+
 class CacheManager:
     """
     Cache manager for storing and retrieving analysis results and model predictions.
-    Supports both memory and disk-based caching with TTL (time-to-live) support.
+    Supports both memory and disk-based caching with TTL (time-to-live) support;
+    the disk tier is a single SQLite database by default (see cache_backends).
+    With a shared tier such as Redis the memory tier and the local array
+    store act as per-worker L1 caches in front of it. Disk entries are
+    compressed with a codec chosen per key namespace (see cache_codecs).
+
+    The memory tier is an LRU bounded by an estimated byte size: entries
+    beyond max_memory_bytes are evicted least recently used first, values
+    larger than the whole budget are kept on disk only, and expired entries
+    are swept every sweep_interval seconds instead of waiting to be read.
+    The memory tier is guarded by a lock, so request threads and the cleanup
+    thread can share one manager; the disk tiers are safe across processes.
+
+    single_flight() de-duplicates concurrent misses: the first caller for a
+    key computes it while other threads and worker processes wait and then
+    read the cached result.
+
+    With write_behind, disk and array store writes are queued for a
+    background thread instead of being made by the caller; queued values
+    are served from the queue until written, and the queue is flushed on
+    exit. Keys in write_through_namespaces are still written by the caller,
+    so they are visible to other processes as soon as set() returns.
     """
     
-    def __init__(self, cache_dir: Optional[str] = None, default_ttl: int = 3600):
+    def __init__(self, cache_dir: Optional[str] = None, default_ttl: int = 3600,
+                 max_memory_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+                 sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+                 disk_backend: str = DEFAULT_DISK_BACKEND,
+                 codecs: Optional[Dict[str, str]] = None,
+                 write_behind: bool = False,
+                 max_pending_writes: int = DEFAULT_WRITE_BEHIND_MAX_PENDING,
+                 write_through_namespaces: Tuple[str, ...] = DEFAULT_WRITE_THROUGH_NAMESPACES):
         """
         Initialize cache manager.
         
         Args:
             cache_dir: Directory for disk cache (uses temp dir if None)
             default_ttl: Default TTL in seconds (1 hour)
+            max_memory_bytes: Memory tier budget in bytes
+            sweep_interval: Seconds between sweeps of expired memory entries
+            disk_backend: Persistent tier, one of DISK_BACKENDS
+            codecs: Disk codec per key namespace (defaults and CACHE_CODECS if None)
+            write_behind: Write to disk from a background thread
+            max_pending_writes: Queued writes beyond which callers wait (write_behind only)
+            write_through_namespaces: Key namespaces never queued (write_behind only)
         """
         self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'compliance_cache')
         self.default_ttl = default_ttl
-        self._memory_cache = {}
+        self.max_memory_bytes = max_memory_bytes
+        self.sweep_interval = sweep_interval
+        # key -> (data, timestamp, ttl, size), least recently used first
+        self._memory_cache = OrderedDict()
+        self._memory_bytes = 0
+        self._last_sweep = time.time()
+        self._memory_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'rejections': 0}
+        # Reentrant: the public memory methods sweep and evict through each other
+        self._lock = threading.RLock()
+        # key -> [lock, number of callers using it] for in-process single-flight
+        self._flights = {}
+        self._flight_stats = {'computed': 0, 'shared': 0, 'timeouts': 0}
         
         # Ensure cache directory exists
         os.makedirs(self.cache_dir, exist_ok=True)
+        self.disk_backend = disk_backend
+        self.codecs = CacheCodecs(codecs)
+        self.disk = create_disk_backend(disk_backend, self.cache_dir, self.codecs)
+        # Embedding matrices bypass pickling and are memory-mapped from .npy files
+        self.arrays = EmbeddingStore(os.path.join(self.cache_dir, 'arrays'))
+        # Keyed by (tier, key) with tier 'disk' or 'array'
+        self.write_queue = WriteBehindQueue(self._write_batch, max_pending_writes) if write_behind else None
+        self.write_through_namespaces = frozenset(write_through_namespaces)
     
     def _generate_cache_key(self, *args, **kwargs) -> str:
         """Generate a unique cache key from arguments."""
@@ -44,58 +165,122 @@ class CacheManager:
         """Check if cache entry is expired."""
         return time.time() - timestamp > ttl
     
+    def _remove_from_memory(self, key: str) -> None:
+        # Callers hold self._lock
+        entry = self._memory_cache.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[3]
+    
+    def _maybe_sweep(self) -> None:
+        if time.time() - self._last_sweep >= self.sweep_interval:
+            self.sweep_memory()
+    
+    def sweep_memory(self) -> int:
+        """Remove expired entries from the memory cache. Returns number of removed entries."""
+        with self._lock:
+            self._last_sweep = time.time()
+            expired = [
+                key for key, (_, timestamp, ttl, _) in self._memory_cache.items()
+                if self._is_expired(timestamp, ttl)
+            ]
+            for key in expired:
+                self._remove_from_memory(key)
+            self._memory_stats['expirations'] += len(expired)
+            return len(expired)
+    
     def get_from_memory(self, key: str) -> Optional[Any]:
         """Get item from memory cache."""
-        if key in self._memory_cache:
-            data, timestamp, ttl = self._memory_cache[key]
-            if not self._is_expired(timestamp, ttl):
-                return data
-            else:
-                # Remove expired entry
-                del self._memory_cache[key]
-        return None
+        with self._lock:
+            self._maybe_sweep()
+            if key in self._memory_cache:
+                data, timestamp, ttl, _ = self._memory_cache[key]
+                if not self._is_expired(timestamp, ttl):
+                    self._memory_cache.move_to_end(key)
+                    self._memory_stats['hits'] += 1
+                    return data
+                else:
+                    # Remove expired entry
+                    self._remove_from_memory(key)
+                    self._memory_stats['expirations'] += 1
+            self._memory_stats['misses'] += 1
+            return None
     
     def set_in_memory(self, key: str, data: Any, ttl: Optional[int] = None) -> None:
-        """Set item in memory cache."""
+        """Set item in memory cache, evicting least recently used entries beyond the budget."""
         ttl = ttl or self.default_ttl
-        self._memory_cache[key] = (data, time.time(), ttl)
+        # Sized outside the lock; walking a large value should not block other threads
+        size = estimate_size(data)
+        with self._lock:
+            self._maybe_sweep()
+            self._remove_from_memory(key)
+            if size > self.max_memory_bytes:
+                # Would evict everything else; serve it from disk instead
+                self._memory_stats['rejections'] += 1
+                return
+            
+            self._memory_cache[key] = (data, time.time(), ttl, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                oldest = next(iter(self._memory_cache))
+                self._remove_from_memory(oldest)
+                self._memory_stats['evictions'] += 1
     
     def get_from_disk(self, key: str) -> Optional[Any]:
         """Get item from disk cache."""
-        cache_file = os.path.join(self.cache_dir, f"{key}.cache")
-        
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'rb') as f:
-                    cached_data = pickle.load(f)
-                
-                data, timestamp, ttl = cached_data
-                if not self._is_expired(timestamp, ttl):
-                    return data
-                else:
-                    # Remove expired file
-                    os.remove(cache_file)
-            except (pickle.PickleError, OSError):
-                # Handle corrupted cache files
-                try:
-                    os.remove(cache_file)
-                except OSError:
-                    pass
-        
-        return None
+        data = self._queued('disk', key)
+        if data is None:
+            data = self.disk.get(key)
+        if data is None:
+            self.disk.codecs.record_miss(key)
+        return data
     
     def set_on_disk(self, key: str, data: Any, ttl: Optional[int] = None) -> None:
         """Set item in disk cache."""
-        ttl = ttl or self.default_ttl
-        cache_file = os.path.join(self.cache_dir, f"{key}.cache")
-        
-        try:
-            cached_data = (data, time.time(), ttl)
-            with open(cache_file, 'wb') as f:
-                pickle.dump(cached_data, f)
-        except (pickle.PickleError, OSError):
-            # Silently fail if caching fails
-            pass
+        self._set_many_on_disk({key: data}, ttl or self.default_ttl)
+    
+    def _set_many_on_disk(self, items: Dict[str, Any], ttl: int) -> None:
+        if self.write_queue is None:
+            self.disk.set_many(items.items(), ttl)
+            return
+        write_through = {key: data for key, data in items.items()
+                         if self.codecs.namespace(key) in self.write_through_namespaces}
+        if write_through:
+            self.disk.set_many(write_through.items(), ttl)
+        for key, data in items.items():
+            if key not in write_through:
+                self.write_queue.put(('disk', key), (data, ttl))
+    
+    def _queued(self, tier: str, key: str) -> Optional[Any]:
+        """Value of a write to tier that the write-behind thread has not finished yet."""
+        if self.write_queue is None:
+            return None
+        queued = self.write_queue.get((tier, key))
+        return queued[0] if queued is not None else None
+    
+    def _write_batch(self, batch) -> None:
+        """Write-behind thread: write queued values, batching disk writes that share a TTL."""
+        disk_items = {}
+        for (tier, key), (data, ttl) in batch:
+            if tier == 'disk':
+                disk_items.setdefault(ttl, []).append((key, data))
+            elif self.arrays.put(key, data, ttl):
+                self._swap_in_mapped_view(key, data)
+        for ttl, items in disk_items.items():
+            self.disk.set_many(items, ttl)
+    
+    def _swap_in_mapped_view(self, key: str, data: Any) -> None:
+        # The memory tier held the caller's heap copy until the array store had the entry
+        mapped = self.arrays.get(key)
+        if mapped is None:
+            return
+        with self._lock:
+            entry = self._memory_cache.get(key)
+            if entry is not None and entry[0] is data:
+                _, timestamp, ttl, _ = entry
+                self._remove_from_memory(key)
+                size = estimate_size(mapped)
+                self._memory_cache[key] = (mapped, timestamp, ttl, size)
+                self._memory_bytes += size
     
     def get(self, key: str) -> Optional[Any]:
         """Get item from cache (checks memory first, then disk)."""
@@ -113,6 +298,28 @@ class CacheManager:
         
         return None
     
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several items; keys missing from memory are fetched from disk in one batch."""
+        found = {}
+        for key in keys:
+            data = self.get_from_memory(key)
+            if data is not None:
+                found[key] = data
+        for key in keys:
+            if key not in found:
+                data = self._queued('disk', key)
+                if data is not None:
+                    found[key] = data
+        missing = [key for key in keys if key not in found]
+        if missing:
+            for key, data in self.disk.get_many(missing).items():
+                self.set_in_memory(key, data)
+                found[key] = data
+            for key in missing:
+                if key not in found:
+                    self.disk.codecs.record_miss(key)
+        return found
+    
     def set(self, key: str, data: Any, ttl: Optional[int] = None, disk: bool = True) -> None:
         """Set item in cache."""
         # Always set in memory
@@ -122,94 +329,229 @@ class CacheManager:
         if disk:
             self.set_on_disk(key, data, ttl)
     
+    def get_array(self, key: str) -> Optional[Any]:
+        """Get an embedding matrix (memory first, then a memory-mapped load from the array store)."""
+        return self.get_arrays_many([key]).get(key)
+    
+    def get_arrays_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get several embedding matrices.
+
+        Each key is looked up in memory, then the local array store; with a
+        shared disk tier the remaining keys are fetched in one batch and
+        stored locally so later reads are memory-mapped.
+        """
+        found = {}
+        for key in keys:
+            data = self.get_from_memory(key)
+            if data is None:
+                data = self._queued('array', key)
+            if data is None:
+                data = self.arrays.get(key)
+                if data is not None:
+                    # Mapped views cost the memory tier almost nothing; the pages are shared
+                    self.set_in_memory(key, data)
+            if data is not None:
+                found[key] = data
+        
+        missing = [key for key in keys if key not in found]
+        if missing and self.disk.shared:
+            for key, data in self.disk.get_many(missing).items():
+                found[key] = self._store_array_locally(key, data, self.default_ttl)
+            for key in missing:
+                if key not in found:
+                    self.disk.codecs.record_miss(key)
+        return found
+    
+    def _store_array_locally(self, key: str, data: Any, ttl: int) -> Any:
+        if self.write_queue is not None:
+            # In memory first, so the write-behind thread can swap in the mapped view
+            self.set_in_memory(key, data, ttl)
+            self.write_queue.put(('array', key), (data, ttl))
+            return data
+        if self.arrays.put(key, data, ttl):
+            # Keep the mapped view rather than the heap copy so the page cache holds the data once
+            mapped = self.arrays.get(key)
+            if mapped is not None:
+                data = mapped
+        self.set_in_memory(key, data, ttl)
+        return data
+    
+    def set_array(self, key: str, data: Any, ttl: Optional[int] = None) -> None:
+        """Set an embedding matrix (float32 ndarray or QuantizedEmbeddings) in memory and the array store."""
+        self.set_arrays_many({key: data}, ttl)
+    
+    def set_arrays_many(self, items: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        """Set several embedding matrices; a shared disk tier receives them in one batch."""
+        ttl = ttl or self.default_ttl
+        for key, data in items.items():
+            self._store_array_locally(key, data, ttl)
+        if self.disk.shared and items:
+            self._set_many_on_disk(items, ttl)
+    
+    def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None, disk: bool = True) -> None:
+        """Set several items at once; the disk tier writes them in a single batch."""
+        for key, data in items.items():
+            self.set_in_memory(key, data, ttl)
+        if disk and items:
+            self._set_many_on_disk(items, ttl or self.default_ttl)
+    
+    @contextmanager
+    def _flight(self, key: str, timeout: float) -> Iterator[bool]:
+        """Hold the per-key lock of this process, then of the cache directory; yields whether both were acquired."""
+        with self._lock:
+            flight = self._flights.setdefault(key, [threading.Lock(), 0])
+            flight[1] += 1
+        started = time.time()
+        acquired = flight[0].acquire(timeout=timeout)
+        try:
+            if not acquired:
+                yield False
+                return
+            remaining = max(timeout - (time.time() - started), 0.0)
+            with key_lock(os.path.join(self.cache_dir, 'flights'), key, timeout=remaining) as locked:
+                yield locked
+        finally:
+            if acquired:
+                flight[0].release()
+            with self._lock:
+                flight[1] -= 1
+                if not flight[1]:
+                    del self._flights[key]
+    
+    def single_flight(self, key: str, lookup: Callable[[], Any], compute: Callable[[], Any],
+                      timeout: float = DEFAULT_SINGLE_FLIGHT_TIMEOUT) -> Any:
+        """
+        Return a cached value, computing it at most once across concurrent callers.
+
+        On a miss the first caller for key runs compute, which must store its
+        result where lookup finds it; concurrent callers in this process and
+        in other workers sharing the cache directory wait for it and return
+        lookup() instead. A caller that waits longer than timeout computes
+        the value itself.
+
+        Args:
+            key: Identity of the computation
+            lookup: Returns the cached value, or None on a miss
+            compute: Computes, caches and returns the value
+            timeout: Seconds to wait for another caller's computation
+
+        Returns:
+            The cached or computed value
+        """
+        value = lookup()
+        if value is not None:
+            return value
+        with self._flight(key, timeout) as acquired:
+            # Another caller may have finished while this one waited
+            value = lookup()
+            with self._lock:
+                if value is not None:
+                    self._flight_stats['shared'] += 1
+                else:
+                    self._flight_stats['computed'] += 1
+                    if not acquired:
+                        self._flight_stats['timeouts'] += 1
+            if value is not None:
+                return value
+            value = compute()
+            if self.write_queue is not None:
+                # Workers waiting on the lock read the disk tier; the result must be there first
+                self.write_queue.flush()
+            return value
+    
     def invalidate(self, key: str) -> None:
         """Remove item from both memory and disk cache."""
         # Remove from memory
-        if key in self._memory_cache:
-            del self._memory_cache[key]
+        with self._lock:
+            self._remove_from_memory(key)
+        if self.write_queue is not None:
+            self.write_queue.discard(('disk', key))
+            self.write_queue.discard(('array', key))
         
         # Remove from disk
-        cache_file = os.path.join(self.cache_dir, f"{key}.cache")
-        try:
-            os.remove(cache_file)
-        except OSError:
-            pass
+        self.disk.delete(key)
+        self.arrays.delete(key)
     
     def clear_all(self) -> None:
         """Clear all cache entries."""
         # Clear memory
-        self._memory_cache.clear()
+        with self._lock:
+            self._memory_cache.clear()
+            self._memory_bytes = 0
+        if self.write_queue is not None:
+            self.write_queue.clear()
         
         # Clear disk
-        try:
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.cache'):
-                    os.remove(os.path.join(self.cache_dir, filename))
-        except OSError:
-            pass
+        self.disk.clear()
+        self.arrays.clear()
+    
+    def write_queue_depth(self) -> int:
+        """Disk writes queued or in progress on the write-behind thread."""
+        return self.write_queue.depth() if self.write_queue is not None else 0
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued disk writes to finish. Returns False if timeout passed first."""
+        return self.write_queue.flush(timeout) if self.write_queue is not None else True
     
     def cleanup_expired(self) -> int:
-        """Remove expired entries from disk cache. Returns number of removed files."""
-        removed_count = 0
-        
-        try:
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.cache'):
-                    cache_file = os.path.join(self.cache_dir, filename)
-                    try:
-                        with open(cache_file, 'rb') as f:
-                            cached_data = pickle.load(f)
-                        
-                        _, timestamp, ttl = cached_data
-                        if self._is_expired(timestamp, ttl):
-                            os.remove(cache_file)
-                            removed_count += 1
-                    
-                    except (pickle.PickleError, OSError):
-                        # Remove corrupted files
-                        try:
-                            os.remove(cache_file)
-                            removed_count += 1
-                        except OSError:
-                            pass
-        except OSError:
-            pass
-        
-        return removed_count
+        """Remove expired entries from memory and disk cache. Returns number of removed disk entries."""
+        self.sweep_memory()
+        return self.disk.cleanup_expired() + self.arrays.cleanup_expired()
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
-        stats = {
-            'memory_entries': len(self._memory_cache),
-            'disk_entries': 0,
+        disk_stats = self.disk.stats()
+        array_stats = self.arrays.stats()
+        with self._lock:
+            memory_entries, memory_bytes = len(self._memory_cache), self._memory_bytes
+            memory_stats = dict(self._memory_stats)
+            flight_stats = dict(self._flight_stats)
+        write_stats = self.write_queue.stats() if self.write_queue is not None else {}
+        return {
+            'memory_entries': memory_entries,
+            'memory_bytes': memory_bytes,
+            'memory_budget_bytes': self.max_memory_bytes,
+            'memory_hits': memory_stats['hits'],
+            'memory_misses': memory_stats['misses'],
+            'memory_evictions': memory_stats['evictions'],
+            'memory_expirations': memory_stats['expirations'],
+            'memory_rejections': memory_stats['rejections'],
+            'single_flight_computed': flight_stats['computed'],
+            'single_flight_shared': flight_stats['shared'],
+            'single_flight_timeouts': flight_stats['timeouts'],
+            'write_behind': self.write_queue is not None,
+            'write_queue_depth': write_stats.get('depth', 0),
+            'write_queue_coalesced': write_stats.get('coalesced', 0),
+            'write_queue_written': write_stats.get('written', 0),
+            'write_queue_errors': write_stats.get('errors', 0),
+            'disk_backend': self.disk_backend,
+            'disk_entries': disk_stats['entries'],
+            'array_entries': array_stats['entries'],
+            'array_size_bytes': array_stats['size_bytes'],
+            'codecs': self.disk.codecs.stats(),
             'cache_dir': self.cache_dir,
-            'total_size_bytes': 0
+            'total_size_bytes': disk_stats['size_bytes'] + array_stats['size_bytes']
         }
-        
-        try:
-            for filename in os.listdir(self.cache_dir):
-                if filename.endswith('.cache'):
-                    stats['disk_entries'] += 1
-                    cache_file = os.path.join(self.cache_dir, filename)
-                    stats['total_size_bytes'] += os.path.getsize(cache_file)
-        except OSError:
-            pass
-        
-        return stats
 
 # Global cache instance
 _global_cache = None
+_global_cache_lock = threading.Lock()
 
-def get_cache_manager(cache_dir: Optional[str] = None, default_ttl: int = 3600) -> CacheManager:
+def get_cache_manager(cache_dir: Optional[str] = None, default_ttl: int = 3600,
+                      max_memory_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES) -> CacheManager:
     """Get or create global cache manager instance."""
     global _global_cache
     
     if _global_cache is None:
-        _global_cache = CacheManager(cache_dir, default_ttl)
+        with _global_cache_lock:
+            if _global_cache is None:
+                _global_cache = CacheManager(cache_dir, default_ttl, max_memory_bytes,
+                                             write_behind=DEFAULT_WRITE_BEHIND)
     
     return _global_cache
 
-def cached(ttl: Optional[int] = None, disk: bool = True, key_prefix: str = ""):
+def cached(ttl: Optional[int] = None, disk: bool = True, key_prefix: str = "", single_flight: bool = False):
     """
     Decorator for caching function results.
     
@@ -217,6 +559,8 @@ def cached(ttl: Optional[int] = None, disk: bool = True, key_prefix: str = ""):
         ttl: Time to live in seconds
         disk: Whether to store on disk
         key_prefix: Prefix for cache key
+        single_flight: Run concurrent calls with the same arguments only once
+            (across workers too when disk is True)
     """
     def decorator(func):
         @wraps(func)
@@ -227,16 +571,20 @@ def cached(ttl: Optional[int] = None, disk: bool = True, key_prefix: str = ""):
             key_data = f"{key_prefix}:{func.__name__}:{args}:{sorted(kwargs.items())}"
             cache_key = hashlib.md5(key_data.encode()).hexdigest()
             
+            def compute():
+                # Call function and cache result
+                result = func(*args, **kwargs)
+                cache.set(cache_key, result, ttl, disk)
+                return result
+            
+            if single_flight:
+                return cache.single_flight(cache_key, lambda: cache.get(cache_key), compute)
+            
             # Try to get from cache
             result = cache.get(cache_key)
             if result is not None:
                 return result
-            
-            # Call function and cache result
-            result = func(*args, **kwargs)
-            cache.set(cache_key, result, ttl, disk)
-            
-            return result
+            return compute()
         
         return wrapper
     return decorator
@@ -253,29 +601,136 @@ def get_cached_compliance_results(method: str, content_hash: str) -> Optional[Di
     key = f"compliance:{method}:{content_hash}"
     return cache.get(key)
 
-def cache_model_embeddings(model_name: str, text_hash: str, embeddings: Any, ttl: int = 86400):
-    """Cache model embeddings (24 hour TTL by default)."""
+def cache_analysis_results(token: str, results: Dict, ttl: int = 3600):
+    """Cache finished analysis results for the results page of a streamed analysis."""
+    cache = get_cache_manager()
+    key = f"analysis:{token}"
+    cache.set(key, results, ttl, disk=True)
+
+def get_cached_analysis_results(token: str) -> Optional[Dict]:
+    """Get the results of a streamed analysis."""
+    cache = get_cache_manager()
+    key = f"analysis:{token}"
+    return cache.get(key)
+
+def cache_stage_output(stage: str, key: str, output: Any, ttl: int = 3600, disk: bool = True):
+    """Cache the output of an analysis pipeline stage (in this process only unless disk)."""
+    cache = get_cache_manager()
+    cache.set(f"stage:{stage}:{key}", output, ttl, disk=disk)
+
+def get_cached_stage_output(stage: str, key: str) -> Optional[Any]:
+    """Get the cached output of an analysis pipeline stage."""
+    cache = get_cache_manager()
+    return cache.get(f"stage:{stage}:{key}")
+
+def cache_model_embeddings(model_name: str, text_hash: str, embeddings: Any, ttl: int = 86400,
+                           quantization: str = DEFAULT_QUANTIZATION) -> Any:
+    """
+    Cache model embeddings (24 hour TTL by default) in a compact quantized form.
+
+    Returns:
+        The stored form, so a cold run can score the same vectors a warm run reads back
+    """
     cache = get_cache_manager()
     key = f"embeddings:{model_name}:{text_hash}"
-    cache.set(key, embeddings, ttl, disk=True)
+    stored = quantize_embeddings(embeddings, quantization)
+    cache.set_array(key, stored, ttl)
+    return stored
 
-def get_cached_model_embeddings(model_name: str, text_hash: str) -> Optional[Any]:
-    """Get cached model embeddings."""
+def cache_model_embeddings_many(model_name: str, embeddings_by_hash: Dict[str, Any], ttl: int = 86400,
+                                quantization: str = DEFAULT_QUANTIZATION) -> Dict[str, Any]:
+    """Cache the embeddings of several texts, keyed by text hash; returns their stored forms."""
+    cache = get_cache_manager()
+    stored = {
+        text_hash: quantize_embeddings(embeddings, quantization)
+        for text_hash, embeddings in embeddings_by_hash.items()
+    }
+    cache.set_arrays_many({f"embeddings:{model_name}:{text_hash}": value for text_hash, value in stored.items()}, ttl)
+    return stored
+
+def get_cached_model_embeddings(model_name: str, text_hash: str, dequantize: bool = True) -> Optional[Any]:
+    """
+    Get cached model embeddings.
+
+    Args:
+        model_name: Name of the model that produced the embeddings
+        text_hash: Content hash of the embedded text
+        dequantize: Return a float32 array (True) or the compact stored form (False)
+    """
     cache = get_cache_manager()
     key = f"embeddings:{model_name}:{text_hash}"
-    return cache.get(key)
+    embeddings = cache.get_array(key)
+    return dequantize_embeddings(embeddings) if dequantize else embeddings
+
+def get_cached_model_embeddings_many(model_name: str, text_hashes: List[str],
+                                     dequantize: bool = True) -> Dict[str, Any]:
+    """
+    Get the cached embeddings of several texts in one batch.
+
+    Args:
+        model_name: Name of the model that produced the embeddings
+        text_hashes: Content hashes of the embedded texts
+        dequantize: Return float32 arrays (True) or the compact stored forms (False)
+
+    Returns:
+        Embeddings of the cached texts, keyed by text hash
+    """
+    cache = get_cache_manager()
+    keys = {f"embeddings:{model_name}:{text_hash}": text_hash for text_hash in text_hashes}
+    found = cache.get_arrays_many(list(keys))
+    return {
+        keys[key]: dequantize_embeddings(embeddings) if dequantize else embeddings
+        for key, embeddings in found.items()
+    }
+
+def cache_document_embeddings(model_name: str, content_hash: str, embeddings: Any, ttl: int = 86400,
+                              quantization: str = DEFAULT_QUANTIZATION) -> Any:
+    """Cache document embeddings in a compact quantized form; returns the stored form."""
+    cache = get_cache_manager()
+    key = f"doc_embeddings:{model_name}:{content_hash}"
+    stored = quantize_embeddings(embeddings, quantization)
+    cache.set_array(key, stored, ttl)
+    return stored
+
+def get_cached_document_embeddings(model_name: str, content_hash: str, dequantize: bool = True) -> Optional[Any]:
+    """
+    Get cached document embeddings.
 
-def cache_document_embeddings(model_name: str, content_hash: str, embeddings: Any, ttl: int = 86400):
-    """Cache document embeddings."""
+    Args:
+        model_name: Name of the model that produced the embeddings
+        content_hash: Content hash of the cleaned document
+        dequantize: Return a float32 array (True) or the compact stored form (False),
+            which is memory-mapped when loaded from disk
+    """
     cache = get_cache_manager()
     key = f"doc_embeddings:{model_name}:{content_hash}"
-    cache.set(key, embeddings, ttl, disk=True)
+    embeddings = cache.get_array(key)
+    return dequantize_embeddings(embeddings) if dequantize else embeddings
+
+def get_or_compute_document_embeddings(model_name: str, content_hash: str, compute: Callable[[], Any],
+                                       ttl: int = 86400, quantization: str = DEFAULT_QUANTIZATION) -> Any:
+    """
+    Get cached document embeddings, encoding them once across concurrent requests on a miss.
 
-def get_cached_document_embeddings(model_name: str, content_hash: str) -> Optional[Any]:
-    """Get cached document embeddings."""
+    Args:
+        model_name: Name of the model that produces the embeddings
+        content_hash: Content hash of the cleaned document
+        compute: Encodes the document; only called by the first concurrent caller
+        ttl: Lifetime of the cached embeddings in seconds
+        quantization: Storage precision of the cached embeddings
+
+    Returns:
+        The compact stored form, memory-mapped when it could be written to disk
+    """
     cache = get_cache_manager()
     key = f"doc_embeddings:{model_name}:{content_hash}"
-    return cache.get(key)
+
+    def encode():
+        embeddings = cache_document_embeddings(model_name, content_hash, compute(), ttl, quantization)
+        stored = cache.get_array(key)
+        return stored if stored is not None else embeddings
+
+    return cache.single_flight(key, lambda: cache.get_array(key), encode)
 
 def get_content_hash(content: str) -> str:
     """Generate a hash for content to use as cache key."""
@@ -296,9 +751,6 @@ def get_cached_iso_standards() -> Optional[Dict]:
 
 def setup_cache_cleanup_task():
     """Setup periodic cache cleanup (call this in app initialization)."""
-    import threading
-    import time
-    
     def cleanup_worker():
         while True:
             time.sleep(3600)  # Run every hour
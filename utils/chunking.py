@@ -0,0 +1,190 @@
+import hashlib
+import re
+import numpy as np
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+# Sentence boundary: terminal punctuation, whitespace, then a capital letter
+SENTENCE_BOUNDARY = re.compile(r'([.!?]+)\s+(?=[A-Z])')
+WORD_PATTERN = re.compile(r'\S+')
+
+# Section headings found in SOPs; group 1 is the heading title. Titles end at a newline or
+# full stop so headings are still separated in text whose whitespace has been collapsed.
+SECTION_PATTERNS = [
+    r'(?i)section\s+\d+[.:]\s*([^\n.]+)',
+    r'(?i)chapter\s+\d+[.:]\s*([^\n.]+)',
+    r'(?i)\d+\.\s*([^\n.]+)'
+]
+
+Span = Tuple[int, int]
+
+class TextChunks(Sequence[str]):
+    """
+    Chunks of a document stored as (start, end) character offsets.
+
+    Indexing returns the chunk text, sliced from the document on demand,
+    so a chunk list costs two integers per chunk instead of a copied string.
+    """
+
+    def __init__(self, text: str, spans: List[Span]):
+        self.text = text
+        self.spans = spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TextChunks(self.text, self.spans[index])
+        start, end = self.spans[index]
+        return self.text[start:end]
+
+    def __iter__(self) -> Iterator[str]:
+        for start, end in self.spans:
+            yield self.text[start:end]
+
+    def cache_key(self) -> str:
+        """Hash identifying both the document and how it was chunked."""
+        digest = hashlib.sha256(self.text.encode())
+        digest.update(np.asarray(self.spans, dtype=np.int64).tobytes())
+        return digest.hexdigest()[:16]
+
+def sentence_spans(text: str) -> List[Span]:
+    """Split text into sentence spans covering it end to end (terminal punctuation included)."""
+    spans = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        spans.append((start, match.end(1)))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return [(s, e) for s, e in spans if text[s:e].strip()]
+
+def _split_long_span(text: str, span: Span, pieces: int) -> List[Span]:
+    """Split an over-long sentence into roughly equal runs of words, or of characters for a single word."""
+    words = [(span[0] + m.start(), span[0] + m.end()) for m in WORD_PATTERN.finditer(text[span[0]:span[1]])]
+    if len(words) <= 1:
+        # A single over-long token (a URL, a hash, text without spaces) is cut into runs of characters
+        start, end = words[0] if words else span
+        words = [(i, i + 1) for i in range(start, end)]
+    if pieces <= 1 or len(words) <= 1:
+        return [span]
+    bounds = np.linspace(0, len(words), min(pieces, len(words)) + 1).astype(int)
+    return [(words[a][0], words[b - 1][1]) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def chunk_text(text: str, count_tokens: Callable[[List[str]], List[int]], max_tokens: int = 128,
+               overlap_tokens: int = 32, min_words: int = 10,
+               sentences: Optional[List[Span]] = None) -> TextChunks:
+    """
+    Pack sentences into chunks of at most max_tokens tokens.
+
+    Token counts come from the encoder's own tokenizer, so chunks are never
+    silently truncated by the model. Consecutive chunks share up to
+    overlap_tokens tokens of whole sentences, sentences longer than the
+    budget are split on word boundaries, and the final chunk always
+    reaches the end of the document.
+
+    Args:
+        text: Cleaned document text
+        count_tokens: Function returning the token count of each text
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens of trailing sentences repeated at the start of the next chunk
+        min_words: Documents with fewer words produce no chunks
+        sentences: Precomputed sentence_spans(text), to reuse an earlier segmentation
+
+    Returns:
+        TextChunks over the original text
+    """
+    if len(WORD_PATTERN.findall(text)) < min_words:
+        return TextChunks(text, [])
+
+    units = sentences if sentences is not None else sentence_spans(text)
+    counts = count_tokens([text[s:e] for s, e in units])
+
+    # Split sentences that would not fit in a chunk on their own, re-splitting pieces that
+    # still do not fit, until nothing is left but single characters
+    while any(count > max_tokens for count in counts):
+        split_units = []
+        for span, count in zip(units, counts):
+            if count > max_tokens:
+                split_units.extend(_split_long_span(text, span, -(-count // max_tokens) + 1))
+            else:
+                split_units.append(span)
+        if len(split_units) == len(units):
+            break
+        units = split_units
+        counts = count_tokens([text[s:e] for s, e in units])
+
+    spans = []
+    start = 0
+    while start < len(units):
+        end = start
+        total = counts[start]
+        while end + 1 < len(units) and total + counts[end + 1] <= max_tokens:
+            end += 1
+            total += counts[end]
+        spans.append((units[start][0], units[end][1]))
+
+        if end == len(units) - 1:
+            break
+
+        # Step back over trailing sentences that fit in the overlap budget
+        next_start = end + 1
+        overlap = 0
+        while next_start - 1 > start and overlap + counts[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            overlap += counts[next_start]
+        start = next_start
+
+    return TextChunks(text, spans)
+
+def find_section_headers(text: str, patterns: Sequence[str] = SECTION_PATTERNS) -> List[Tuple[int, str]]:
+    """(offset, title) of every section heading in text, in document order."""
+    headers = []
+    for pattern in patterns:
+        headers.extend((m.start(), m.group(1).strip()) for m in re.finditer(pattern, text))
+    headers.sort(key=lambda x: x[0])
+    return headers
+
+def group_chunks_by_section(chunks: TextChunks, section_starts: Sequence[int], min_chunks: int = 8,
+                            max_chunks: int = 32) -> List[np.ndarray]:
+    """
+    Group consecutive chunk ids into sections.
+
+    Chunks are first split wherever a section starts, then runs longer
+    than max_chunks are divided evenly and runs shorter than min_chunks are
+    merged with the following ones, so every section has a comparable size
+    even when headings are missing or spurious.
+
+    Args:
+        chunks: Document chunks
+        section_starts: Character offsets where sections begin
+        min_chunks: Smallest section size (except possibly the last)
+        max_chunks: Largest size a single heading-delimited run is kept at
+
+    Returns:
+        Chunk id arrays, one per section, covering every chunk in order
+    """
+    if not len(chunks):
+        return []
+
+    chunk_starts = np.asarray([start for start, _ in chunks.spans])
+    section_of_chunk = np.searchsorted(np.sort(np.asarray(section_starts, dtype=np.int64)), chunk_starts,
+                                       side='right')
+    runs = np.split(np.arange(len(chunks)), np.flatnonzero(np.diff(section_of_chunk)) + 1)
+
+    sections = []
+    current = []
+    for run in runs:
+        for piece in np.array_split(run, -(-len(run) // max_chunks)):
+            current.extend(piece.tolist())
+            if len(current) >= min_chunks:
+                sections.append(np.asarray(current))
+                current = []
+
+    if current:
+        if sections and len(sections[-1]) + len(current) <= max_chunks:
+            sections[-1] = np.concatenate([sections[-1], current])
+        else:
+            sections.append(np.asarray(current))
+
+    return sections
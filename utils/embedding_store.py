@@ -0,0 +1,220 @@
+"""
+On-disk store for embedding matrices that loads them as memory maps.
+
+Each entry is one raw ``.npy`` file per component array (codes, plus
+norms and scales for quantized embeddings). Their quantization mode,
+expiry time and size are rows of a small SQLite index next to them, so
+expiry sweeps and statistics are indexed queries rather than a scan of
+the directory. Reads return ``np.memmap`` views, so a cache hit costs no
+deserialisation or copy, and every worker process mapping the same entry
+shares its pages through the OS page cache. Files are replaced
+atomically and writers hold a per-entry lock, so workers sharing the
+directory never see an entry with mixed parts.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+from .cache_backends import key_lock, write_atomic
+from .quantization import QuantizedEmbeddings
+
+# np.load parses .npy headers with ast.literal_eval, whose recursion-depth
+# bookkeeping is not thread-safe on older Python 3.11 releases
+# (SystemError "AST constructor recursion depth mismatch"); mapping is lazy, so this lock is short
+_NPY_LOAD_LOCK = threading.Lock()
+
+class EmbeddingStore:
+    """
+    Memory-mapped .npy storage for float32 and quantized embedding matrices.
+
+    Index errors (e.g. "database is locked" after the busy timeout) are
+    treated as a miss or a no-op, like the SQLite cache backend.
+    """
+
+    INDEX_FILENAME = 'index.sqlite3'
+    # File name suffixes of an entry's parts
+    PARTS = ('codes', 'norms', 'scales')
+
+    def __init__(self, root: str, timeout: float = 30.0):
+        self.root = root
+        self.lock_dir = os.path.join(root, 'locks')
+        self.index_path = os.path.join(root, self.INDEX_FILENAME)
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(root, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS arrays ("
+                "stem TEXT PRIMARY KEY, key TEXT NOT NULL, mode TEXT, parts TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS arrays_expires_at ON arrays (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _stem(self, key: str) -> str:
+        # Keys contain model names with slashes, so files are named by key hash
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def _path(self, stem: str, part: str) -> str:
+        return os.path.join(self.root, f"{stem}.{part}.npy")
+
+    def _lock(self, stem: str, shared: bool = False):
+        return key_lock(self.lock_dir, stem, shared)
+
+    def _read_meta(self, stem: str) -> Optional[Dict]:
+        """Index row of an entry, or None (also when the index cannot be read)."""
+        try:
+            row = self._connection().execute(
+                "SELECT key, mode, parts, expires_at, size FROM arrays WHERE stem = ?", (stem,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        key, mode, parts, expires_at, size = row
+        return {'key': key, 'mode': mode, 'parts': json.loads(parts), 'expires_at': expires_at, 'size': size}
+
+    def put(self, key: str, embeddings: Any, ttl: int) -> bool:
+        """
+        Store embeddings under key for ttl seconds.
+
+        Parts of a previous entry that the new one does not have (e.g. the
+        scales of int8 embeddings replaced by float32 ones) are removed.
+
+        Args:
+            key: Cache key
+            embeddings: float32 ndarray or QuantizedEmbeddings
+            ttl: Lifetime in seconds
+
+        Returns:
+            True if the entry was written
+        """
+        if isinstance(embeddings, QuantizedEmbeddings):
+            parts = {'codes': embeddings.codes, 'norms': embeddings.norms}
+            if embeddings.scales is not None:
+                parts['scales'] = embeddings.scales
+            mode = embeddings.mode
+        else:
+            parts = {'codes': np.asarray(embeddings)}
+            mode = None
+
+        stem = self._stem(key)
+        try:
+            with self._lock(stem):
+                # Drop the old row first, so a failed write leaves a miss rather than
+                # an old row describing new parts
+                with self._connection() as conn:
+                    conn.execute("DELETE FROM arrays WHERE stem = ?", (stem,))
+                for part, array in parts.items():
+                    write_atomic(self._path(stem, part),
+                                 lambda f, array=array: np.save(f, np.ascontiguousarray(array)))
+                self._remove_files(stem, [part for part in self.PARTS if part not in parts])
+                # The index row is written last; an entry exists once it does
+                with self._connection() as conn:
+                    conn.execute("INSERT INTO arrays VALUES (?, ?, ?, ?, ?, ?)", (
+                        stem, key, mode, json.dumps(list(parts)), time.time() + ttl,
+                        int(sum(array.nbytes for array in parts.values())),
+                    ))
+        except (OSError, sqlite3.Error):
+            return False
+        return True
+
+    def _load(self, path: str) -> np.ndarray:
+        with _NPY_LOAD_LOCK:
+            try:
+                return np.load(path, mmap_mode='r')
+            except ValueError:
+                # Zero-length arrays cannot be mapped
+                return np.load(path)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Memory-mapped embeddings stored under key, or None if missing or expired."""
+        stem = self._stem(key)
+        # Shared lock: the index row and parts must all come from the same write
+        with self._lock(stem, shared=True):
+            meta = self._read_meta(stem)
+            if meta is None or meta['key'] != key:
+                return None
+            expired = meta['expires_at'] < time.time()
+            if not expired:
+                try:
+                    parts = {part: self._load(self._path(stem, part)) for part in meta['parts']}
+                except (OSError, ValueError):
+                    return None
+        if expired:
+            self._remove_if_expired(stem)
+            return None
+
+        if meta['mode'] is None:
+            return parts['codes']
+        return QuantizedEmbeddings(parts['codes'], meta['mode'], parts.get('scales'), parts['norms'])
+
+    def _remove_files(self, stem: str, parts: List[str]) -> None:
+        for part in parts:
+            try:
+                os.remove(self._path(stem, part))
+            except OSError:
+                pass
+
+    def _remove(self, stem: str) -> None:
+        """Remove an entry (call with its stem locked)."""
+        # Index row first, so a concurrent reader never finds an entry with missing parts
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM arrays WHERE stem = ?", (stem,))
+        except sqlite3.Error:
+            return
+        self._remove_files(stem, list(self.PARTS))
+
+    def _remove_if_expired(self, stem: str) -> bool:
+        # Another worker may have rewritten the entry since its row was read
+        with self._lock(stem):
+            meta = self._read_meta(stem)
+            if meta is None or meta['expires_at'] >= time.time():
+                return False
+            self._remove(stem)
+            return True
+
+    def delete(self, key: str) -> None:
+        stem = self._stem(key)
+        with self._lock(stem):
+            self._remove(stem)
+
+    def _stems(self, query: str, *args: Any) -> List[str]:
+        try:
+            return [stem for stem, in self._connection().execute(query, args).fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def clear(self) -> None:
+        for stem in self._stems("SELECT stem FROM arrays"):
+            with self._lock(stem):
+                self._remove(stem)
+
+    def cleanup_expired(self) -> int:
+        """Remove expired entries. Returns the number removed."""
+        expired = self._stems("SELECT stem FROM arrays WHERE expires_at < ?", time.time())
+        return sum(1 for stem in expired if self._remove_if_expired(stem))
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            entries, size_bytes = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM arrays"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size_bytes = 0, 0
+        return {'entries': entries, 'size_bytes': size_bytes}
@@ -0,0 +1,337 @@
+import hashlib
+import os
+import re
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+# Names accepted by create_bi_encoder / create_reranker
+ENCODER_BACKENDS = ('sentence-transformers', 'onnx', 'hashing', 'remote')
+
+class BiEncoderBackend(ABC):
+    """Interface for models that turn texts into dense embedding vectors."""
+
+    # Identifier used in embedding cache keys; must change whenever outputs change
+    name: str = ''
+
+    # Longest input the model attends to; longer inputs are truncated
+    max_seq_length: int = 512
+
+    @abstractmethod
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into a float32 array of shape (len(texts), dim)."""
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        """Number of tokens the model would see per text (approximated by words by default)."""
+        return [min(len(text.split()) + 2, self.max_seq_length) for text in texts]
+
+    def encode_batched(self, texts: Sequence[str], max_batch_tokens: int = 8192) -> np.ndarray:
+        """Encode many texts with length-bucketed batching (see encode_length_bucketed)."""
+        return encode_length_bucketed(self, texts, max_batch_tokens)
+
+class ReRankerBackend(ABC):
+    """Interface for cross-encoders that score (query, passage) pairs."""
+
+    name: str = ''
+
+    @abstractmethod
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32) -> np.ndarray:
+        """Return one raw relevance logit per pair as a float32 array."""
+
+def _set_torch_threads(num_threads: int) -> None:
+    """Pin PyTorch intra-op threads for this process (0 keeps the library default)."""
+    if num_threads > 0:
+        import torch
+        torch.set_num_threads(num_threads)
+
+class SentenceTransformerBiEncoder(BiEncoderBackend):
+    """Bi-encoder running a sentence-transformers model with PyTorch."""
+
+    def __init__(self, model_name: str, device: Optional[str] = None, trust_remote_code: bool = False,
+                 **model_kwargs):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device=device, trust_remote_code=trust_remote_code,
+                                         **model_kwargs)
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        if not texts:
+            return []
+        input_ids = self.model.tokenizer(list(texts), add_special_tokens=True, truncation=False)['input_ids']
+        return [min(len(ids), self.max_seq_length) for ids in input_ids]
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True,
+                                       show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+class SentenceTransformerReRanker(ReRankerBackend):
+    """Cross-encoder running a sentence-transformers model with PyTorch."""
+
+    def __init__(self, model_name: str, device: Optional[str] = None, **model_kwargs):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.name = model_name
+        self.model = CrossEncoder(model_name, device=device, **model_kwargs)
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32) -> np.ndarray:
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        scores = self.model.predict(list(pairs), batch_size=batch_size, convert_to_numpy=True,
+                                    show_progress_bar=False)
+        return np.asarray(scores, dtype=np.float32)
+
+def _onnx_export_path(export_dir: str, model_name: str) -> str:
+    """Directory holding the exported ONNX files for a model."""
+    return os.path.join(export_dir, re.sub(r'[^\w.-]', '_', model_name))
+
+def _load_quantized_onnx(model_cls, model_name: str, export_dir: str, quantization_config: str, **kwargs):
+    """
+    Load a sentence-transformers model through ONNX Runtime with int8 weights.
+
+    The first call exports the model to ONNX and applies dynamic int8
+    quantisation; later calls load the quantized file from export_dir.
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    model_dir = _onnx_export_path(export_dir, model_name)
+    file_name = f"onnx/model_qint8_{quantization_config}.onnx"
+
+    if not os.path.exists(os.path.join(model_dir, file_name)):
+        print(f"Exporting {model_name} to quantized ONNX ({quantization_config})...")
+        model = model_cls(model_name, backend='onnx', **kwargs)
+        model.save(model_dir)
+        export_dynamic_quantized_onnx_model(model, quantization_config, model_dir)
+
+    return model_cls(model_dir, backend='onnx', model_kwargs={'file_name': file_name}, **kwargs)
+
+class OnnxBiEncoder(SentenceTransformerBiEncoder):
+    """Bi-encoder exported to ONNX Runtime with dynamic int8 quantisation."""
+
+    def __init__(self, model_name: str, export_dir: str, quantization_config: str = 'avx512_vnni',
+                 trust_remote_code: bool = False):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.name = f"onnx-qint8-{quantization_config}:{model_name}"
+        self.model = _load_quantized_onnx(SentenceTransformer, model_name, export_dir, quantization_config,
+                                          trust_remote_code=trust_remote_code)
+
+class OnnxReRanker(SentenceTransformerReRanker):
+    """Cross-encoder exported to ONNX Runtime with dynamic int8 quantisation."""
+
+    def __init__(self, model_name: str, export_dir: str, quantization_config: str = 'avx512_vnni'):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.name = f"onnx-qint8-{quantization_config}:{model_name}"
+        self.model = _load_quantized_onnx(CrossEncoder, model_name, export_dir, quantization_config)
+
+class HashingBiEncoder(BiEncoderBackend):
+    """
+    Deterministic stand-in encoder that needs no model download.
+
+    Word unigrams and bigrams are hashed into a fixed number of signed
+    buckets and the result is L2-normalised, so texts sharing vocabulary
+    get high cosine similarity. Intended for tests and benchmarks only.
+    """
+
+    TOKEN_PATTERN = re.compile(r'\w+')
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def tokenize(self, text: str) -> List[str]:
+        return self.TOKEN_PATTERN.findall(text.lower())
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        return [min(len(self.tokenize(text)) + 2, self.max_seq_length) for text in texts]
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, 'little')
+        return value % self.dim, (1.0 if (value >> 63) & 1 else -1.0)
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = self.tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                bucket, sign = self._bucket(feature)
+                embeddings[row, bucket] += sign
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+class HashingReRanker(ReRankerBackend):
+    """Deterministic stand-in cross-encoder scoring pairs by hashed-feature cosine."""
+
+    def __init__(self, dim: int = 384):
+        self.encoder = HashingBiEncoder(dim)
+        self.name = f"hashing-reranker-{dim}"
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32) -> np.ndarray:
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        queries = self.encoder.encode([query for query, _ in pairs])
+        passages = self.encoder.encode([passage for _, passage in pairs])
+        cosine = np.sum(queries * passages, axis=1)
+        # Map cosine [-1, 1] onto a logit range comparable to ms-marco cross-encoders
+        return (cosine * 10.0 - 3.0).astype(np.float32)
+
+def encode_length_bucketed(encoder: BiEncoderBackend, texts: Sequence[str],
+                           max_batch_tokens: int = 8192) -> np.ndarray:
+    """
+    Encode texts in token-budgeted batches of similar length.
+
+    Texts are sorted by token count so each batch pads to a length close to
+    that of its members, and batches grow until ``size * longest`` would
+    exceed max_batch_tokens. Embeddings are returned in the input order.
+
+    Args:
+        encoder: Bi-encoder backend to run
+        texts: Texts to encode
+        max_batch_tokens: Padded token budget per batch
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    token_counts = encoder.count_tokens(texts)
+    order = np.argsort(token_counts, kind='stable')[::-1]
+
+    batches = []
+    current = []
+    current_longest = 0
+    for index in order:
+        count = token_counts[index]
+        if current and max(current_longest, count) * (len(current) + 1) > max_batch_tokens:
+            batches.append(current)
+            current, current_longest = [], 0
+        current.append(index)
+        current_longest = max(current_longest, count)
+    if current:
+        batches.append(current)
+
+    embeddings = None
+    for batch in batches:
+        batch_embeddings = encoder.encode([texts[i] for i in batch], batch_size=len(batch))
+        if embeddings is None:
+            embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+        embeddings[batch] = batch_embeddings
+
+    return embeddings
+
+def truncate_embeddings(embeddings: np.ndarray, dim: int) -> np.ndarray:
+    """Keep the first dim components of each embedding and re-normalise to unit length."""
+    truncated = np.asarray(embeddings, dtype=np.float32)[:, :dim]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return truncated / norms
+
+class TruncatedBiEncoder(BiEncoderBackend):
+    """
+    Matryoshka-style truncation of another bi-encoder's embeddings.
+
+    Models trained with Matryoshka representation learning (such as
+    Qwen3-Embedding) keep most of their ranking quality in the leading
+    components, so shorter vectors cut similarity cost and cache size
+    proportionally. The dimension is part of the name, keeping cached
+    embeddings of different sizes apart.
+    """
+
+    def __init__(self, encoder: BiEncoderBackend, dim: int):
+        if dim < 1:
+            raise ValueError("Embedding dimension must be positive")
+        self.encoder = encoder
+        self.dim = dim
+        self.name = f"{encoder.name}:dim{dim}"
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.encoder.max_seq_length
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        return self.encoder.count_tokens(texts)
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        return truncate_embeddings(self.encoder.encode(texts, batch_size), self.dim)
+
+    def encode_batched(self, texts: Sequence[str], max_batch_tokens: int = 8192) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return truncate_embeddings(self.encoder.encode_batched(texts, max_batch_tokens), self.dim)
+
+    def close(self) -> None:
+        if hasattr(self.encoder, 'close'):
+            self.encoder.close()
+
+def create_bi_encoder(backend: str, model_name: str, export_dir: Optional[str] = None,
+                      quantization_config: str = 'avx512_vnni', num_threads: int = 0,
+                      socket_path: Optional[str] = None, pool_workers: int = 0,
+                      embedding_dim: int = 0, authkey: Optional[bytes] = None,
+                      trust_remote_code: bool = False) -> BiEncoderBackend:
+    """
+    Create a bi-encoder for the given backend.
+
+    Args:
+        backend: One of ENCODER_BACKENDS
+        model_name: Hugging Face model name (ignored by the hashing backend)
+        export_dir: Where ONNX exports are stored (onnx backend only)
+        quantization_config: ONNX Runtime quantisation target, e.g. 'avx2' or 'avx512_vnni'
+        num_threads: PyTorch intra-op threads for this process (0 keeps the default)
+        socket_path: Unix socket of a running model server (remote backend only)
+        pool_workers: Shard large encode calls across this many worker processes,
+            each using num_threads threads (0 encodes in this process)
+        embedding_dim: Truncate embeddings to this many leading dimensions (0 keeps them whole)
+        authkey: Secret shared with the model server (remote backend only)
+        trust_remote_code: Run Python code shipped in the model's repository when loading it;
+            only enable this for models whose code has been reviewed
+    """
+    if embedding_dim > 0:
+        return TruncatedBiEncoder(create_bi_encoder(backend, model_name, export_dir, quantization_config,
+                                                    num_threads, socket_path, pool_workers, authkey=authkey,
+                                                    trust_remote_code=trust_remote_code),
+                                  embedding_dim)
+    if pool_workers > 0 and backend != 'remote':
+        from .encoding_pool import EncodingPool
+        return EncodingPool(backend, model_name, pool_workers, num_threads, export_dir, quantization_config,
+                            trust_remote_code=trust_remote_code)
+    if backend == 'sentence-transformers':
+        _set_torch_threads(num_threads)
+        return SentenceTransformerBiEncoder(model_name, trust_remote_code=trust_remote_code)
+    if backend == 'onnx':
+        return OnnxBiEncoder(model_name, export_dir or os.path.join(os.getcwd(), '.model_cache', 'onnx'),
+                             quantization_config, trust_remote_code)
+    if backend == 'hashing':
+        return HashingBiEncoder()
+    if backend == 'remote':
+        from .model_server import RemoteBiEncoder
+        return RemoteBiEncoder(socket_path, authkey)
+    raise ValueError(f"Unknown encoder backend '{backend}'. Must be one of: {', '.join(ENCODER_BACKENDS)}")
+
+def create_reranker(backend: str, model_name: str, export_dir: Optional[str] = None,
+                    quantization_config: str = 'avx512_vnni', num_threads: int = 0,
+                    socket_path: Optional[str] = None, authkey: Optional[bytes] = None) -> ReRankerBackend:
+    """Create a cross-encoder re-ranker for the given backend (see create_bi_encoder)."""
+    if backend == 'sentence-transformers':
+        _set_torch_threads(num_threads)
+        return SentenceTransformerReRanker(model_name)
+    if backend == 'onnx':
+        return OnnxReRanker(model_name, export_dir or os.path.join(os.getcwd(), '.model_cache', 'onnx'),
+                            quantization_config)
+    if backend == 'hashing':
+        return HashingReRanker()
+    if backend == 'remote':
+        from .model_server import RemoteReRanker
+        return RemoteReRanker(socket_path, authkey)
+    raise ValueError(f"Unknown encoder backend '{backend}'. Must be one of: {', '.join(ENCODER_BACKENDS)}")
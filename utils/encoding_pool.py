@@ -0,0 +1,121 @@
+"""
+Multi-process chunk encoding for large documents.
+
+PyTorch intra-op threading stops scaling after a few cores, so a single
+huge document leaves most of a large CPU idle. EncodingPool keeps N worker
+processes, each with its own copy of the bi-encoder pinned to a fixed
+number of threads, and shards every large encode call across them.
+
+Start the pool once per node, ideally inside the model server
+(``python -m utils.model_server --pool-workers N``), and reuse it for
+every request.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional, Sequence
+
+from .encoders import BiEncoderBackend, create_bi_encoder
+
+# Bi-encoder owned by each worker process, created once by the pool initializer
+_worker_encoder: Optional[BiEncoderBackend] = None
+
+def _init_worker(backend: str, model_name: str, export_dir: Optional[str], quantization_config: str,
+                 num_threads: int, trust_remote_code: bool) -> None:
+    global _worker_encoder
+    _worker_encoder = create_bi_encoder(backend, model_name, export_dir, quantization_config, num_threads,
+                                        trust_remote_code=trust_remote_code)
+
+def _encode_shard(texts: List[str], max_batch_tokens: int) -> np.ndarray:
+    return _worker_encoder.encode_batched(texts, max_batch_tokens)
+
+def _ping() -> bool:
+    return _worker_encoder is not None
+
+class EncodingPool(BiEncoderBackend):
+    """
+    Bi-encoder that shards large encode calls across worker processes.
+
+    The parent process keeps a local copy of the model for token counting
+    and for calls too small to be worth shipping to the workers. Texts are
+    dealt to workers in length order so every shard carries a similar
+    token load.
+    """
+
+    def __init__(self, backend: str, model_name: str, num_workers: int, threads_per_worker: int = 0,
+                 export_dir: Optional[str] = None, quantization_config: str = 'avx512_vnni',
+                 min_texts_per_worker: int = 32, trust_remote_code: bool = False):
+        """
+        Args:
+            backend: Local encoder backend each worker runs (see ENCODER_BACKENDS)
+            model_name: Model to load in every worker
+            num_workers: Number of worker processes
+            threads_per_worker: PyTorch threads per worker (0 splits the CPU cores evenly);
+                a non-zero value also applies to the parent's local encoder
+            export_dir: ONNX export directory (onnx backend only)
+            quantization_config: ONNX Runtime quantisation target (onnx backend only)
+            min_texts_per_worker: Calls with fewer texts per worker are encoded locally
+            trust_remote_code: Run code shipped in the model's repository when loading it
+        """
+        if num_workers < 1:
+            raise ValueError("EncodingPool needs at least one worker")
+
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        self.min_texts_per_worker = min_texts_per_worker
+
+        # The even split of the cores is pinned in the workers only; the parent keeps the caller's
+        # setting (0 = library default) so its re-ranker and small encodes are not throttled
+        self.local = create_bi_encoder(backend, model_name, export_dir, quantization_config,
+                                       threads_per_worker, trust_remote_code=trust_remote_code)
+        # Workers run the same model, so embeddings share cache entries with a local encoder
+        self.name = self.local.name
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(backend, model_name, export_dir, quantization_config, self.threads_per_worker,
+                      trust_remote_code),
+        )
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.local.max_seq_length
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        return self.local.count_tokens(texts)
+
+    def warm_up(self) -> None:
+        """Block until every worker has loaded its model."""
+        for ready in [self._executor.submit(_ping) for _ in range(self.num_workers)]:
+            ready.result()
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        return self.encode_batched(texts)
+
+    def encode_batched(self, texts: Sequence[str], max_batch_tokens: int = 8192) -> np.ndarray:
+        if len(texts) < self.num_workers * self.min_texts_per_worker:
+            return self.local.encode_batched(texts, max_batch_tokens)
+
+        # Deal length-sorted texts round-robin so each shard gets a similar token load
+        order = np.argsort(self.count_tokens(texts), kind='stable')[::-1]
+        shards = [order[worker::self.num_workers] for worker in range(self.num_workers)]
+        futures = [
+            self._executor.submit(_encode_shard, [texts[i] for i in shard], max_batch_tokens)
+            for shard in shards
+        ]
+
+        embeddings = None
+        for shard, future in zip(shards, futures):
+            shard_embeddings = future.result()
+            if embeddings is None:
+                embeddings = np.empty((len(texts), shard_embeddings.shape[1]), dtype=np.float32)
+            embeddings[shard] = shard_embeddings
+        return embeddings
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,350 @@
+"""
+Local model server shared by all web workers on a node.
+
+One process owns the bi-encoder and cross-encoder and serves encode and
+re-rank calls over a Unix socket. Concurrent calls from every worker are
+coalesced into shared batches by a MicroBatcher, which waits at most
+``max_wait`` seconds for company before running the model.
+
+Start it with ``python -m utils.model_server`` and set
+``ENCODER_BACKEND=remote`` for the web workers. Calls are pickled, so
+both sides must share an authkey (MODEL_SERVER_AUTHKEY) and the socket
+must sit in a private directory owned by the current user.
+"""
+
+import argparse
+import os
+import queue
+import stat
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from .encoders import BiEncoderBackend, ReRankerBackend, create_bi_encoder, create_reranker
+
+def _require_authkey(authkey: Optional[bytes]) -> bytes:
+    if not authkey:
+        raise ValueError("The model server exchanges pickles and needs a shared authkey; set MODEL_SERVER_AUTHKEY")
+    return authkey
+
+def check_socket_path(socket_path: str, create: bool = False) -> None:
+    """
+    Refuse a model server socket that other users could reach or replace.
+
+    The socket's directory must belong to the current user and be closed
+    to everyone else (created with mode 0700 when create is set), and an
+    existing socket must belong to the current user.
+
+    Raises:
+        PermissionError: If the directory or socket is not private to this user
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    if create:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"Model server socket directory {directory} is not owned by the current user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"Model server socket directory {directory} must not be accessible "
+                              f"to other users (chmod 700)")
+    try:
+        owner = os.lstat(socket_path).st_uid
+    except FileNotFoundError:
+        return
+    if owner != os.getuid():
+        raise PermissionError(f"Model server socket {socket_path} is not owned by the current user")
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests into shared model batches.
+
+    Each request is a list of items. The worker thread takes the first
+    waiting request, then keeps collecting requests until max_wait has
+    passed or max_items items are pending, runs ``run_batch`` once on the
+    concatenated items and hands every caller its own slice of the output.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], Sequence[Any]], max_wait: float = 0.01,
+                 max_items: int = 512):
+        self.run_batch = run_batch
+        self.max_wait = max_wait
+        self.max_items = max_items
+        self._queue = queue.Queue()
+        self.stats = {'requests': 0, 'batches': 0, 'items': 0}
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, items: List[Any]) -> Sequence[Any]:
+        """Queue items for the next batch and block until their results are ready."""
+        if not items:
+            return self.run_batch([])
+        future = Future()
+        self._queue.put((items, future))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[List[Any], Future]]:
+        pending = [self._queue.get()]
+        count = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while count < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(request)
+            count += len(request[0])
+
+        return pending
+
+    def _worker(self):
+        while True:
+            pending = self._collect()
+            items = [item for request_items, _ in pending for item in request_items]
+
+            try:
+                results = self.run_batch(items)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.stats['requests'] += len(pending)
+            self.stats['batches'] += 1
+            self.stats['items'] += len(items)
+
+            offset = 0
+            for request_items, future in pending:
+                future.set_result(results[offset:offset + len(request_items)])
+                offset += len(request_items)
+
+class ModelServer:
+    """
+    Serve encode / re-rank / token-count calls for local workers over a Unix socket.
+
+    Only clients proving authkey are served.
+    """
+
+    def __init__(self, socket_path: str, bi_encoder: BiEncoderBackend, reranker: ReRankerBackend,
+                 max_wait: float = 0.01, max_items: int = 512, batch_tokens: int = 8192,
+                 authkey: Optional[bytes] = None):
+        """
+        Raises:
+            ValueError: If authkey is empty
+        """
+        self.socket_path = socket_path
+        self.bi_encoder = bi_encoder
+        self.reranker = reranker
+        self.authkey = _require_authkey(authkey)
+        self.encode_batcher = MicroBatcher(
+            lambda texts: bi_encoder.encode_batched(texts, batch_tokens), max_wait, max_items
+        )
+        self.rerank_batcher = MicroBatcher(reranker.predict, max_wait, max_items)
+        self._listener = None
+
+    def _dispatch(self, op: str, payload: Any) -> Any:
+        if op == 'encode':
+            return self.encode_batcher.submit(list(payload))
+        if op == 'rerank':
+            return self.rerank_batcher.submit([tuple(pair) for pair in payload])
+        if op == 'count_tokens':
+            return self.bi_encoder.count_tokens(list(payload))
+        if op == 'info':
+            return {
+                'bi_encoder': self.bi_encoder.name,
+                'reranker': self.reranker.name,
+                'max_seq_length': self.bi_encoder.max_seq_length,
+            }
+        if op == 'stats':
+            return {'encode': dict(self.encode_batcher.stats), 'rerank': dict(self.rerank_batcher.stats)}
+        raise ValueError(f"Unknown operation '{op}'")
+
+    def _handle_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    response = ('ok', self._dispatch(op, payload))
+                except Exception as e:
+                    response = ('error', f"{type(e).__name__}: {e}")
+
+                try:
+                    conn.send(response)
+                except OSError:
+                    return
+
+    def start(self) -> None:
+        """
+        Bind the socket (replacing a stale one of ours) inside a private directory.
+
+        Raises:
+            PermissionError: See check_socket_path
+        """
+        check_socket_path(self.socket_path, create=True)
+        if os.path.lexists(self.socket_path):
+            os.remove(self.socket_path)
+        # Created 0600 rather than narrowed after bind, so it is never open to others
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+        finally:
+            os.umask(umask)
+
+    def serve_forever(self) -> None:
+        """Accept worker connections, one handler thread per connection."""
+        if self._listener is None:
+            self.start()
+        while True:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                if self._listener is None:
+                    return
+                continue
+            threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    def close(self) -> None:
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+class ModelServerClient:
+    """
+    Per-thread connections to a ModelServer, reconnecting once on failure.
+
+    Connections are only made to a socket owned by the current user, and
+    the server must prove the same authkey before a reply is unpickled.
+    """
+
+    def __init__(self, socket_path: str, authkey: Optional[bytes] = None):
+        """
+        Raises:
+            ValueError: If authkey is empty
+        """
+        self.socket_path = socket_path
+        self.authkey = _require_authkey(authkey)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            check_socket_path(self.socket_path)
+            conn = Client(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, op: str, payload: Any = None) -> Any:
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((op, payload))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._reset()
+                if attempt:
+                    raise
+        if status == 'error':
+            raise RuntimeError(f"Model server error: {result}")
+        return result
+
+class RemoteBiEncoder(BiEncoderBackend):
+    """Bi-encoder whose calls are served (and batched) by a ModelServer."""
+
+    def __init__(self, socket_path: str, authkey: Optional[bytes] = None):
+        self.client = ModelServerClient(socket_path, authkey)
+        info = self.client.call('info')
+        # Same cache-key name as a local model so embeddings are shared with it
+        self.name = info['bi_encoder']
+        self.max_seq_length = info['max_seq_length']
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.client.call('encode', list(texts)), dtype=np.float32)
+
+    def encode_batched(self, texts: Sequence[str], max_batch_tokens: int = 8192) -> np.ndarray:
+        # The server buckets and batches across all workers; send everything at once
+        return self.encode(texts)
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        return self.client.call('count_tokens', list(texts))
+
+class RemoteReRanker(ReRankerBackend):
+    """Cross-encoder whose calls are served (and batched) by a ModelServer."""
+
+    def __init__(self, socket_path: str, authkey: Optional[bytes] = None):
+        self.client = ModelServerClient(socket_path, authkey)
+        self.name = self.client.call('info')['reranker']
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32) -> np.ndarray:
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        return np.asarray(self.client.call('rerank', [tuple(pair) for pair in pairs]), dtype=np.float32)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Shared encoder / re-ranker server for compliance workers")
+    parser.add_argument('--socket', default=Config.MODEL_SERVER_SOCKET,
+                        help="Unix socket path, in a directory private to this user")
+    parser.add_argument('--authkey', default=Config.MODEL_SERVER_AUTHKEY.decode(),
+                        help="Secret shared with the workers (defaults to MODEL_SERVER_AUTHKEY; prefer the "
+                             "environment variable, command lines are visible to other users)")
+    parser.add_argument('--backend', default=Config.MODEL_SERVER_BACKEND, help="Local encoder backend to serve")
+    parser.add_argument('--max-wait-ms', type=int, default=Config.MODEL_SERVER_MAX_WAIT_MS,
+                        help="Longest time a request waits for others to share its batch")
+    parser.add_argument('--max-batch-items', type=int, default=Config.MODEL_SERVER_MAX_BATCH_ITEMS,
+                        help="Items that trigger a batch without waiting further")
+    parser.add_argument('--pool-workers', type=int, default=Config.ENCODE_POOL_WORKERS,
+                        help="Worker processes sharding large encode calls (0 encodes in the server process)")
+    args = parser.parse_args(argv)
+
+    if args.backend == 'remote':
+        parser.error("The model server needs a local backend")
+    if not args.authkey:
+        parser.error("Set MODEL_SERVER_AUTHKEY (or --authkey) to the secret the workers will use")
+
+    bi_encoder = create_bi_encoder(args.backend, Config.BI_ENCODER_MODEL_NAME, Config.ONNX_EXPORT_DIR,
+                                   Config.ONNX_QUANTIZATION_CONFIG, Config.ENCODE_NUM_THREADS,
+                                   pool_workers=args.pool_workers,
+                                   trust_remote_code=Config.BI_ENCODER_TRUST_REMOTE_CODE)
+    reranker = create_reranker(args.backend, Config.CROSS_ENCODER_MODEL_NAME, Config.ONNX_EXPORT_DIR,
+                               Config.ONNX_QUANTIZATION_CONFIG, Config.ENCODE_NUM_THREADS)
+
+    server = ModelServer(args.socket, bi_encoder, reranker, args.max_wait_ms / 1000.0,
+                         args.max_batch_items, Config.ENCODE_BATCH_TOKENS, args.authkey.encode())
+    server.start()
+    print(f"Model server listening on {args.socket} ({args.backend} backend)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if hasattr(bi_encoder, 'close'):
+            bi_encoder.close()
+
+if __name__ == '__main__':
+    main()
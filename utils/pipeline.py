@@ -0,0 +1,222 @@
+"""
+Staged analysis pipeline shared by the compliance checkers.
+
+Every analysis runs the same explicit stages in order::
+
+    extract -> normalise -> segment -> embed -> retrieve -> rerank -> aggregate
+
+A PipelineRun records the wall time and memory of each stage as it runs,
+and stages whose output depends only on their input are cached by content
+hash. The upstream stages (extract, normalise and sentence segmentation)
+are shared functions here, so running the enhanced and the semantic
+checker on the same upload cleans and segments the text only once.
+
+The extract and normalise stages hold the full text of an upload, so
+their outputs stay in the worker's memory cache unless
+PERSIST_DOCUMENT_TEXT is set; only derived outputs (spans, embeddings,
+scores) reach the shared disk or Redis tier by default.
+"""
+
+import hashlib
+import os
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .cache_manager import cache_stage_output, get_cached_stage_output, get_content_hash
+from .chunking import Span, sentence_spans
+
+STAGES = ('extract', 'normalise', 'segment', 'embed', 'retrieve', 'rerank', 'aggregate')
+# Whether the text of uploads (extract and normalise outputs) is written to the shared cache tiers
+PERSIST_DOCUMENT_TEXT = bool(int(os.environ.get('PERSIST_DOCUMENT_TEXT', 0)))
+
+# Lines dropped from SOPs before analysis: classification banners, page footers, revision blocks
+BOILERPLATE_PATTERNS = [
+    r"^(confidential|internal use only|property of).*",
+    r"^page\s+\d+\s+of\s+\d+",
+    r"^document\s+version:\s+\d+",
+    r"^revision\s+history",
+    r"^author(s)?:.*",
+    r"^date\s+of\s+issue:.*",
+]
+
+@dataclass
+class ExtractedDocument:
+    """Raw text of an uploaded file (output of the extract stage)."""
+    text: str
+    content_hash: str
+
+@dataclass
+class NormalisedDocument:
+    """Boilerplate-free, whitespace-collapsed text (output of the normalise stage)."""
+    text: str
+    content_hash: str
+
+@dataclass
+class SentenceSegments:
+    """Sentence spans of a normalised document (output of the segment stage)."""
+    document: NormalisedDocument
+    spans: List[Span]
+
+    def sentences(self) -> List[str]:
+        return [self.document.text[start:end] for start, end in self.spans]
+
+@dataclass
+class StageRecord:
+    """Cost of one stage, summed over every time it ran in a pipeline run."""
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    cache_hits: int = 0
+    memory_bytes: int = 0
+    peak_memory_bytes: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 4),
+            'calls': self.calls,
+            'cache_hits': self.cache_hits,
+            'memory_bytes': self.memory_bytes,
+            'peak_memory_bytes': self.peak_memory_bytes,
+        }
+
+def _resident_bytes() -> int:
+    """Resident set size of this process (0 where it cannot be read)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+class PipelineRun:
+    """
+    Per-analysis record of stage timings and memory.
+
+    Stages may nest (re-ranking runs inside retrieval) and may run many
+    times (once per control); each record holds the stage's own time,
+    excluding nested stages, summed over all its calls. Memory is the
+    largest growth in resident memory seen during a call, plus the Python
+    allocation peak when tracemalloc is tracing.
+    """
+
+    def __init__(self):
+        self.records: Dict[str, StageRecord] = {}
+        self._stack: List[List[float]] = []
+
+    def _record(self, name: str) -> StageRecord:
+        if name not in STAGES:
+            raise ValueError(f"Unknown pipeline stage '{name}'. Must be one of: {', '.join(STAGES)}")
+        if name not in self.records:
+            self.records[name] = StageRecord(name)
+        return self.records[name]
+
+    @contextmanager
+    def stage(self, name: str, cached: bool = False) -> Iterator[StageRecord]:
+        """
+        Time the enclosed block as one call of stage name.
+
+        Args:
+            name: One of STAGES
+            cached: The block served the stage's output from a cache
+        """
+        record = self._record(name)
+        tracing = tracemalloc.is_tracing()
+        if tracing and not self._stack:
+            tracemalloc.reset_peak()
+        resident = _resident_bytes()
+        # [nested seconds] of the enclosing stage frames
+        self._stack.append([0.0])
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()[0]
+            if self._stack:
+                self._stack[-1][0] += elapsed
+
+            record.seconds += elapsed - nested
+            record.calls += 1
+            record.cache_hits += int(cached)
+            record.memory_bytes = max(record.memory_bytes, _resident_bytes() - resident)
+            if tracing:
+                record.peak_memory_bytes = max(record.peak_memory_bytes or 0, tracemalloc.get_traced_memory()[1])
+
+    def cached(self, name: str, key: str, compute: Callable[[], Any], ttl: int = 3600,
+               disk: bool = True) -> Any:
+        """
+        Output of stage name for a content-hash key, computed on a cache miss.
+
+        Args:
+            name: One of STAGES
+            key: Hash of everything the stage output depends on
+            compute: Produces the stage output; must return a picklable value
+            ttl: Cache lifetime in seconds
+            disk: Also keep the output in the shared disk tier, not only in this process
+        """
+        self._record(name)
+        output = get_cached_stage_output(name, key)
+        if output is not None:
+            with self.stage(name, cached=True):
+                return output
+        with self.stage(name):
+            output = compute()
+        cache_stage_output(name, key, output, ttl, disk)
+        return output
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Stage records in pipeline order."""
+        return [self.records[name].to_dict() for name in STAGES if name in self.records]
+
+    def total_seconds(self) -> float:
+        return sum(record.seconds for record in self.records.values())
+
+def stage_key(*parts: Any) -> str:
+    """Cache key for a stage output that depends on all of parts."""
+    return get_content_hash('\x1f'.join(str(part) for part in parts))
+
+def extract_document(run: PipelineRun, path: str, extract: Callable[[], str]) -> ExtractedDocument:
+    """
+    Extract stage: text of the file at path, cached by the file's bytes.
+
+    Args:
+        run: Pipeline run recording the stage
+        path: Uploaded file
+        extract: Returns the file's text (e.g. PDFParser.extract_text)
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    file_hash = digest.hexdigest()[:16]
+    text = run.cached('extract', file_hash, extract, disk=PERSIST_DOCUMENT_TEXT)
+    return ExtractedDocument(text, get_content_hash(text))
+
+def remove_boilerplate(text: str) -> str:
+    cleaned_text = text
+    for pattern in BOILERPLATE_PATTERNS:
+        cleaned_text = re.sub(pattern, "", cleaned_text, flags=re.IGNORECASE | re.MULTILINE)
+    return cleaned_text.strip()
+
+def clean_text(text: str) -> str:
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,;:!?\-(")]', ' ', text)
+    # Rejoin single characters split apart by PDF extraction
+    text = re.sub(r'\b(\w)\s+(\w)\b', r'\1\2', text)
+    return text.strip()
+
+def normalise_document(run: PipelineRun, content: str) -> NormalisedDocument:
+    """Normalise stage: strip boilerplate and clean the text, cached by content hash."""
+    text = run.cached('normalise', get_content_hash(content), lambda: clean_text(remove_boilerplate(content)),
+                      disk=PERSIST_DOCUMENT_TEXT)
+    return NormalisedDocument(text, get_content_hash(text))
+
+def segment_sentences(run: PipelineRun, document: NormalisedDocument) -> SentenceSegments:
+    """Segment stage: sentence spans of a normalised document, cached by content hash."""
+    spans = run.cached('segment', stage_key('sentences', document.content_hash),
+                       lambda: sentence_spans(document.text))
+    return SentenceSegments(document, spans)
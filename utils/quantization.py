@@ -0,0 +1,159 @@
+import numpy as np
+from typing import Any, Optional, Union
+
+# Supported storage formats for cached embeddings
+QUANTIZATION_MODES = ('float32', 'float16', 'int8')
+DEFAULT_QUANTIZATION = 'float16'
+
+class QuantizedEmbeddings:
+    """
+    Compact embedding matrix stored as float16 or per-vector-scaled int8.
+
+    The int8 form keeps one float32 scale per row so that
+    ``row ~= codes[row] * scales[row]``. Row norms of the dequantized vectors
+    are recorded at quantization time so cosine similarity can be computed
+    directly on the compact codes without materialising a float32 copy.
+    """
+
+    __slots__ = ('codes', 'scales', 'norms', 'mode')
+
+    # Rows widened to float32 at a time when computing similarities
+    BLOCK_ROWS = 4096
+
+    def __init__(self, codes: np.ndarray, mode: str, scales: Optional[np.ndarray] = None,
+                 norms: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.mode = mode
+        self.scales = scales
+        self.norms = norms if norms is not None else self._compute_norms()
+
+    def _compute_norms(self) -> np.ndarray:
+        norms = np.linalg.norm(self.codes.astype(np.float32), axis=1)
+        if self.scales is not None:
+            norms = norms * self.scales
+        return norms.astype(np.float32)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        total = self.codes.nbytes + self.norms.nbytes
+        if self.scales is not None:
+            total += self.scales.nbytes
+        return total
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index) -> Union['QuantizedEmbeddings', np.ndarray]:
+        """Index rows; a single integer returns a dequantized float32 vector."""
+        if isinstance(index, (int, np.integer)):
+            return self._row(int(index))
+
+        scales = self.scales[index] if self.scales is not None else None
+        return QuantizedEmbeddings(self.codes[index], self.mode, scales, self.norms[index])
+
+    def _row(self, index: int) -> np.ndarray:
+        row = self.codes[index].astype(np.float32)
+        if self.scales is not None:
+            row *= self.scales[index]
+        return row
+
+    def dequantize(self) -> np.ndarray:
+        """Return a float32 copy of the embeddings."""
+        data = self.codes.astype(np.float32)
+        if self.scales is not None:
+            data *= self.scales[:, np.newaxis]
+        return data
+
+    def dot(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Dot products of float32 queries (m, d) against the stored rows (n, d).
+
+        Codes are widened block by block, so the float32 temporary never
+        exceeds BLOCK_ROWS rows regardless of how many rows are stored.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = np.empty((queries.shape[0], len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.BLOCK_ROWS):
+            block = self.codes[start:start + self.BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales[np.newaxis, :]
+        return scores
+
+    def cosine_similarity(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of float32 queries (m, d) against the stored rows (n, d)."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        query_norms = np.linalg.norm(queries, axis=1)
+        denominator = np.outer(query_norms, self.norms)
+        denominator[denominator == 0] = 1.0
+        return self.dot(queries) / denominator
+
+    def __getstate__(self):
+        return (self.codes, self.mode, self.scales, self.norms)
+
+    def __setstate__(self, state):
+        self.codes, self.mode, self.scales, self.norms = state
+
+def quantize_embeddings(embeddings: Any, mode: str = DEFAULT_QUANTIZATION) -> Union[np.ndarray, QuantizedEmbeddings]:
+    """
+    Convert embeddings to a compact storage format.
+
+    Args:
+        embeddings: Array-like of shape (n, d), or an already quantized matrix.
+            A single (d,) vector is stored as a (1, d) matrix.
+        mode: One of 'float32' (no-op), 'float16' or 'int8'
+
+    Returns:
+        A float32 ndarray for 'float32', otherwise a QuantizedEmbeddings instance
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'. Must be one of: {', '.join(QUANTIZATION_MODES)}")
+
+    if isinstance(embeddings, QuantizedEmbeddings):
+        if embeddings.mode == mode:
+            return embeddings
+        embeddings = embeddings.dequantize()
+
+    data = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+
+    if mode == 'float32':
+        return data
+
+    # Norms are computed from the codes, so cosine scores match those of the dequantized vectors
+    if mode == 'float16':
+        return QuantizedEmbeddings(data.astype(np.float16), 'float16')
+
+    # Symmetric per-vector int8: the largest magnitude in each row maps to 127
+    max_abs = np.max(np.abs(data), axis=1) if data.size else np.zeros(len(data), dtype=np.float32)
+    scales = (max_abs / 127.0).astype(np.float32)
+    safe_scales = np.where(scales == 0, 1.0, scales)
+    codes = np.clip(np.rint(data / safe_scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return QuantizedEmbeddings(codes, 'int8', scales)
+
+def dequantize_embeddings(embeddings: Any) -> Any:
+    """Return a float32 ndarray for quantized embeddings; other values pass through."""
+    if isinstance(embeddings, QuantizedEmbeddings):
+        return embeddings.dequantize()
+    return embeddings
+
+def embedding_cosine_similarity(queries: np.ndarray, embeddings: Any) -> np.ndarray:
+    """
+    Cosine similarity between queries (m, d) and embeddings (n, d).
+
+    Works on plain float arrays and on QuantizedEmbeddings without
+    dequantizing the stored matrix first.
+    """
+    if isinstance(embeddings, QuantizedEmbeddings):
+        return embeddings.cosine_similarity(queries)
+
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    query_norms = np.linalg.norm(queries, axis=1)
+    embedding_norms = np.linalg.norm(embeddings, axis=1)
+    denominator = np.outer(query_norms, embedding_norms)
+    denominator[denominator == 0] = 1.0
+    return (queries @ embeddings.T) / denominator
@@ -0,0 +1,155 @@
+import re
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence
+
+class KeywordPostingIndex:
+    """
+    Keyword -> chunk-id posting lists for a document's chunks.
+
+    Every chunk is lowercased once and scanned once with a single regex
+    alternating all keywords. Matches are case-insensitive substring
+    matches, identical to ``keyword.lower() in chunk.lower()``, or with
+    whole_words only occurrences not inside a longer word ('use' does not
+    match "user").
+    """
+
+    def __init__(self, chunks: Sequence[str], keywords: Iterable[str], whole_words: bool = False):
+        vocabulary = sorted({keyword.lower() for keyword in keywords if keyword}, key=len, reverse=True)
+        self.postings: Dict[str, np.ndarray] = {}
+        if not vocabulary or not chunks:
+            return
+
+        # At each position the alternation reports only the longest keyword
+        # starting there; every keyword contained in it is present as well
+        contained = {
+            keyword: [other for other in vocabulary if keyword_pattern(other, whole_words).search(keyword)]
+            for keyword in vocabulary
+        }
+        alternation = '(' + '|'.join(re.escape(keyword) for keyword in vocabulary) + ')'
+        if whole_words:
+            alternation = r'(?<!\w)' + alternation + r'(?!\w)'
+        pattern = re.compile('(?=' + alternation + ')')
+
+        postings = {}
+        for chunk_id, chunk in enumerate(chunks):
+            found = set()
+            for match in pattern.finditer(chunk.lower()):
+                found.update(contained[match.group(1)])
+            for keyword in found:
+                postings.setdefault(keyword, []).append(chunk_id)
+
+        self.postings = {keyword: np.asarray(ids, dtype=np.int64) for keyword, ids in postings.items()}
+
+    def lookup(self, keyword: str) -> np.ndarray:
+        """Ids of the chunks containing keyword (ascending)."""
+        return self.postings.get(keyword.lower(), np.zeros(0, dtype=np.int64))
+
+    def candidates(self, keywords: Iterable[str], min_matches: int = 1) -> np.ndarray:
+        """Ids of the chunks containing at least min_matches distinct keywords (ascending, deduplicated)."""
+        lists = [self.lookup(keyword) for keyword in {keyword.lower() for keyword in keywords}]
+        lists = [ids for ids in lists if len(ids)]
+        if not lists:
+            return np.zeros(0, dtype=np.int64)
+        ids, counts = np.unique(np.concatenate(lists), return_counts=True)
+        return ids[counts >= min_matches]
+
+def keyword_pattern(keyword: str, whole_words: bool = True) -> re.Pattern:
+    """Pattern finding keyword in lowercased text, optionally only where it is not part of a longer word."""
+    if whole_words:
+        return re.compile(r'(?<!\w)' + re.escape(keyword) + r'(?!\w)')
+    return re.compile(re.escape(keyword))
+
+class BM25Index:
+    """
+    Okapi BM25 over a document's chunks.
+
+    Chunks are tokenised in a single pass into term -> (chunk ids, weights)
+    posting lists with the BM25 term weight precomputed per posting, so
+    scoring a query is one scatter-add per distinct query term.
+    """
+
+    TOKEN_PATTERN = re.compile(r'\w+')
+
+    def __init__(self, chunks: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.num_chunks = len(chunks)
+        self.vocabulary: Dict[str, int] = {}
+
+        term_ids = []
+        chunk_ids = []
+        lengths = np.zeros(self.num_chunks, dtype=np.float32)
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = self.tokenize(chunk)
+            lengths[chunk_id] = len(tokens)
+            term_ids.extend(self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokens)
+            chunk_ids.extend([chunk_id] * len(tokens))
+
+        # Term frequencies per (term, chunk), grouped by term
+        keys, term_frequencies = np.unique(
+            np.asarray(term_ids, dtype=np.int64) * max(self.num_chunks, 1) + np.asarray(chunk_ids, dtype=np.int64),
+            return_counts=True
+        )
+        posting_terms = keys // max(self.num_chunks, 1)
+        self.posting_chunks = keys % max(self.num_chunks, 1)
+        self.offsets = np.searchsorted(posting_terms, np.arange(len(self.vocabulary) + 1))
+
+        document_frequency = np.diff(self.offsets)
+        idf = np.log(1.0 + (self.num_chunks - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        average_length = lengths.mean() if self.num_chunks and lengths.mean() > 0 else 1.0
+        length_norm = k1 * (1.0 - b + b * lengths[self.posting_chunks] / average_length)
+        self.posting_weights = (
+            idf[posting_terms] * term_frequencies * (k1 + 1.0) / (term_frequencies + length_norm)
+        ).astype(np.float32)
+
+    def tokenize(self, text: str) -> List[str]:
+        return self.TOKEN_PATTERN.findall(text.lower())
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for query (zero for chunks sharing no terms)."""
+        scores = np.zeros(self.num_chunks, dtype=np.float32)
+        for token in set(self.tokenize(query)):
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.posting_chunks[start:end]] += self.posting_weights[start:end]
+        return scores
+
+    def rank(self, query: str, limit: Optional[int] = None) -> np.ndarray:
+        """Ids of the chunks matching query, best first (at most limit)."""
+        scores = self.score(query)
+        matching = np.flatnonzero(scores > 0)
+        ranking = matching[np.argsort(-scores[matching], kind='stable')]
+        return ranking[:limit]
+
+def dense_ranking(similarities: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+    """Indices of similarities in descending order (at most limit)."""
+    if limit is not None and limit < len(similarities):
+        top = np.argpartition(-similarities, limit - 1)[:limit]
+        return top[np.argsort(-similarities[top], kind='stable')]
+    return np.argsort(-similarities, kind='stable')
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60,
+                           limit: Optional[int] = None) -> np.ndarray:
+    """
+    Fuse several rankings of the same items with reciprocal-rank fusion.
+
+    An item scores ``sum(1 / (k + rank))`` over the rankings it appears in
+    (ranks start at 1). Ties keep the order of first appearance, so the
+    first ranking breaks them.
+
+    Args:
+        rankings: Item ids ordered best first; rankings may differ in length
+        k: Damping constant; larger values flatten the rank weights
+        limit: Number of fused items to return (all when None)
+
+    Returns:
+        Item ids ordered by fused score, best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[int(item)] = fused.get(int(item), 0.0) + 1.0 / (k + rank)
+
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    return np.asarray(ordered[:limit], dtype=np.int64)
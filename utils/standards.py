@@ -0,0 +1,66 @@
+import json
+import os
+from typing import Dict, List
+
+from .cache_manager import cache_iso_standards, get_cached_iso_standards
+
+# Relative to the working directory, like the rest of the app's data files
+STANDARDS_PATH = os.path.join('iso_standards', 'iso27002.json')
+
+# Used when the standards file is missing
+FALLBACK_STANDARDS = {
+    "5.1": {"name": "Information security policies", "keywords": ["policy", "policies", "information security"]},
+    "5.2": {"name": "Information security roles and responsibilities", "keywords": ["roles", "responsibilities"]},
+    "6.1": {"name": "Screening", "keywords": ["screening", "background", "employment"]},
+    "7.1": {"name": "Physical security perimeters", "keywords": ["physical security", "perimeter"]},
+    "8.1": {"name": "User endpoint devices", "keywords": ["endpoint", "devices", "user"]}
+}
+
+KEYWORD_STOP_WORDS = {'of', 'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by'}
+
+def load_iso_standards(cached: bool = True) -> Dict:
+    """
+    Load the ISO 27002 controls (without the file's metadata entry).
+
+    Args:
+        cached: Serve and store the parsed controls through the cache
+            manager; False always reads the file
+
+    Returns:
+        Control id -> control data, or FALLBACK_STANDARDS if the file is missing
+    """
+    if cached:
+        cached_standards = get_cached_iso_standards()
+        if cached_standards:
+            print("Loaded ISO standards from cache.")
+            return cached_standards
+
+    print("Loading ISO standards from JSON file...")
+    try:
+        with open(STANDARDS_PATH, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print("Warning: ISO standards file not found, using basic fallback controls")
+        return dict(FALLBACK_STANDARDS)
+
+    standards = {k: v for k, v in data.items() if k != 'metadata'}
+    if cached:
+        cache_iso_standards(standards)
+        print("Cached ISO standards for future use.")
+    return standards
+
+def generate_keywords_from_name(name: str) -> List[str]:
+    """Generate basic keywords from a control name."""
+    words = name.lower().split()
+    return [word for word in words if word not in KEYWORD_STOP_WORDS and len(word) > 2]
+
+def load_control_keywords(standards: Dict) -> Dict[str, List[str]]:
+    """Keywords per control, from the standards data or generated from the control name."""
+    control_keywords = {}
+    for control_id, control_data in standards.items():
+        if isinstance(control_data, dict) and 'keywords' in control_data:
+            control_keywords[control_id] = control_data['keywords']
+        else:
+            control_name = control_data.get('name', '') if isinstance(control_data, dict) else str(control_data)
+            control_keywords[control_id] = generate_keywords_from_name(control_name)
+    return control_keywords
@@ -7,7 +7,7 @@ from typing import Tuple, Optional
 
 class FileUploadSchema(Schema):
     """Schema for file upload validation."""
-    method = fields.Str(required=True, validate=lambda x: x in ['enhanced', 'semantic'])
+    method = fields.Str(required=True, validate=lambda x: x in ['enhanced', 'semantic', 'hybrid'])
     file = fields.Raw(required=True)
 
 def validate_file_upload(file: FileStorage, allowed_extensions: set) -> Tuple[bool, Optional[str]]:
@@ -94,7 +94,7 @@ def validate_analysis_method(method: str) -> Tuple[bool, Optional[str]]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    valid_methods = {'enhanced', 'semantic'}
+    valid_methods = {'enhanced', 'semantic', 'hybrid'}
     
     if not method:
         return False, "Analysis method is required"
@@ -104,6 +104,22 @@ def validate_analysis_method(method: str) -> Tuple[bool, Optional[str]]:
     
     return True, None
 
+def validate_analysis_profile(profile: str, profiles: dict) -> Tuple[bool, Optional[str]]:
+    """
+    Validate the analysis profile parameter.
+    
+    Args:
+        profile: The requested profile name
+        profiles: Mapping of configured profile names to their settings
+        
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if profile not in profiles:
+        return False, f"Invalid analysis profile. Must be one of: {', '.join(profiles)}"
+    
+    return True, None
+
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize filename for safe storage.
@@ -0,0 +1,161 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+class WriteBehindQueue:
+    """
+    Queue of pending writes drained in batches by a background thread.
+
+    A write to a key that is still queued replaces the queued value, so a
+    hot key is written once per batch. Queued and in-progress values stay
+    readable through get() until they have been written. Producers block
+    once max_pending keys are waiting, which bounds the memory held by the
+    queue when the disk falls behind. Discarding a key that is being
+    written waits for its batch to finish, so a delete that follows the
+    discard cannot be overtaken by the write. Pending writes are flushed
+    when the process exits.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Tuple[Hashable, Any]]], None], max_pending: int = 1024):
+        """
+        Args:
+            write_batch: Writes a list of (key, value) pairs; runs on the worker thread
+            max_pending: Queued keys beyond which put() waits for the worker
+        """
+        self.write_batch = write_batch
+        self.max_pending = max_pending
+        self._pending = OrderedDict()
+        self._in_flight = {}
+        self._writing = False
+        self._batches_done = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._stats = {'queued': 0, 'coalesced': 0, 'written': 0, 'errors': 0}
+        atexit.register(self.close)
+
+    def _ensure_worker(self) -> None:
+        # Called with self._cond held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='cache-write-behind', daemon=True)
+            self._thread.start()
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Queue a write, replacing any queued write to the same key."""
+        with self._cond:
+            if not self._closed:
+                while len(self._pending) >= self.max_pending and key not in self._pending:
+                    self._cond.wait()
+                if key in self._pending:
+                    del self._pending[key]
+                    self._stats['coalesced'] += 1
+                self._pending[key] = value
+                self._stats['queued'] += 1
+                self._ensure_worker()
+                self._cond.notify_all()
+                return
+        # After shutdown there is no worker left; write through
+        self._write([(key, value)])
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Value of a write that is queued or in progress, or None."""
+        with self._cond:
+            if key in self._pending:
+                return self._pending[key]
+            return self._in_flight.get(key)
+
+    def discard(self, key: Hashable) -> None:
+        """Drop a write to key, waiting for the batch writing it if it is in progress."""
+        with self._cond:
+            self._pending.pop(key, None)
+            if key in self._in_flight:
+                del self._in_flight[key]
+                self._wait_for_batch()
+            self._cond.notify_all()
+
+    def clear(self) -> None:
+        """Drop every write, waiting for the batch in progress if there is one."""
+        with self._cond:
+            self._pending.clear()
+            self._in_flight.clear()
+            if self._writing:
+                self._wait_for_batch()
+            self._cond.notify_all()
+
+    def _wait_for_batch(self) -> None:
+        # Called with self._cond held, while a batch is being written
+        batch = self._batches_done
+        while self._batches_done == batch:
+            self._cond.wait()
+
+    def depth(self) -> int:
+        """Number of writes queued or in progress."""
+        with self._cond:
+            return len(self._pending) + len(self._in_flight)
+
+    def _write(self, batch: List[Tuple[Hashable, Any]]) -> None:
+        try:
+            self.write_batch(batch)
+            written, errors = len(batch), 0
+        except Exception:
+            # Losing a cache write only costs a later recomputation
+            written, errors = 0, len(batch)
+        with self._cond:
+            self._stats['written'] += written
+            self._stats['errors'] += errors
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                batch = list(self._pending.items())
+                self._pending.clear()
+                self._in_flight = dict(batch)
+                self._writing = True
+                # Wake producers waiting for room
+                self._cond.notify_all()
+            self._write(batch)
+            with self._cond:
+                self._in_flight = {}
+                self._writing = False
+                self._batches_done += 1
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued write has been written.
+
+        Returns:
+            False if timeout passed first
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._pending or self._writing:
+                if self._pending:
+                    self._ensure_worker()
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Write out everything queued and stop the worker; later writes go straight through."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return flushed
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depth and counters of queued, coalesced, written and failed writes."""
+        with self._cond:
+            return dict(self._stats, depth=len(self._pending) + len(self._in_flight))